@@ -1,99 +1,111 @@
 # EDA + modelo preditivo de VTDD usando datasets/serasa.csv
+#
+# Uso: python src/EDA.py [stats] [tables] [figures] [forecast] [indicators] [backtest] [all]
+# matplotlib e seaborn só são importados pelas etapas que precisam deles:
+# "forecast" sozinho não carrega nenhuma biblioteca de gráficos e só monta a tabela de
+# previsão do VTDD; a previsão dos sete indicadores e o backtest são etapas à parte.
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import argparse
+import os
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score, mean_squared_error
+import armazem_sqlite
+import backtest
+import correlacoes
+import instrumentacao as telemetria
+import periodos
+import previsao
 
 # Bl.1 Configurações básicas
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "datasets" / "serasa.csv"
+PARQUET_PATH = BASE_DIR / "datasets" / "serasa.parquet"  # gerado com pdf2csv --format parquet
 FIG_DIR = BASE_DIR / "figures"
-FIG_DIR.mkdir(exist_ok=True, parents=True)
 
-plt.rcParams["figure.figsize"] = (10, 5)
-plt.rcParams["axes.grid"] = True
-
-# Bl.2 Funções auxiliares de período
-
-MESES_FULL = {
-    "jan": "Janeiro",
-    "fev": "Fevereiro",
-    "mar": "Março",
-    "abr": "Abril",
-    "mai": "Maio",
-    "jun": "Junho",
-    "jul": "Julho",
-    "ago": "Agosto",
-    "set": "Setembro",
-    "out": "Outubro",
-    "nov": "Novembro",
-    "dez": "Dezembro",
-}
-
-
-def periodo_sort_key(p: str):
-    """Transformei 'out/24' em (2024, 10) para uma melhor ordenação temporal."""
-    if not isinstance(p, str) or "/" not in p:
-        return (9999, 99)
-    mes, yy = p.split("/")
-    mes = mes.lower()
-    mapa = {
-        "jan": 1, "fev": 2, "mar": 3, "abr": 4,
-        "mai": 5, "jun": 6, "jul": 7, "ago": 8,
-        "set": 9, "out": 10, "nov": 11, "dez": 12,
-    }
-    m = mapa.get(mes, 99)
-    try:
-        y = 2000 + int(yy)
-    except ValueError:
-        y = 9999
-    return (y, m)
+STAGES = ["stats", "tables", "figures", "forecast", "indicators", "backtest"]
 
 
-def periodo_full_label(p: str) -> str:
-
-    if not isinstance(p, str) or "/" not in p:
-        return p
-    mes_abbr, yy = p.split("/")
-    mes_nome = MESES_FULL.get(mes_abbr.lower(), mes_abbr)
-    try:
-        ano = 2000 + int(yy)
-    except ValueError:
-        ano = yy
-    return f"{mes_nome} {ano}"
+def _setup_matplotlib():
+    # Sem pyplot: as figuras são montadas com a API orientada a objetos (Figure + canvas Agg),
+    # o que dispensa backend interativo e permite renderizar em paralelo sem estado global.
+    # Import tardio: só paga o custo do matplotlib quem for desenhar.
+    import matplotlib
+    matplotlib.use("Agg")
+    matplotlib.rcParams["figure.figsize"] = (10, 5)
+    matplotlib.rcParams["axes.grid"] = True
 
+# Bl.2 Funções auxiliares de período
+# Ordenação, rótulos ("Outubro 2024") e meses futuros ficam em periodos.py,
+# compartilhado com o pdf2csv 2.0.py. Aqui os meses viram a coluna PERIODO_M (period[M]).
 
 
 # Bl.3 Carregamento e tratamento inicial
 
-def load_data():
-    df = pd.read_csv(DATA_PATH)
-
-    num_cols = [
-        "INADIMPLENTES_MI",
-        "VMPP",
-        "DIVIDAS_MI",
-        "VMCD",
-        "VTDD_BI",
-        "VMAF",
-        "DESCONTOS_BI",
-    ]
-    for c in num_cols:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    # 3.1 Ordenar por período
-    df = df.sort_values("PERIODO", key=lambda s: s.map(periodo_sort_key)).reset_index(drop=True)
+def load_data(path: Path = DATA_PATH, columns=None, de=None, ate=None):
+    """
+    path pode ser o CSV, o Parquet (arquivo ou diretório particionado por ano) ou o
+    armazém SQLite (.sqlite/.db, pdf2csv --format sqlite).
+    No Parquet e no SQLite só as colunas em columns são lidas, já tipadas e em ordem de período.
+    de/ate ("jan/24", "2024-01"...) limitam a faixa de meses, inclusive; no SQLite a faixa
+    vai para a consulta (índice por mês), nos outros formatos é filtrada depois de ler.
+    """
+    path = Path(path)
+    if armazem_sqlite.is_store(path):
+        df = armazem_sqlite.read_metrics(path, columns=columns, de=de, ate=ate)
+    elif path.suffix == ".parquet" or path.is_dir():
+        from formato_colunar import read_parquet
+        df = read_parquet(path, columns=columns)
+    else:
+        usecols = None if columns is None else ["PERIODO"] + list(columns)
+        df = pd.read_csv(path, usecols=usecols)
+
+        num_cols = [
+            "INADIMPLENTES_MI",
+            "VMPP",
+            "DIVIDAS_MI",
+            "VMCD",
+            "VTDD_BI",
+            "VMAF",
+            "DESCONTOS_BI",
+        ]
+        for c in num_cols:
+            if c in df:
+                df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    return prepare_data(df, de=de, ate=ate)
+
+
+def prepare_data(df: pd.DataFrame, de=None, ate=None) -> pd.DataFrame:
+    """
+    Colunas auxiliares do EDA (PERIODO_M, t, PERIODO_FULL) sobre um dataset já numérico,
+    lido do disco (load_data) ou vindo direto do pdf2csv em memória (pipeline.py).
+    Não altera o df recebido.
+    """
+    df = df.copy()
+    df["PERIODO_M"] = periodos.to_period(df["PERIODO"])
+    if de is not None or ate is not None:
+        meses = df["PERIODO_M"].array.asi8
+        dentro = df["PERIODO_M"].notna().to_numpy().copy()
+        if de is not None:
+            dentro &= meses >= armazem_sqlite.month_bound(de)
+        if ate is not None:
+            dentro &= meses <= armazem_sqlite.month_bound(ate)
+        df = df[dentro]
+    # 3.1 Ordenar por período (Parquet, SQLite e o pdf2csv em memória já vêm em ordem;
+    # NaT é o menor int64, então só passa direto se não houver período inválido)
+    if np.all(np.diff(df["PERIODO_M"].array.asi8) >= 0) and df["PERIODO_M"].notna().all():
+        df = df.reset_index(drop=True)
+    else:
+        df = df.sort_values("PERIODO_M", kind="stable", na_position="last").reset_index(drop=True)
 
     df["t"] = np.arange(len(df))
 
-    df["PERIODO_FULL"] = df["PERIODO"].apply(periodo_full_label)
+    df["PERIODO_FULL"] = periodos.full_label(df["PERIODO_M"]).fillna(df["PERIODO"])
 
     return df
 
@@ -110,7 +122,15 @@ def eda_basic_stats(df: pd.DataFrame):
 
 
 def eda_correlations(df: pd.DataFrame):
-    corr = df[[
+    corr = correlation_matrix(df)
+
+    print("\n=== Matriz de correlação ===")
+    print(corr)
+    return corr
+
+
+def correlation_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    return df[[
         "INADIMPLENTES_MI",
         "VMPP",
         "DIVIDAS_MI",
@@ -120,152 +140,187 @@ def eda_correlations(df: pd.DataFrame):
         "DESCONTOS_BI",
     ]].corr()
 
-    plt.figure()
-    sns.heatmap(corr, annot=True, fmt=".2f")
-    plt.title("Matriz de Correlação - Indicadores Serasa")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "correlacao_indicadores.png")
-    plt.close()
 
-    print("\n=== Matriz de correlação ===")
-    print(corr)
+def correlation_analysis(df: pd.DataFrame, windows=(6, 12), max_lag: int = 6, heatmap: bool = False,
+                         save: bool = True):
+    """
+    Correlações móveis (janelas de windows meses) e defasadas (0..max_lag meses) de todos os
+    pares de indicadores, calculadas em lote (correlacoes.py) e gravadas em tabelas "tidy".
+    heatmap=True desenha o resumo: para cada par líder -> seguidora, a defasagem de maior |corr|.
+    save=False só devolve as tabelas, sem gravar os CSVs (nas funções abaixo também).
+    """
+    df = df.sort_values("t").reset_index(drop=True)
+    movel = correlacoes.rolling_table(df, previsao.INDICADORES, windows=windows)
+    defasada = correlacoes.lagged_table(df, previsao.INDICADORES, max_lag=max_lag)
+    melhores = correlacoes.best_lags(defasada)
+
+    print("\n=== Defasagem de maior correlação por par (líder -> seguidora, em meses) ===")
+    print(melhores[melhores["DEFASAGEM"] > 0].round(4).to_string(index=False))
+
+    if save:
+        out_dir = BASE_DIR / "datasets"
+        out_dir.mkdir(exist_ok=True, parents=True)
+        movel.round(4).to_csv(out_dir / "tabela_correlacao_movel.csv", index=False, encoding="utf-8")
+        defasada.round(4).to_csv(out_dir / "tabela_correlacao_defasada.csv", index=False, encoding="utf-8")
+        print(f"\nCorrelações móveis salvas em: {out_dir / 'tabela_correlacao_movel.csv'}")
+        print(f"Correlações defasadas salvas em: {out_dir / 'tabela_correlacao_defasada.csv'}")
+
+    if heatmap:
+        plot_lagged_correlation_heatmap(melhores)
+    return movel, defasada
 
 
 # Bl.5 Figuras:
+def new_figure(figsize=None):
+    """Figura isolada (sem pyplot), já ligada ao canvas Agg."""
+    _setup_matplotlib()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def save_figure(fig, filename: str):
+    FIG_DIR.mkdir(exist_ok=True, parents=True)
+    fig.savefig(FIG_DIR / filename)
+
+
+def plot_correlation_heatmap(df: pd.DataFrame):
+    import seaborn as sns
+
+    fig, ax = new_figure()
+    sns.heatmap(correlation_matrix(df), annot=True, fmt=".2f", ax=ax)
+    ax.set_title("Matriz de Correlação - Indicadores Serasa")
+    fig.tight_layout()
+    save_figure(fig, "correlacao_indicadores.png")
+
+
+def plot_lagged_correlation_heatmap(melhores: pd.DataFrame):
+    """Linha = série líder, coluna = seguidora; cor = corr na melhor defasagem, anotada com os meses."""
+    import seaborn as sns
+
+    corr = melhores.pivot(index="SERIE_LIDER", columns="SERIE_SEGUIDORA", values="CORR")
+    lag = melhores.pivot(index="SERIE_LIDER", columns="SERIE_SEGUIDORA", values="DEFASAGEM")
+    ordem = [c for c in previsao.INDICADORES if c in corr.index or c in corr.columns]
+    corr = corr.reindex(index=ordem, columns=ordem)
+    lag = lag.reindex(index=ordem, columns=ordem)
+    annot = corr.map(lambda v: f"{v:.2f}") + "\n(" + lag.astype("Int64").astype(str) + "m)"
+
+    fig, ax = new_figure(figsize=(10, 7))
+    sns.heatmap(corr, annot=annot.where(corr.notna(), ""), fmt="", vmin=-1, vmax=1,
+                cmap="coolwarm", annot_kws={"fontsize": 7}, ax=ax)
+    ax.set_title("Correlação na melhor defasagem (líder -> seguidora, meses)")
+    ax.set_xlabel("Seguidora")
+    ax.set_ylabel("Líder")
+    fig.tight_layout()
+    save_figure(fig, "correlacao_defasada_indicadores.png")
+
+
+def _plot_time_series(df: pd.DataFrame, col: str, ylabel: str, title: str, filename: str):
+    fig, ax = new_figure()
+    ax.plot(df["PERIODO_FULL"], df[col], marker="o")
+    ax.set_xlabel("Período")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    save_figure(fig, filename)
+
+
 def plot_inadimplentes_time_series(df: pd.DataFrame):
     """Gabriel: Figura: Evolução de Inadimplência no Brasil."""
-    plt.figure()
-    plt.plot(df["PERIODO_FULL"], df["INADIMPLENTES_MI"], marker="o")
-    plt.xlabel("Período")
-    plt.ylabel("Inadimplentes (milhões)")
-    plt.title("Evolução da Inadimplência no Brasil")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "inadimplentes_serie_temporal.png")
-    plt.close()
+    _plot_time_series(df, "INADIMPLENTES_MI", "Inadimplentes (milhões)",
+                      "Evolução da Inadimplência no Brasil", "inadimplentes_serie_temporal.png")
 
 
 def plot_vmpp_time_series(df: pd.DataFrame):
     """Gabriel: Figura: Evolução do Valor Médio por Pessoa (VMPP)."""
-    plt.figure()
-    plt.plot(df["PERIODO_FULL"], df["VMPP"], marker="o")
-    plt.xlabel("Período")
-    plt.ylabel("VMPP (R$)")
-    plt.title("Valor Médio por Pessoa (VMPP) – Série Temporal")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "vmpp_serie_temporal.png")
-    plt.close()
+    _plot_time_series(df, "VMPP", "VMPP (R$)",
+                      "Valor Médio por Pessoa (VMPP) – Série Temporal", "vmpp_serie_temporal.png")
 
 
 def plot_dividas_time_series(df: pd.DataFrame):
     """Gabriel: Figura: Variação da quantidade total de dívidas (DIVIDAS_MI)."""
-    plt.figure()
-    plt.plot(df["PERIODO_FULL"], df["DIVIDAS_MI"], marker="o")
-    plt.xlabel("Período")
-    plt.ylabel("Quantidade de Dívidas (milhões)")
-    plt.title("Variação das Dívidas Brasileiras ao Longo do Tempo")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "dividas_serie_temporal.png")
-    plt.close()
+    _plot_time_series(df, "DIVIDAS_MI", "Quantidade de Dívidas (milhões)",
+                      "Variação das Dívidas Brasileiras ao Longo do Tempo", "dividas_serie_temporal.png")
 
 
 def plot_vmcd_time_series(df: pd.DataFrame):
     """Gabriel: Figura: Evolução do Valor Médio de Cada Dívida (VMCD)."""
-    plt.figure()
-    plt.plot(df["PERIODO_FULL"], df["VMCD"], marker="o")
-    plt.xlabel("Período")
-    plt.ylabel("VMCD (R$)")
-    plt.title("Valor Médio de Cada Dívida (VMCD) – Série Temporal")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "vmcd_serie_temporal.png")
-    plt.close()
+    _plot_time_series(df, "VMCD", "VMCD (R$)",
+                      "Valor Médio de Cada Dívida (VMCD) – Série Temporal", "vmcd_serie_temporal.png")
 
 
 def plot_vtdd_time_series(df: pd.DataFrame):
     """Gabriel: Figura: Total de dívidas em reais (R$)."""
-    plt.figure()
-    plt.plot(df["PERIODO_FULL"], df["VTDD_BI"], marker="o")
-    plt.xlabel("Período")
-    plt.ylabel("VTDD (R$ bilhões)")
-    plt.title("Valor Total das Dívidas (VTDD) – Série Temporal")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "vtdd_serie_temporal.png")
-    plt.close()
+    _plot_time_series(df, "VTDD_BI", "VTDD (R$ bilhões)",
+                      "Valor Total das Dívidas (VTDD) – Série Temporal", "vtdd_serie_temporal.png")
 
 
 # Bl5.1 Plots de Histogramas e boxplots
 def plot_histograms_boxplots(df: pd.DataFrame):
-
-    plt.figure()
-    plt.hist(df["VTDD_BI"], bins=5)
-    plt.xlabel("VTDD (R$ bilhões)")
-    plt.ylabel("Frequência")
-    plt.title("Histograma do Valor Total das Dívidas (VTDD)")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "vtdd_histograma.png")
-    plt.close()
-
-    plt.figure()
-    sns.boxplot(x=df["VTDD_BI"])
-    plt.xlabel("VTDD (R$ bilhões)")
-    plt.title("Boxplot do Valor Total das Dívidas (VTDD)")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "vtdd_boxplot.png")
-    plt.close()
-
-    plt.figure()
-    plt.hist(df["INADIMPLENTES_MI"], bins=5)
-    plt.xlabel("Inadimplentes (milhões)")
-    plt.ylabel("Frequência")
-    plt.title("Histograma do Número de Inadimplentes")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "inadimplentes_histograma.png")
-    plt.close()
+    import seaborn as sns
+
+    fig, ax = new_figure()
+    ax.hist(df["VTDD_BI"], bins=5)
+    ax.set_xlabel("VTDD (R$ bilhões)")
+    ax.set_ylabel("Frequência")
+    ax.set_title("Histograma do Valor Total das Dívidas (VTDD)")
+    fig.tight_layout()
+    save_figure(fig, "vtdd_histograma.png")
+
+    fig, ax = new_figure()
+    sns.boxplot(x=df["VTDD_BI"], ax=ax)
+    ax.set_xlabel("VTDD (R$ bilhões)")
+    ax.set_title("Boxplot do Valor Total das Dívidas (VTDD)")
+    fig.tight_layout()
+    save_figure(fig, "vtdd_boxplot.png")
+
+    fig, ax = new_figure()
+    ax.hist(df["INADIMPLENTES_MI"], bins=5)
+    ax.set_xlabel("Inadimplentes (milhões)")
+    ax.set_ylabel("Frequência")
+    ax.set_title("Histograma do Número de Inadimplentes")
+    fig.tight_layout()
+    save_figure(fig, "inadimplentes_histograma.png")
 
 
 # Gabriel -- Pizza
-def build_inadimplentes_table(df: pd.DataFrame) -> pd.DataFrame:
+def build_inadimplentes_table(df: pd.DataFrame, save: bool = True) -> pd.DataFrame:
+    tab = inadimplentes_table(df)
+
+    print("\n=== Tabela - Número de Inadimplentes (estilo Tabela 1) ===")
+    print(tab.to_string(index=False))
+
+    if save:
+        out_path = BASE_DIR / "datasets" / "tabela_inadimplentes.csv"
+        out_path.parent.mkdir(exist_ok=True, parents=True)
+        tab.to_csv(out_path, index=False, encoding="utf-8")
+        print(f"\nTabela de inadimplentes salva em: {out_path}")
 
-    linhas = []
+    return tab
+
+
+def inadimplentes_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Só a montagem da Tabela 1, sem imprimir nem gravar (também usada pelo servico_consulta.py)."""
     total_inad = df["INADIMPLENTES_MI"].sum()
+    qtd = df["INADIMPLENTES_MI"].reset_index(drop=True)
 
-    for _, row in df.iterrows():
-        per = row["PERIODO"]
-        mes_abbr, yy = per.split("/")
-        mes_nome = MESES_FULL.get(mes_abbr.lower(), mes_abbr)
-        ano = 2000 + int(yy)
-        qtd = row["INADIMPLENTES_MI"]
-        pct = 100 * qtd / total_inad
-
-        linhas.append({
-            "Mês": mes_nome,
-            "Ano": ano,
-            "% Total (no período)": round(pct, 2),
-            "Qtd. Total (mi)": round(qtd, 2),
-        })
-
-    tab = pd.DataFrame(linhas)
+    tab = pd.DataFrame({
+        "Mês": periodos.month_name(df["PERIODO_M"]).reset_index(drop=True),
+        "Ano": df["PERIODO_M"].dt.year.reset_index(drop=True),
+        "% Total (no período)": (100 * qtd / total_inad).round(2),
+        "Qtd. Total (mi)": qtd.round(2),
+    })
     total_row = {
         "Mês": "Total",
         "Ano": "",
         "% Total (no período)": round(tab["% Total (no período)"].sum(), 2),
         "Qtd. Total (mi)": round(total_inad, 1),
     }
-    tab = pd.concat([tab, pd.DataFrame([total_row])], ignore_index=True)
-
-    print("\n=== Tabela - Número de Inadimplentes (estilo Tabela 1) ===")
-    print(tab.to_string(index=False))
-
-    out_path = BASE_DIR / "datasets" / "tabela_inadimplentes.csv"
-    out_path.parent.mkdir(exist_ok=True, parents=True)
-    tab.to_csv(out_path, index=False, encoding="utf-8")
-    print(f"\nTabela de inadimplentes salva em: {out_path}")
-
-    return tab
+    return pd.concat([tab, pd.DataFrame([total_row])], ignore_index=True)
 
 
 def plot_inadimplentes_pie(df: pd.DataFrame):
@@ -275,77 +330,175 @@ def plot_inadimplentes_pie(df: pd.DataFrame):
     labels = df["PERIODO_FULL"].tolist()
     sizes = df["INADIMPLENTES_MI"].tolist()
 
-    plt.figure(figsize=(8, 8))
-    plt.pie(
+    fig, ax = new_figure(figsize=(8, 8))
+    ax.pie(
         sizes,
         labels=labels,
         autopct="%1.1f%%",
         startangle=90
     )
-    plt.title("Distribuição dos Inadimplentes por Período")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "inadimplentes_pizza.png")
-    plt.close()
+    ax.set_title("Distribuição dos Inadimplentes por Período")
+    fig.tight_layout()
+    save_figure(fig, "inadimplentes_pizza.png")
 
 
-# -------------------------------------------------------------------
-# BL.6 Modelo preditivo de VTDD (série temporal) + métricas + Tabela atenção as legendas
-# -------------------------------------------------------------------
-def train_vtdd_model(df: pd.DataFrame):
+# Figuras que só dependem do df: podem ser renderizadas em qualquer ordem/processo
+FIGURES = [
+    plot_correlation_heatmap,
+    plot_inadimplentes_time_series,
+    plot_vmpp_time_series,
+    plot_dividas_time_series,
+    plot_vmcd_time_series,
+    plot_vtdd_time_series,
+    plot_histograms_boxplots,
+    plot_inadimplentes_pie,
+]
 
-    df = df.sort_values("t").reset_index(drop=True)
 
-    X = df[["t"]].values
-    y = df["VTDD_BI"].values
+def _render_in_worker(plot_name: str, df: pd.DataFrame, fig_dir: Path):
+    # FIG_DIR vem explícito: num processo "spawn" o módulo é reimportado com o valor padrão
+    global FIG_DIR
+    FIG_DIR = fig_dir
+    globals()[plot_name](df)
+    return plot_name
 
-    n = len(df)
-    n_train = int(n * 0.7)  # 70% treino, 30% teste
 
-    X_train, X_test = X[:n_train], X[n_train:]
-    y_train, y_test = y[:n_train], y[n_train:]
+def render_figures(df: pd.DataFrame, workers: int = 1, figures=None):
+    """
+    Renderiza as figuras em série (workers=1) ou num pool de processos. Cada figura
+    é independente e usa só a API orientada a objetos, então os PNGs saem idênticos
+    byte a byte nos dois modos.
+    """
+    figures = FIGURES if figures is None else figures
+    if workers <= 1 or len(figures) <= 1:
+        for plot in figures:
+            with telemetria.span("eda.figura", item=plot.__name__):
+                plot(df)
+        return
+
+    with telemetria.span("eda.figuras_paralelo"):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_render_in_worker, plot.__name__, df, FIG_DIR)
+                for plot in figures
+            ]
+            for future in futures:
+                future.result()  # propaga erro de qualquer figura
 
-    model = LinearRegression()
-    model.fit(X_train, y_train)
 
-    # Previsão no conjunto de teste das métricas
-    y_pred_test = model.predict(X_test)
+# -------------------------------------------------------------------
+# BL.6 Modelo preditivo de VTDD (série temporal) + métricas + Tabela atenção as legendas
+# -------------------------------------------------------------------
+def train_vtdd_model(df: pd.DataFrame, plot: bool = True, n_paths: int = previsao.N_PATHS,
+                     method: str = "bootstrap", save: bool = True):
+    """
+    plot=False pula a figura de previsão (e o import do matplotlib).
+    n_paths trajetórias simuladas (previsao.simulate_paths) dão os intervalos P5/P50/P95.
+    """
+    df = df.sort_values("t").reset_index(drop=True)
 
-    r2 = r2_score(y_test, y_pred_test)
-    # sklearn
-    rmse = mean_squared_error(y_test, y_pred_test) ** 0.5
+    # Tendência linear por mínimos quadrados (previsao.py): 70% treino, 30% teste,
+    # depois reajuste em todos os dados para projetar os próximos 5 meses (pedido do Gabriel)
+    with telemetria.span("modelo.fit"):
+        resultado = previsao.forecast_batch(df, ["VTDD_BI"], horizon=5, train_frac=0.7)
+
+    r2, rmse = resultado["metrics"].loc["VTDD_BI", ["R2", "RMSE"]]
 
     print("\n=== Métricas de desempenho do modelo (conjunto de teste) ===")
     print(f"R² (coeficiente de determinação): {r2:.4f}")
     print(f"RMSE (erro quadrático médio, em R$ bilhões): {rmse:.2f}")
 
     # Previsão em TODO o histórico """(para VTDD_PRED em Tabela 2)"""
-    y_pred_hist = model.predict(X)
-
-    # Reajusta em todos os dados para projetar próximos 5 meses (pedido do Gabriel)
-    model_full = LinearRegression()
-    model_full.fit(X, y)
+    y_pred_hist = resultado["hist"]["VTDD_BI"].to_numpy()
+    future_pred = resultado["future"]["VTDD_BI"].to_numpy()
 
-    last_t = df["t"].iloc[-1]
-    future_steps = 5
-    future_t = np.arange(last_t + 1, last_t + 1 + future_steps).reshape(-1, 1)
-    future_pred = model_full.predict(future_t)
+    # Intervalos: P5/P50/P95 na tabela; a figura usa também P25/P75 para o leque
+    with telemetria.span("modelo.simulacao"):
+        paths = previsao.simulate_paths(resultado, n_paths=n_paths, method=method)
+        bandas = {nome: q["VTDD_BI"].to_numpy()
+                  for nome, q in previsao.path_quantiles(resultado, paths, (5, 25, 50, 75, 95)).items()}
 
     # Monta tabela
-    tabela2 = build_forecast_table(df, y_pred_hist, future_pred)
+    tabela2 = build_forecast_table(df, y_pred_hist, future_pred,
+                                   {nome: bandas[nome] for nome in ("P5", "P50", "P95")})
 
-    out_path = BASE_DIR / "datasets" / "tabela_vtdd_previsao.csv"
-    tabela2.to_csv(out_path, index=False, encoding="utf-8")
-    print(f"\nTabela de previsão VTDD salva em: {out_path}")
+    if save:
+        out_path = BASE_DIR / "datasets" / "tabela_vtdd_previsao.csv"
+        out_path.parent.mkdir(exist_ok=True, parents=True)
+        tabela2.to_csv(out_path, index=False, encoding="utf-8")
+        print(f"\nTabela de previsão VTDD salva em: {out_path}")
 
     # Gráfico histórico + previsão
-    plot_forecast(df, future_pred)
+    if plot:
+        with telemetria.span("eda.figura", item="plot_forecast"):
+            plot_forecast(df, future_pred, bandas)
+
+    return resultado, tabela2
+
+
+def forecast_indicators(df: pd.DataFrame, horizon: int = 5, seasonal: bool = False,
+                        n_paths: int = previsao.N_PATHS, method: str = "bootstrap",
+                        save: bool = True) -> pd.DataFrame:
+    """
+    Mesma previsão para os sete indicadores de uma vez (um único ajuste em lote).
+    seasonal=True acrescenta dummies de mês à tendência (precisa de uns 2 anos de dados).
+    As n_paths trajetórias simuladas de todos os indicadores saem num array só (P5/P50/P95).
+    """
+    df = df.sort_values("t").reset_index(drop=True)
+    with telemetria.span("modelo.fit_lote"):
+        resultado = previsao.forecast_batch(df, previsao.INDICADORES, horizon=horizon, seasonal=seasonal)
+
+    print("\n=== Métricas de teste por indicador (tendência"
+          + (" + sazonalidade" if resultado["seasonal"] else "") + ") ===")
+    print(resultado["metrics"].round(4).to_string())
+
+    with telemetria.span("modelo.simulacao"):
+        paths = previsao.simulate_paths(resultado, n_paths=n_paths, method=method)
+        quantis = previsao.path_quantiles(resultado, paths)
+
+    tabela = previsao.forecast_table(df, resultado, quantis)
+    if save:
+        out_path = BASE_DIR / "datasets" / "tabela_previsao_indicadores.csv"
+        out_path.parent.mkdir(exist_ok=True, parents=True)
+        tabela.to_csv(out_path, index=False, encoding="utf-8")
+        print(f"\nTabela de previsão dos indicadores salva em: {out_path}")
+    return tabela
 
-    return model, tabela2
+
+def select_forecast_models(df: pd.DataFrame, horizon: int = 3, forecast_horizon: int = 5,
+                           workers: int = 1, save: bool = True) -> pd.DataFrame:
+    """
+    Backtest de origem móvel (backtest.py) dos modelos candidatos em todos os indicadores,
+    escolha automática do melhor por indicador e projeção com o modelo escolhido.
+    """
+    df = df.sort_values("t").reset_index(drop=True)
+    with telemetria.span("modelo.backtest"):
+        tabela = backtest.run_backtest(df, previsao.INDICADORES, horizon=horizon, workers=workers)
+
+    out_dir = BASE_DIR / "datasets"
+    if save:
+        out_dir.mkdir(exist_ok=True, parents=True)
+        tabela.to_csv(out_dir / "tabela_backtest.csv", index=False, encoding="utf-8")
+        print(f"\nErros do backtest por horizonte salvos em: {out_dir / 'tabela_backtest.csv'}")
+
+    escolhidos = backtest.select_best(tabela, metric="RMSE")
+    print("\n=== Modelo escolhido por indicador (menor RMSE médio no backtest) ===")
+    print(escolhidos.round(4).to_string(index=False))
+
+    previsto = backtest.forecast_selected(df, escolhidos, horizon=forecast_horizon).round(2)
+    print("\n=== Previsão com o modelo escolhido ===")
+    print(previsto.to_string())
+    if save:
+        previsto.to_csv(out_dir / "tabela_previsao_automatica.csv", encoding="utf-8")
+        print(f"\nPrevisão automática salva em: {out_dir / 'tabela_previsao_automatica.csv'}")
+    return escolhidos
 
 
 def build_forecast_table(df: pd.DataFrame,
                          y_pred_hist: np.ndarray,
-                         future_pred: np.ndarray) -> pd.DataFrame:
+                         future_pred: np.ndarray,
+                         quantis: dict = None) -> pd.DataFrame:
+    """quantis: {"P5": array do horizonte, ...} viram as colunas VTDD_P5 (R$ B)..."""
 
     hist = pd.DataFrame({
         "PERIODO": df["PERIODO"],
@@ -354,13 +507,19 @@ def build_forecast_table(df: pd.DataFrame,
         "VTDD_PREVISTA (R$ B)": np.nan,
     })
 
-    future_periods = ["ago/25", "set/25", "out/25", "nov/25", "dez/25"]
+    # Meses seguintes ao último do histórico (não mais fixos em ago/25..dez/25)
+    future_periods = periodos.period_label(
+        periodos.future_periods(df["PERIODO_M"].iloc[-1], len(future_pred))
+    ).tolist()
     future = pd.DataFrame({
         "PERIODO": future_periods,
         "VTDD_REAL (R$ B)": [np.nan] * len(future_periods),
         "VTDD_PRED (R$ B)": [np.nan] * len(future_periods),
         "VTDD_PREVISTA (R$ B)": np.round(future_pred, 2),
     })
+    for nome, q in (quantis or {}).items():
+        hist[f"VTDD_{nome} (R$ B)"] = np.nan
+        future[f"VTDD_{nome} (R$ B)"] = np.round(q, 2)
 
     tabela2 = pd.concat([hist, future], ignore_index=True)
     print("\n=== Tabela 2 - VTDD histórico, previsto e projeções ===")
@@ -368,82 +527,228 @@ def build_forecast_table(df: pd.DataFrame,
     return tabela2
 
 
-def plot_forecast(df: pd.DataFrame, future_pred: np.ndarray):
+def plot_forecast(df: pd.DataFrame, future_pred: np.ndarray, bandas: dict = None):
+    """bandas: {"P5": ..., "P25": ..., "P75": ..., "P95": ...} (train_vtdd_model) desenham o leque."""
 
-    x_hist = df["PERIODO"].tolist()                # ex: ['out/24', ..., 'jul/25']
-    x_future = ["ago/25", "set/25", "out/25", "nov/25", "dez/25"]
+    x_hist = df["PERIODO_M"]                       # ex: 2024-10, ..., 2025-09
+    x_future = periodos.future_periods(x_hist.iloc[-1], len(future_pred))
 
     y_hist = df["VTDD_BI"].values
     y_future = future_pred
 
-    def full_label(p):
-        return periodo_full_label(p)
-
-    labels_hist_full = [full_label(p) for p in x_hist]
-    labels_future_full = [full_label(p) for p in x_future]
-    labels_all = labels_hist_full + labels_future_full
+    labels_all = df["PERIODO_FULL"].tolist() + periodos.full_label(x_future).tolist()
 
     # Índices numéricos no eixo x (Atenção)
     x_hist_idx = np.arange(len(x_hist))
     x_future_idx = np.arange(len(x_hist), len(x_hist) + len(x_future))
 
-    plt.figure(figsize=(10, 4))
+    fig, ax = new_figure(figsize=(10, 4))
 
     # linha histórica
-    plt.plot(x_hist_idx, y_hist, marker="o", label="Histórico")
+    ax.plot(x_hist_idx, y_hist, marker="o", label="Histórico")
 
     # linha de previsão tracejada nesse caso
-    plt.plot(x_future_idx, y_future, marker="o", linestyle="--", label="Previsão")
+    ax.plot(x_future_idx, y_future, marker="o", linestyle="--", label="Previsão")
+
+    # leque dos cenários simulados: 90% mais claro, 50% mais escuro
+    for lo, hi, alpha, rotulo in (("P5", "P95", 0.15, "Intervalo 90%"), ("P25", "P75", 0.3, "Intervalo 50%")):
+        if bandas and lo in bandas and hi in bandas:
+            ax.fill_between(x_future_idx, bandas[lo], bandas[hi], color="C1", alpha=alpha,
+                            linewidth=0, label=rotulo)
 
     # rótulos do eixo X com meses
-    plt.xticks(
+    ax.set_xticks(
         ticks=np.arange(len(labels_all)),
         labels=labels_all,
         rotation=45
     )
 
-    plt.xlabel("Período")
-    plt.ylabel("Valor Total das Dívidas (R$ bilhões)")
-    plt.title("Previsão de Dívidas para os Próximos 5 Meses – Brasil (em Bilhões de R$)")
-    plt.legend()
-    plt.tight_layout()
+    ax.set_xlabel("Período")
+    ax.set_ylabel("Valor Total das Dívidas (R$ bilhões)")
+    ax.set_title("Previsão de Dívidas para os Próximos 5 Meses – Brasil (em Bilhões de R$)")
+    ax.legend()
+    fig.tight_layout()
 
     for x, y in zip(x_hist_idx, y_hist):
-        plt.text(x, y + 2, f"{round(y):.0f}B", ha="center", va="bottom", fontsize=8)
+        ax.text(x, y + 2, f"{round(y):.0f}B", ha="center", va="bottom", fontsize=8)
 
     for x, y in zip(x_future_idx, y_future):
-        plt.text(x, y + 2, f"{round(y):.0f}B", ha="center", va="bottom", fontsize=8)
-
-    plt.savefig(FIG_DIR / "vtdd_previsao_proximos_5_meses.png")
-    plt.close()
+        ax.text(x, y + 2, f"{round(y):.0f}B", ha="center", va="bottom", fontsize=8)
 
-def main():
-    print(f"Lendo dados de: {DATA_PATH}")
-    df = load_data()
+    save_figure(fig, "vtdd_previsao_proximos_5_meses.png")
 
-    # Tratamento / EDA básica
-    eda_basic_stats(df)
-    eda_correlations(df)
-
-    # Séries temporais principais (substituem Figuras 2–5 no documento """Gabriel ou Ana""")
-    plot_inadimplentes_time_series(df)
-    plot_vmpp_time_series(df)
-    plot_dividas_time_series(df)
-    plot_vmcd_time_series(df)
-    plot_vtdd_time_series(df)
+def main(stages=("all",), fig_workers: int = 1, data_path: Path = None, seasonal: bool = False,
+         backtest_workers: int = 1, corr_windows=(6, 12), max_lag: int = 6,
+         n_paths: int = previsao.N_PATHS, interval_method: str = "bootstrap",
+         de=None, ate=None, store: Path = None):
+    """
+    stages: qualquer combinação de STAGES (ou "all"): "forecast" é a tabela de previsão do
+    VTDD, "indicators" a previsão dos sete indicadores e "backtest" a escolha de modelos.
+    A figura de previsão sai quando "figures" e "forecast" rodam juntos, e o heatmap
+    das correlações defasadas quando "figures" e "stats" rodam juntos.
+    de/ate: faixa de meses analisada (load_data).
+    store: armazém SQLite que recebe as tabelas derivadas e as rodadas de previsão
+    (armazem_sqlite.py), além dos CSVs de sempre; padrão: o próprio data_path se for um armazém.
+    """
+    data_path = DATA_PATH if data_path is None else data_path
+    if store is None and armazem_sqlite.is_store(data_path):
+        store = data_path
+
+    print(f"Lendo dados de: {data_path}")
+    with telemetria.span("eda.load_data"):
+        df = load_data(data_path, de=de, ate=ate)
+    telemetria.count("rows", len(df))
+
+    con = armazem_sqlite.connect(store) if store is not None else None
+    tabelas = run_stages(df, stages, fig_workers=fig_workers, seasonal=seasonal,
+                         backtest_workers=backtest_workers, corr_windows=corr_windows, max_lag=max_lag,
+                         n_paths=n_paths, interval_method=interval_method, con=con)
+    if con is not None:
+        con.close()
+        print(f"\nTabelas derivadas e previsões gravadas em: {store}")
+    return tabelas
+
+
+def run_stages(df: pd.DataFrame, stages=("all",), fig_workers: int = 1, seasonal: bool = False,
+               backtest_workers: int = 1, corr_windows=(6, 12), max_lag: int = 6,
+               n_paths: int = previsao.N_PATHS, interval_method: str = "bootstrap",
+               save: bool = True, con=None) -> dict:
+    """
+    As etapas do main sobre um df já preparado (load_data ou prepare_data).
+    save=False não grava os CSVs das tabelas; con (armazem_sqlite.connect) recebe as tabelas
+    derivadas e a rodada de previsão. Devolve {nome: tabela} de tudo o que foi calculado.
+    """
+    if isinstance(stages, str):
+        stages = [stages]
+    stages = set(STAGES) if "all" in stages else set(stages)
+    tabelas = {}
 
-    # Histogramas / boxplots
-    plot_histograms_boxplots(df)
+    def guardar(nome, tabela):
+        tabelas[nome] = tabela
+        if con is not None:
+            with telemetria.span("eda.sqlite", item=nome):
+                armazem_sqlite.write_derived(con, nome, tabela)
 
-    # Tabela 1 - Inadimplentes + pizza
-    build_inadimplentes_table(df)
-    plot_inadimplentes_pie(df)
+    # Tratamento / EDA básica
+    if "stats" in stages:
+        with telemetria.span("eda.basic_stats"):
+            eda_basic_stats(df)
+        with telemetria.span("eda.correlations"):
+            eda_correlations(df)
+        with telemetria.span("eda.correlation_analysis"):
+            movel, defasada = correlation_analysis(df, windows=corr_windows, max_lag=max_lag,
+                                                   heatmap="figures" in stages, save=save)
+        guardar("correlacao_movel", movel)
+        guardar("correlacao_defasada", defasada)
+
+    # Heatmap, séries temporais principais (substituem Figuras 2–5 no documento """Gabriel ou Ana"""),
+    # histogramas/boxplots e pizza
+    if "figures" in stages:
+        render_figures(df, workers=fig_workers)
+
+    # Tabela 1 - Inadimplentes
+    if "tables" in stages:
+        with telemetria.span("eda.tabela_inadimplentes"):
+            guardar("inadimplentes", build_inadimplentes_table(df, save=save))
 
     # Modelo preditivo + métricas de acurácia + Tabela 2 + Figura de previsão
-    train_vtdd_model(df)
+    if "forecast" in stages:
+        with telemetria.span("eda.train_vtdd_model"):
+            _, tabela_vtdd = train_vtdd_model(df, plot="figures" in stages, n_paths=n_paths,
+                                              method=interval_method, save=save)
+        guardar("vtdd_previsao", tabela_vtdd)
+
+    # Previsão dos sete indicadores (tabela_previsao_indicadores.csv)
+    if "indicators" in stages:
+        with telemetria.span("eda.forecast_indicators"):
+            tabela = forecast_indicators(df, seasonal=seasonal, n_paths=n_paths, method=interval_method,
+                                         save=save)
+        guardar("previsao_indicadores", tabela)
+        if con is not None:
+            armazem_sqlite.save_forecast_run(
+                con, tabela, modelo="tendencia_sazonal" if seasonal else "tendencia", horizonte=5,
+                n_paths=n_paths, metodo=interval_method, parametros={"seasonal": seasonal},
+            )
+
+    # Backtest com origem móvel e escolha do modelo de cada indicador
+    if "backtest" in stages:
+        with telemetria.span("eda.select_forecast_models"):
+            guardar("modelos_escolhidos", select_forecast_models(df, workers=backtest_workers, save=save))
+
+    return tabelas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EDA e previsão de VTDD a partir do dataset da Serasa.")
+    parser.add_argument(
+        "stages", nargs="*", choices=STAGES + ["all"], default="all",
+        help="etapas a rodar (padrão: all)",
+    )
+    parser.add_argument(
+        "--data", type=Path, default=DATA_PATH,
+        help="CSV, Parquet ou armazém SQLite de entrada (padrão: datasets/serasa.csv ao lado do script)",
+    )
+    parser.add_argument(
+        "--de", default=None,
+        help="primeiro mês analisado, inclusive (ex.: jan/24); padrão: o histórico inteiro",
+    )
+    parser.add_argument(
+        "--ate", default=None,
+        help="último mês analisado, inclusive (ex.: dez/25)",
+    )
+    parser.add_argument(
+        "--store", type=Path, default=None,
+        help="armazém SQLite para as tabelas derivadas e as rodadas de previsão "
+             "(padrão: o --data, se for .sqlite/.db)",
+    )
+    parser.add_argument(
+        "--fig-workers", type=int, default=int(os.environ.get("SERASA_FIG_WORKERS", "1")),
+        help="processos para renderizar as figuras (ou SERASA_FIG_WORKERS)",
+    )
+    parser.add_argument(
+        "--seasonal", action="store_true",
+        help="previsão dos indicadores com sazonalidade mensal além da tendência",
+    )
+    parser.add_argument(
+        "--backtest-workers", type=int, default=int(os.environ.get("SERASA_BACKTEST_WORKERS", "1")),
+        help="processos para as origens do backtest (ou SERASA_BACKTEST_WORKERS)",
+    )
+    parser.add_argument(
+        "--paths", type=int, default=previsao.N_PATHS,
+        help=f"trajetórias simuladas para os intervalos de previsão (padrão: {previsao.N_PATHS})",
+    )
+    parser.add_argument(
+        "--interval-method", choices=["bootstrap", "normal"], default="bootstrap",
+        help="ruído das trajetórias: resíduos reamostrados (padrão) ou normal",
+    )
+    parser.add_argument(
+        "--corr-windows", type=int, nargs="+", default=[6, 12],
+        help="janelas (meses) das correlações móveis (padrão: 6 12)",
+    )
+    parser.add_argument(
+        "--max-lag", type=int, default=6,
+        help="maior defasagem (meses) das correlações defasadas (padrão: 6)",
+    )
+    parser.add_argument(
+        "--report", type=Path, default=telemetria.env_report_path(),
+        help="grava um relatório JSON com tempos por etapa (ou SERASA_REPORT)",
+    )
+    parser.add_argument(
+        "--profile", type=Path, default=telemetria.env_profile_path(),
+        help="roda sob cProfile e grava as estatísticas neste arquivo (ou SERASA_PROFILE)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with telemetria.profiled(args.profile):
+        with telemetria.span("eda.main"):
+            main(args.stages, fig_workers=args.fig_workers, data_path=args.data, seasonal=args.seasonal,
+                 backtest_workers=args.backtest_workers, corr_windows=args.corr_windows, max_lag=args.max_lag,
+                 n_paths=args.paths, interval_method=args.interval_method, de=args.de, ate=args.ate,
+                 store=args.store)
+    if args.report:
+        telemetria.write_report(args.report, script="EDA.py", stages=args.stages)
 
 """AMÉM"""
\ No newline at end of file
@@ -0,0 +1,310 @@
+# armazem_sqlite.py
+
+# Armazém SQLite opcional (sqlite3 da biblioteca padrão, nenhum pacote a mais) para
+# quando o histórico e as edições regionais crescerem além do que reescrever o CSV
+# inteiro a cada build aguenta:
+#
+#   metricas            uma linha por PDF (arquivo + SHA-256 do conteúdo), métricas em colunas
+#   indicadores         as mesmas métricas no formato longo (arquivo, indicador, mes, valor)
+#   derivadas           catálogo das tabelas derivadas do EDA, gravadas como d_<nome>
+#   execucoes_previsao  uma linha por rodada de previsão (modelo, horizonte, trajetórias...)
+#   previsoes           valores previstos e P5/P50/P95 de cada rodada
+#
+# "mes" é o ordinal do period[M] (meses desde jan/1970, como no periodos.py): consulta
+# por faixa de períodos vira um BETWEEN num índice de inteiros. O rótulo "out/24"
+# continua em "periodo" para quem lê as tabelas.
+#
+# A gravação é upsert: só entram os PDFs novos ou com hash/valores diferentes, tudo
+# numa transação (quem lê nunca vê um build pela metade).
+
+from datetime import datetime
+from pathlib import Path
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import periodos
+from formato_colunar import METRIC_COLS
+
+SCHEMA_VERSION = "1"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS metricas (
+    arquivo TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    periodo TEXT,
+    mes INTEGER,
+    {", ".join(f"{c} REAL" for c in METRIC_COLS)},
+    atualizado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metricas_mes ON metricas (mes);
+CREATE INDEX IF NOT EXISTS metricas_sha256 ON metricas (sha256);
+CREATE TABLE IF NOT EXISTS indicadores (
+    arquivo TEXT NOT NULL REFERENCES metricas (arquivo) ON DELETE CASCADE,
+    indicador TEXT NOT NULL,
+    mes INTEGER,
+    valor REAL,
+    PRIMARY KEY (arquivo, indicador)
+);
+CREATE INDEX IF NOT EXISTS indicadores_indicador_mes ON indicadores (indicador, mes);
+CREATE TABLE IF NOT EXISTS derivadas (
+    nome TEXT PRIMARY KEY,
+    tabela TEXT NOT NULL,
+    linhas INTEGER,
+    atualizado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS execucoes_previsao (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    horizonte INTEGER,
+    n_paths INTEGER,
+    metodo TEXT,
+    ultimo_mes INTEGER,
+    parametros TEXT
+);
+CREATE TABLE IF NOT EXISTS previsoes (
+    execucao INTEGER NOT NULL REFERENCES execucoes_previsao (id) ON DELETE CASCADE,
+    indicador TEXT NOT NULL,
+    mes INTEGER NOT NULL,
+    periodo TEXT,
+    valor REAL,
+    p5 REAL,
+    p50 REAL,
+    p95 REAL,
+    PRIMARY KEY (execucao, indicador, mes)
+);
+CREATE INDEX IF NOT EXISTS previsoes_indicador_mes ON previsoes (indicador, mes);
+"""
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+def is_store(path) -> bool:
+    return Path(path).suffix.lower() in SQLITE_SUFFIXES
+
+
+# -------------------------------------------------------
+# Bl.1 Conexão e esquema
+# -------------------------------------------------------
+def connect(path: Path) -> sqlite3.Connection:
+    """Abre (ou cria) o armazém; esquema de outra versão é erro, não migração silenciosa."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    # WAL: leitores (EDA, serviço de consulta) não bloqueiam durante o upsert do pdf2csv
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA foreign_keys=ON")
+    with con:
+        con.executescript(SCHEMA)
+        row = con.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+        if row is None:
+            con.execute("INSERT INTO meta VALUES ('versao', ?)", (SCHEMA_VERSION,))
+        elif row[0] != SCHEMA_VERSION:
+            con.close()
+            raise ValueError(f"{path}: esquema versão {row[0]}, esperado {SCHEMA_VERSION}")
+    return con
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _month_ordinals(labels) -> list:
+    """'out/24' -> ordinal do period[M] (int) ou None, na ordem de labels."""
+    ordinals = periodos.to_period(pd.Series(labels, dtype=object)).array.asi8
+    return [None if o == np.iinfo(np.int64).min else int(o) for o in ordinals]
+
+
+def month_bound(value):
+    """'jan/24', '2024-01', Period ou None -> ordinal do mês (limite de uma consulta por faixa)."""
+    if value is None:
+        return None
+    if isinstance(value, pd.Period):
+        return int(value.asfreq("M").ordinal)
+    (ordinal,) = _month_ordinals([value])
+    if ordinal is None:
+        try:
+            ordinal = int(pd.Period(str(value), freq="M").ordinal)
+        except ValueError:
+            raise ValueError(f"Período inválido: {value!r} (use por ex. out/24 ou 2024-10)") from None
+    return ordinal
+
+
+def _range_clause(column: str, de=None, ate=None) -> tuple:
+    where, params = [], []
+    if de is not None:
+        where.append(f"{column} >= ?")
+        params.append(month_bound(de))
+    if ate is not None:
+        where.append(f"{column} <= ?")
+        params.append(month_bound(ate))
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+def _clean(value):
+    # NaN do pandas vira NULL no SQLite
+    return None if value is None or pd.isna(value) else float(value)
+
+
+# -------------------------------------------------------
+# Bl.2 Métricas extraídas (uma linha por PDF)
+# -------------------------------------------------------
+def upsert_metrics(con: sqlite3.Connection, df: pd.DataFrame, sources: pd.DataFrame,
+                   prune: bool = False) -> dict:
+    """
+    df: PERIODO + métricas (saída do rows_to_dataframe); sources: ARQUIVO e SHA256 com o
+    mesmo índice de df. Só grava os PDFs novos ou com hash/valores diferentes do que já
+    está no armazém. prune=True apaga os PDFs que não estão em sources (build completo).
+    Devolve a contagem de novos, alterados, iguais e removidos.
+    """
+    sources = sources.loc[df.index]
+    meses = _month_ordinals(df["PERIODO"])
+    atuais = {
+        row[0]: row[1:]
+        for row in con.execute(f"SELECT arquivo, sha256, periodo, {', '.join(METRIC_COLS)} FROM metricas")
+    }
+
+    linhas, novos, alterados = [], 0, 0
+    for (arquivo, sha), periodo, mes, valores in zip(
+        sources[["ARQUIVO", "SHA256"]].itertuples(index=False, name=None),
+        df["PERIODO"], meses, df[METRIC_COLS].itertuples(index=False, name=None),
+    ):
+        valores = tuple(_clean(v) for v in valores)
+        periodo = None if pd.isna(periodo) else str(periodo)
+        antes = atuais.get(arquivo)
+        if antes == (sha, periodo) + valores:
+            continue
+        novos += antes is None
+        alterados += antes is not None
+        linhas.append((arquivo, sha, periodo, mes) + valores)
+
+    removidos = sorted(set(atuais) - set(sources["ARQUIVO"])) if prune else []
+    agora = _now()
+    cols = ["arquivo", "sha256", "periodo", "mes"] + METRIC_COLS
+    with con:
+        con.executemany(
+            f"INSERT INTO metricas ({', '.join(cols)}, atualizado_em) "
+            f"VALUES ({', '.join('?' * len(cols))}, ?) "
+            f"ON CONFLICT (arquivo) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in cols[1:] + ["atualizado_em"]),
+            [linha + (agora,) for linha in linhas],
+        )
+        con.executemany(
+            "INSERT INTO indicadores (arquivo, indicador, mes, valor) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (arquivo, indicador) DO UPDATE SET mes = excluded.mes, valor = excluded.valor",
+            [(linha[0], c, linha[3], v) for linha in linhas for c, v in zip(METRIC_COLS, linha[4:])],
+        )
+        # indicadores sai junto pelo ON DELETE CASCADE
+        con.executemany("DELETE FROM metricas WHERE arquivo = ?", [(a,) for a in removidos])
+    return {"novos": novos, "alterados": alterados, "iguais": len(df) - len(linhas),
+            "removidos": len(removidos)}
+
+
+def read_metrics(path: Path, columns=None, de=None, ate=None) -> pd.DataFrame:
+    """
+    PERIODO + métricas (todas, ou só columns) dos meses entre de e ate (inclusive; None =
+    sem limite), na ordem de período, como o CSV do pdf2csv. A faixa é filtrada pelo índice.
+    """
+    cols = METRIC_COLS if columns is None else [c for c in columns if c in METRIC_COLS]
+    where, params = _range_clause("mes", de, ate)
+    con = connect(path)
+    try:
+        # Mês inválido (NULL) fica no fim; edições regionais do mesmo mês na ordem dos arquivos
+        return pd.read_sql_query(
+            f"SELECT periodo AS PERIODO{''.join(f', {c}' for c in cols)} FROM metricas{where} "
+            "ORDER BY mes IS NULL, mes, arquivo",
+            con, params=params,
+        )
+    finally:
+        con.close()
+
+
+def read_indicator(con: sqlite3.Connection, indicador: str, de=None, ate=None) -> pd.DataFrame:
+    """Série de um indicador (mes, periodo, valor) pelo índice (indicador, mes)."""
+    where, params = _range_clause("i.mes", de, ate)
+    where = (where + " AND " if where else " WHERE ") + "i.indicador = ?"
+    return pd.read_sql_query(
+        "SELECT i.mes, m.periodo, i.valor FROM indicadores i JOIN metricas m USING (arquivo)"
+        f"{where} ORDER BY i.mes, i.arquivo",
+        con, params=params + [indicador],
+    )
+
+
+# -------------------------------------------------------
+# Bl.3 Tabelas derivadas e rodadas de previsão
+# -------------------------------------------------------
+def write_derived(con: sqlite3.Connection, nome: str, tabela: pd.DataFrame):
+    """
+    Grava tabela (ex.: correlações, tabela de inadimplentes) como d_<nome>, substituindo a
+    anterior. Com coluna PERIODO ganha também MES (ordinal) indexado, para filtrar por faixa.
+    """
+    tabela_sql = f"d_{nome}"
+    out = tabela.copy()
+    if "PERIODO" in out:
+        out["MES"] = _month_ordinals(out["PERIODO"])
+    with con:
+        out.to_sql(tabela_sql, con, if_exists="replace", index=False)
+        if "MES" in out:
+            con.execute(f'CREATE INDEX IF NOT EXISTS "{tabela_sql}_mes" ON "{tabela_sql}" (MES)')
+        con.execute(
+            "INSERT INTO derivadas VALUES (?, ?, ?, ?) ON CONFLICT (nome) DO UPDATE SET "
+            "tabela = excluded.tabela, linhas = excluded.linhas, atualizado_em = excluded.atualizado_em",
+            (nome, tabela_sql, len(out), _now()),
+        )
+
+
+def save_forecast_run(con: sqlite3.Connection, tabela: pd.DataFrame, modelo: str, horizonte: int = None,
+                      n_paths: int = None, metodo: str = None, parametros: dict = None) -> int:
+    """
+    Guarda uma rodada de previsão: os meses futuros da tabela do previsao.forecast_table
+    (<SERIE>_PREVISTA e, se houver, <SERIE>_P5/_P50/_P95). Devolve o id da rodada.
+    """
+    meses = _month_ordinals(tabela["PERIODO"])
+    series = [c[:-len("_PREVISTA")] for c in tabela.columns if c.endswith("_PREVISTA")]
+    prevista = (tabela[f"{series[0]}_PREVISTA"].notna().to_numpy() if series
+                else np.zeros(len(tabela), dtype=bool))
+    futuro = np.flatnonzero(prevista)
+    ultimo_mes = max((m for m, f in zip(meses, prevista) if not f and m is not None), default=None)
+
+    def col(serie, sufixo):
+        nome = f"{serie}_{sufixo}"
+        return tabela[nome].to_numpy() if nome in tabela else np.full(len(tabela), np.nan)
+
+    linhas = []
+    for serie in series:
+        valor, p5, p50, p95 = (col(serie, s) for s in ("PREVISTA", "P5", "P50", "P95"))
+        for i in futuro:
+            linhas.append((serie, meses[i], tabela["PERIODO"].iat[i],
+                           _clean(valor[i]), _clean(p5[i]), _clean(p50[i]), _clean(p95[i])))
+
+    with con:
+        cur = con.execute(
+            "INSERT INTO execucoes_previsao (criado_em, modelo, horizonte, n_paths, metodo, ultimo_mes, parametros) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_now(), modelo, horizonte, n_paths, metodo, ultimo_mes,
+             json.dumps(parametros or {}, ensure_ascii=False)),
+        )
+        execucao = cur.lastrowid
+        con.executemany(
+            "INSERT INTO previsoes (execucao, indicador, mes, periodo, valor, p5, p50, p95) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(execucao,) + linha for linha in linhas],
+        )
+    return execucao
+
+
+def latest_forecast(con: sqlite3.Connection, modelo: str = None) -> pd.DataFrame:
+    """Previsões da última rodada (do modelo, se informado)."""
+    filtro, params = ("WHERE modelo = ?", [modelo]) if modelo else ("", [])
+    return pd.read_sql_query(
+        "SELECT p.* FROM previsoes p WHERE execucao = "
+        f"(SELECT max(id) FROM execucoes_previsao {filtro}) ORDER BY indicador, mes",
+        con, params=params,
+    )
@@ -0,0 +1,107 @@
+# backends_texto.py
+
+# Backends de texto por página para o pdf2csv 2.0.py, do mais barato ao mais caro.
+#
+#   "pdfium"      o pypdfium2 (que já vem como dependência do pdfplumber) interpreta a
+#                 página em C e entrega os caracteres com as caixas; o agrupamento em
+#                 palavras e linhas é o do próprio pdfplumber (pdfplumber.utils.text).
+#                 Nos mapas da Serasa o texto sai igual ao do pdfplumber, tirando as letras
+#                 giradas/espalhadas do mês na lateral, a uma fração do custo.
+#   "pdfplumber"  o caminho de sempre (pdfminer + pdfplumber): é a referência.
+#
+# Todo backend abre o PDF como um leitor com n_pages e read(i, words). Quem escolhe
+# a ordem e decide quando escalar para o próximo é o pdf2csv 2.0.py (validação das métricas).
+
+from contextlib import contextmanager
+import ctypes
+import math
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from pdfplumber.utils.text import extract_text, extract_words
+
+
+class PdfplumberReader:
+    def __init__(self, pdf):
+        self._pdf = pdf
+        self.n_pages = len(pdf.pages)
+
+    def read(self, i: int, words: bool = False):
+        """(texto, palavras ou None) da página i."""
+        page = self._pdf.pages[i]
+        try:
+            return page.extract_text() or "", page.extract_words() if words else None
+        finally:
+            page.close()  # libera o cache de objetos da página já lida
+
+
+class PdfiumReader:
+    def __init__(self, pdf):
+        self._pdf = pdf
+        self.n_pages = len(pdf)
+
+    def chars(self, i: int) -> list:
+        """Caracteres da página no formato que o pdfplumber.utils.text espera (top a partir do topo)."""
+        page = self._pdf[i]
+        textpage = page.get_textpage()
+        try:
+            height = page.get_height()
+            box = pdfium_c.FS_RECTF()
+            chars = []
+            for k in range(textpage.count_chars()):
+                if pdfium_c.FPDFText_IsGenerated(textpage.raw, k):
+                    continue  # espaço/quebra que o pdfium inventa; quem separa palavras aqui é a geometria
+                pdfium_c.FPDFText_GetLooseCharBox(textpage.raw, k, ctypes.byref(box))
+                top, bottom = height - box.top, height - box.bottom
+                chars.append({
+                    "text": chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, k)),
+                    "x0": box.left,
+                    "x1": box.right,
+                    "top": top,
+                    "doctop": top,
+                    "bottom": bottom,
+                    "upright": abs(math.sin(pdfium_c.FPDFText_GetCharAngle(textpage.raw, k))) < 1e-3,
+                })
+            return chars
+        finally:
+            textpage.close()
+            page.close()
+
+    def read(self, i: int, words: bool = False):
+        """(texto, palavras ou None) da página i."""
+        chars = self.chars(i)
+        return extract_text(chars), extract_words(chars) if words else None
+
+
+@contextmanager
+def open_pdfplumber(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        yield PdfplumberReader(pdf)
+
+
+@contextmanager
+def open_pdfium(pdf_path):
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        yield PdfiumReader(pdf)
+    finally:
+        pdf.close()
+
+
+# Ordem padrão: o mais rápido primeiro, o pdfplumber por último como referência
+BACKENDS = {
+    "pdfium": open_pdfium,
+    "pdfplumber": open_pdfplumber,
+}
+DEFAULT_BACKENDS = ["pdfium", "pdfplumber"]
+
+
+def parse_backends(spec) -> list:
+    """'pdfium,pdfplumber' (ou lista) -> lista validada, na ordem de tentativa."""
+    names = [n.strip() for n in (spec.split(",") if isinstance(spec, str) else spec) if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown or not names:
+        raise ValueError(f"Backend de texto desconhecido: {', '.join(unknown) or '(vazio)'}; "
+                         f"disponíveis: {', '.join(BACKENDS)}")
+    return names
@@ -0,0 +1,233 @@
+# backtest.py
+
+# Backtesting com origem móvel (rolling origin) para escolher o modelo de previsão.
+# Em cada origem o (mês de corte) o modelo só enxerga Y[:o] (janela crescente) ou
+# Y[o-window:o] (janela móvel) e prevê os h meses seguintes; o erro por horizonte
+# (1 mês à frente, 2 meses...) somado em todas as origens diz qual modelo usar.
+#
+# Os modelos trabalham em lote, com todas as séries de uma vez (como em previsao.py),
+# e reaproveitam o ajuste de uma origem para a seguinte: a tendência linear sai de
+# somas acumuladas e o Holt é uma passada só, guardando o estado em cada origem.
+# As origens podem ser divididas entre processos (workers), como no render_figures.
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import periodos
+import previsao
+
+SEASON = 12
+# Grade de suavização do Holt: todas as combinações rodam juntas e cada série,
+# em cada origem, fica com a de menor erro um passo à frente até ali
+ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+
+
+# -------------------------------------------------------
+# Bl.1 Modelos: f(Y, origins, horizon, window) -> previsões (origens, horizonte, séries)
+# -------------------------------------------------------
+def _window_start(origins: np.ndarray, window) -> np.ndarray:
+    return np.zeros_like(origins) if window is None else np.maximum(origins - window, 0)
+
+
+def linear_trend(Y: np.ndarray, origins, horizon: int, window=None) -> np.ndarray:
+    """Reta por mínimos quadrados; as somas acumuladas dão o ajuste de todas as origens de uma vez."""
+    n, k = Y.shape
+    o = np.asarray(origins)
+    lo = _window_start(o, window)
+
+    valid = ~np.isnan(Y)
+    w = valid.astype(float)
+    y = np.where(valid, Y, 0.0)
+    t = np.arange(n, dtype=float)[:, None]
+
+    def window_sum(a):
+        # S[i] = soma de a[:i]; soma na janela [lo, o) = S[o] - S[lo]
+        S = np.vstack([np.zeros((1, k)), np.cumsum(a, axis=0)])
+        return S[o] - S[lo]
+
+    s1, st, stt, sy, sty = (window_sum(a) for a in (w, w * t, w * t * t, y, y * t))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        den = s1 * stt - st ** 2
+        b = np.where(den > 0, (s1 * sty - st * sy) / den, np.nan)
+        a = (sy - b * st) / s1
+
+    future_t = o[:, None] + np.arange(horizon)[None, :]
+    return a[:, None, :] + b[:, None, :] * future_t[:, :, None]
+
+
+def drift(Y: np.ndarray, origins, horizon: int, window=None) -> np.ndarray:
+    """Último valor mais a inclinação média entre o primeiro e o último ponto da janela."""
+    o = np.asarray(origins)
+    lo = _window_start(o, window)
+    last, first = Y[o - 1], Y[lo]
+    slope = (last - first) / np.maximum(o - 1 - lo, 1)[:, None]
+    steps = np.arange(1, horizon + 1)
+    return last[:, None, :] + slope[:, None, :] * steps[None, :, None]
+
+
+def seasonal_naive(Y: np.ndarray, origins, horizon: int, window=None) -> np.ndarray:
+    """Repete o mesmo mês do ano anterior; sem 12 meses de histórico a previsão fica NaN."""
+    o = np.asarray(origins)
+    idx = o[:, None] - SEASON + (np.arange(horizon) % SEASON)[None, :]
+    fc = Y[np.clip(idx, 0, None)]
+    fc[idx < 0] = np.nan
+    return fc
+
+
+def holt(Y: np.ndarray, origins, horizon: int, window=None) -> np.ndarray:
+    """
+    Suavização exponencial com tendência (Holt). window não se aplica: o próprio
+    alpha/beta já esquece o passado distante.
+    """
+    n, k = Y.shape
+    o = np.asarray(origins)
+    out = np.full((len(o), horizon, k), np.nan)
+    if len(o) == 0:
+        return out
+    slot = {int(x): i for i, x in enumerate(o)}
+
+    a = np.repeat(ALPHAS, len(BETAS))[:, None]
+    b = np.tile(BETAS, len(ALPHAS))[:, None]
+    level = np.repeat(Y[:1], len(a), axis=0)
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    steps = np.arange(1, horizon + 1)[:, None]
+    cols = np.arange(k)
+
+    def record(m):
+        best = np.argmin(sse, axis=0)
+        out[slot[m]] = level[best, cols] + steps * trend[best, cols]
+
+    if 1 in slot:
+        record(1)
+    for m in range(1, int(o.max())):
+        y = Y[m]
+        ok = ~np.isnan(y)
+        fresh = ok & np.isnan(level)     # série que começa com NaN: o nível nasce aqui
+        pred = level + trend
+        err = np.where(ok & ~fresh, y - pred, 0.0)
+        sse += err ** 2
+        new_level = np.where(ok, a * y + (1 - a) * pred, pred)
+        new_level = np.where(fresh, y, new_level)
+        trend = np.where(ok & ~fresh, b * (new_level - level) + (1 - b) * trend, trend)
+        trend = np.where(fresh, 0.0, trend)
+        level = new_level
+        if m + 1 in slot:
+            record(m + 1)
+    return out
+
+
+MODELS = {
+    "linear_trend": linear_trend,
+    "seasonal_naive": seasonal_naive,
+    "drift": drift,
+    "holt": holt,
+}
+
+
+# -------------------------------------------------------
+# Bl.2 Origens (folds) em paralelo
+# -------------------------------------------------------
+def _forecast_chunk(model: str, Y: np.ndarray, origins, horizon: int, window):
+    return MODELS[model](Y, origins, horizon, window)
+
+
+def backtest_forecasts(Y: np.ndarray, origins, horizon: int, models, window=None, workers: int = 1) -> dict:
+    """{modelo: previsões (origens, horizonte, séries)}; com workers > 1 as origens são repartidas entre processos."""
+    origins = np.asarray(origins)
+    if workers <= 1 or len(origins) < 2:
+        return {m: MODELS[m](Y, origins, horizon, window) for m in models}
+
+    chunks = [c for c in np.array_split(origins, workers) if len(c)]
+    tasks = [(m, c) for m in models for c in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_forecast_chunk, m, Y, c, horizon, window) for m, c in tasks]
+        parts = [f.result() for f in futures]
+
+    out = {}
+    for (m, _), part in zip(tasks, parts):
+        out.setdefault(m, []).append(part)
+    return {m: np.concatenate(p) for m, p in out.items()}
+
+
+# -------------------------------------------------------
+# Bl.3 Erros por horizonte e escolha do modelo
+# -------------------------------------------------------
+def error_table(Y: np.ndarray, origins, forecasts: dict, cols) -> pd.DataFrame:
+    """Uma linha por (MODELO, SERIE, HORIZONTE): N de previsões avaliadas, MAE, RMSE e MAPE (%)."""
+    n, k = Y.shape
+    o = np.asarray(origins)
+    horizon = next(iter(forecasts.values())).shape[1]
+
+    idx = o[:, None] + np.arange(horizon)[None, :]
+    inside = idx < n
+    actual = np.full((len(o), horizon, k), np.nan)
+    actual[inside] = Y[idx[inside]]
+
+    serie = np.tile(np.asarray(cols, dtype=object), horizon)
+    horizonte = np.repeat(np.arange(1, horizon + 1), k)
+    frames = []
+    for model, fc in forecasts.items():
+        err = fc - actual
+        valid = ~np.isnan(err)
+        cnt = valid.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mae = np.nansum(np.abs(err), axis=0) / cnt
+            rmse = np.sqrt(np.nansum(err ** 2, axis=0) / cnt)
+            mape = 100 * np.nansum(np.abs(err / actual), axis=0) / cnt
+        frames.append(pd.DataFrame({
+            "MODELO": model,
+            "SERIE": serie,
+            "HORIZONTE": horizonte,
+            "N": cnt.ravel(),
+            "MAE": mae.ravel(),
+            "RMSE": rmse.ravel(),
+            "MAPE": mape.ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def select_best(tabela: pd.DataFrame, metric: str = "RMSE") -> pd.DataFrame:
+    """
+    Modelo de menor erro médio entre os horizontes, por série.
+    Só concorre quem foi avaliado em todos os horizontes (ex.: seasonal_naive sem 12 meses fica de fora).
+    """
+    g = (
+        tabela.groupby(["SERIE", "MODELO"], sort=False)
+        .agg(ERRO=(metric, "mean"), N_MIN=("N", "min"))
+        .reset_index()
+    )
+    g = g[(g["N_MIN"] > 0) & g["ERRO"].notna()]
+    best = g.loc[g.groupby("SERIE", sort=False)["ERRO"].idxmin(), ["SERIE", "MODELO", "ERRO"]]
+    return best.rename(columns={"ERRO": f"{metric}_MEDIO"}).reset_index(drop=True)
+
+
+def run_backtest(df: pd.DataFrame, cols=None, models=None, horizon: int = 3,
+                 min_train: int = 6, window=None, workers: int = 1) -> pd.DataFrame:
+    """
+    Backtest de todos os modelos em todas as séries; df em ordem temporal.
+    Origens de min_train até o último mês; window=None é janela crescente, um inteiro é janela móvel.
+    """
+    cols = [c for c in (previsao.INDICADORES if cols is None else cols) if c in df]
+    models = list(MODELS) if models is None else list(models)
+    Y = df[cols].to_numpy(dtype=float)
+    origins = np.arange(max(min_train, 2), len(df))
+    forecasts = backtest_forecasts(Y, origins, horizon, models, window, workers)
+    return error_table(Y, origins, forecasts, cols)
+
+
+def forecast_selected(df: pd.DataFrame, escolhidos: pd.DataFrame, horizon: int = 5, window=None) -> pd.DataFrame:
+    """Previsão dos próximos meses com o modelo escolhido de cada série, ajustado no histórico todo."""
+    Y_all = df[list(escolhidos["SERIE"])].to_numpy(dtype=float)
+    future = periodos.future_periods(df["PERIODO_M"].iloc[-1], horizon)
+    out = pd.DataFrame(index=pd.Index(periodos.period_label(pd.Series(future)), name="PERIODO"))
+    origin = np.array([len(df)])
+    for model, grupo in escolhidos.groupby("MODELO", sort=False):
+        idx = grupo.index.to_numpy()
+        fc = MODELS[model](Y_all[:, idx], origin, horizon, window)[0]
+        for j, serie in enumerate(grupo["SERIE"]):
+            out[serie] = fc[:, j]
+    return out[list(escolhidos["SERIE"])]
@@ -0,0 +1,272 @@
+# benchmark.py
+
+# Mede como o pdf2csv 2.0.py e o EDA.py escalam com o tamanho do corpus.
+# Gera corpora sintéticos (corpus_sintetico.py) de 10, 1.000 e 10.000 PDFs,
+# cronometra cada etapa separadamente e grava tudo num JSON que pode ser
+# comparado com uma rodada anterior (--compare).
+#
+# Uso: python src/benchmark.py --sizes 10 1000 10000 --output bench.json --compare bench_antigo.json
+#      python src/benchmark.py --memory --sizes 10 100 1000   (RSS do build_dataset por tamanho)
+
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from corpus_sintetico import generate_corpus
+from memoria import current_rss_mb, peak_rss_mb
+from pdf2csv_modulo import load_pdf2csv
+
+
+def measure(stage: str, size: int, n_files: int, fn, trace_memory: bool = False):
+    """Roda fn() calado, e devolve (resultado, registro com tempo, vazão e memória)."""
+    if trace_memory:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = fn()
+    elapsed = time.perf_counter() - inicio
+
+    record = {
+        "size": size,
+        "stage": stage,
+        "files": n_files,
+        "seconds": round(elapsed, 4),
+        "files_per_s": round(n_files / elapsed, 2) if n_files and elapsed > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if trace_memory:
+        record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    print(f"[BENCH] {size:>6} | {stage:<28} {elapsed:9.3f}s"
+          + (f" | {record['files_per_s']} arquivos/s" if record["files_per_s"] else ""))
+    return result, record
+
+
+def ensure_corpus(work_dir: Path, size: int, pages: int) -> Path:
+    corpus = work_dir / f"corpus_{size}_{pages}p"
+    if not corpus.exists() or len(list(corpus.glob("*.pdf"))) != size:
+        print(f"[INFO] Gerando corpus sintético com {size} PDFs em {corpus}...")
+        generate_corpus(corpus, size, n_pages=pages)
+    return corpus
+
+
+def bench_size(size: int, work_dir: Path, sample: int, workers: int,
+               eda_max_rows: int, pages: int, trace_memory: bool) -> list:
+    pdf2csv = load_pdf2csv()
+    corpus = ensure_corpus(work_dir, size, pages)
+    files = sorted(corpus.glob("*.pdf"))
+    amostra = files[:sample]
+    records = []
+    # Camada de texto própria do corpus: o build_dataset apaga as camadas de PDFs que não estão na pasta
+    pdf2csv.TEXT_STORE_DIR = work_dir / f"textos_{size}_{pages}p"
+
+    # Etapas por arquivo: medidas numa amostra, senão 10.000 PDFs lidos inteiros levariam horas
+    _, r = measure("extract_text_pdfplumber", size, len(amostra),
+                   lambda: [pdf2csv.extract_text_pdfplumber(f) for f in amostra], trace_memory)
+    records.append(r)
+    _, r = measure("extract_metrics_from_pdf", size, len(amostra),
+                   lambda: [pdf2csv.extract_metrics_from_pdf(f) for f in amostra], trace_memory)
+    records.append(r)
+    # pdfium primeiro, pdfplumber só se as métricas não validarem (padrão do build_dataset)
+    _, r = measure("extract_metrics_pdfium", size, len(amostra),
+                   lambda: [pdf2csv.extract_metrics_from_pdf(f, backends=pdf2csv.DEFAULT_BACKENDS)
+                            for f in amostra], trace_memory)
+    records.append(r)
+
+    # Com o template de layout já aprendido no 1º PDF: só a página e os recortes das métricas
+    pdf2csv.LAYOUT_TEMPLATES.clear()
+    pdf2csv.extract_metrics_from_pdf(amostra[0], layout=True)
+    _, r = measure("extract_metrics_layout", size, len(amostra),
+                   lambda: [pdf2csv.extract_metrics_from_pdf(f, layout=True) for f in amostra], trace_memory)
+    records.append(r)
+
+    # Regex de novo em cima da camada de texto já gravada (o caso de mexer nas regras de parsing)
+    for f in amostra:
+        pdf2csv.extract_metrics_from_pdf(f, text_store=True)
+    _, r = measure("extract_metrics_text_store", size, len(amostra),
+                   lambda: [pdf2csv.extract_metrics_from_pdf(f, text_store=True) for f in amostra], trace_memory)
+    records.append(r)
+
+    # build_dataset no corpus inteiro, sem cache para medir a extração de verdade
+    pdf2csv.PDF_DIR = corpus
+    pdf2csv.OUTPUT_CSV = work_dir / f"serasa_{size}.csv"
+    pdf2csv.LAYOUT_PATH = work_dir / "layouts.json"
+    pdf2csv.STATS_PATH = work_dir / f"estatisticas_{size}.json"
+    pdf2csv.STATUS_PATH = work_dir / f"status_{size}.json"
+    pdf2csv.VALIDATION_PATH = work_dir / f"validacao_{size}.csv"
+    pdf2csv.LAYOUT_TEMPLATES.clear()
+    _, r = measure("build_dataset", size, size,
+                   lambda: pdf2csv.build_dataset(workers=workers, use_cache=False), trace_memory)
+    records.append(r)
+
+    records += bench_eda(size, work_dir, pdf2csv.OUTPUT_CSV, eda_max_rows, trace_memory)
+    return records
+
+
+def bench_eda(size: int, work_dir: Path, csv_path: Path, eda_max_rows: int, trace_memory: bool) -> list:
+    import EDA
+
+    # Tudo que o EDA grava (figuras e tabelas) vai para a pasta de trabalho do benchmark
+    eda_dir = work_dir / f"eda_{size}"
+    EDA.BASE_DIR = eda_dir
+    EDA.FIG_DIR = eda_dir / "figures"
+    EDA.FIG_DIR.mkdir(parents=True, exist_ok=True)
+
+    records = []
+    df, r = measure("eda.load_data", size, 0, lambda: EDA.load_data(csv_path), trace_memory)
+    records.append(r)
+
+    # Pizza/eixos com milhares de rótulos não dizem nada sobre o pipeline, então o EDA usa no máximo eda_max_rows
+    df = df.head(eda_max_rows).copy()
+    stages = [
+        ("eda.basic_stats", lambda: EDA.eda_basic_stats(df)),
+        ("eda.correlations", lambda: [EDA.eda_correlations(df), EDA.plot_correlation_heatmap(df)]),
+        ("eda.correlation_analysis", lambda: EDA.correlation_analysis(df, heatmap=True)),
+        ("eda.time_series_plots", lambda: [
+            EDA.plot_inadimplentes_time_series(df),
+            EDA.plot_vmpp_time_series(df),
+            EDA.plot_dividas_time_series(df),
+            EDA.plot_vmcd_time_series(df),
+            EDA.plot_vtdd_time_series(df),
+        ]),
+        ("eda.histograms_boxplots", lambda: EDA.plot_histograms_boxplots(df)),
+        ("eda.inadimplentes_table_pie", lambda: [
+            EDA.build_inadimplentes_table(df),
+            EDA.plot_inadimplentes_pie(df),
+        ]),
+        ("eda.train_vtdd_model", lambda: EDA.train_vtdd_model(df)),
+        ("eda.forecast_indicators", lambda: EDA.forecast_indicators(df)),
+        # 10.000 trajetórias x 5 meses x 7 indicadores num array só
+        ("eda.simulate_paths", lambda: EDA.previsao.simulate_paths(EDA.previsao.forecast_batch(df))),
+        ("eda.select_forecast_models", lambda: EDA.select_forecast_models(df)),
+    ]
+    for stage, fn in stages:
+        _, r = measure(stage, size, 0, fn, trace_memory)
+        r["rows"] = len(df)
+        records.append(r)
+
+    # Serviço de consulta: carga do snapshot e 1.000 consultas por período já em memória
+    import servico_consulta
+    servico, r = measure("api.snapshot", size, 0, lambda: servico_consulta.ServicoConsulta(csv_path), trace_memory)
+    records.append(r)
+    _, r = measure("api.consultas_1000", size, 0, lambda: [
+        servico.handle("/indicadores?de=jan/25&ate=dez/25&indicadores=VTDD_BI,VMPP") for _ in range(1000)
+    ], trace_memory)
+    records.append(r)
+    return records
+
+
+def bench_memory(sizes, work_dir: Path, pages: int, flush_every: int) -> list:
+    """
+    Pico de RSS do build_dataset (normal e --stream) por tamanho de corpus. Cada rodada é um
+    processo novo, porque o pico (ru_maxrss) vale para o processo inteiro e não dá para zerar.
+    Lê todas as páginas de todos os PDFs (sem lazy, template ou camada de texto): é o pior caso.
+    """
+    records = []
+    for size in sizes:
+        corpus = ensure_corpus(work_dir, size, pages)
+        for stream in (False, True):
+            stage = "memory.build_dataset" + ("_stream" if stream else "")
+            cmd = [sys.executable, __file__, "--memory-child", str(corpus),
+                   "--work-dir", str(work_dir), "--flush-every", str(flush_every)]
+            if stream:
+                cmd.append("--stream")
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            r = {"size": size, "stage": stage, "files": size, **json.loads(out.stdout.splitlines()[-1])}
+            print(f"[BENCH] {size:>6} | {stage:<28} {r['seconds']:9.3f}s | pico {r['peak_rss_mb']} MB")
+            records.append(r)
+    return records
+
+
+def memory_child(corpus: Path, work_dir: Path, stream: bool, flush_every: int):
+    # Roda no processo filho do bench_memory; a última linha do stdout é o registro em JSON
+    pdf2csv = load_pdf2csv()
+    pdf2csv.PDF_DIR = corpus
+    pdf2csv.OUTPUT_CSV = work_dir / f"serasa_mem_{corpus.name}.csv"
+    pdf2csv.VALIDATION_PATH = work_dir / f"validacao_mem_{corpus.name}.csv"
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        pdf2csv.build_dataset(use_cache=False, lazy=False, use_layouts=False, text_store=False,
+                              stream=stream, flush_every=flush_every, online_stats=False)
+    print(json.dumps({
+        "seconds": round(time.perf_counter() - inicio, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "final_rss_mb": current_rss_mb(),
+    }))
+
+
+def compare(current: list, previous_path: Path):
+    previous = json.loads(Path(previous_path).read_text(encoding="utf-8"))["results"]
+    before = {(r["size"], r["stage"]): r["seconds"] for r in previous}
+    print("\n=== Comparação com", previous_path, "===")
+    for r in current:
+        old = before.get((r["size"], r["stage"]))
+        if old:
+            print(f"{r['size']:>6} | {r['stage']:<28} {old:9.3f}s -> {r['seconds']:9.3f}s "
+                  f"({r['seconds'] / old:5.2f}x)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark do pdf2csv 2.0.py e do EDA.py com corpus sintético.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--work-dir", type=Path, default=Path(tempfile.gettempdir()) / "serasa_bench",
+                        help="onde ficam os corpora gerados (reaproveitados entre rodadas) e as saídas")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_resultados.json"))
+    parser.add_argument("--compare", type=Path, help="JSON de uma rodada anterior para comparar")
+    parser.add_argument("--sample", type=int, default=20,
+                        help="PDFs usados nas etapas medidas arquivo a arquivo")
+    parser.add_argument("--workers", type=int, default=1, help="repassado ao build_dataset")
+    parser.add_argument("--pages", type=int, default=22, help="páginas por PDF sintético")
+    parser.add_argument("--eda-max-rows", type=int, default=1000)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="mede também o pico de alocações Python por etapa (tracemalloc, deixa tudo mais lento)")
+    parser.add_argument("--memory", action="store_true",
+                        help="só o benchmark de memória: pico de RSS do build_dataset por tamanho de corpus")
+    parser.add_argument("--flush-every", type=int, default=100, help="lote do build_dataset --stream no --memory")
+    parser.add_argument("--memory-child", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--stream", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    if args.memory_child:
+        memory_child(args.memory_child, args.work_dir, args.stream, args.flush_every)
+        return
+
+    results = []
+    if args.memory:
+        results += bench_memory(args.sizes, args.work_dir, args.pages, args.flush_every)
+    else:
+        for size in args.sizes:
+            results += bench_size(size, args.work_dir, args.sample, args.workers,
+                                  args.eda_max_rows, args.pages, args.trace_memory)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: str(v) for k, v in vars(args).items()},
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] Resultados gravados em: {args.output.resolve()}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
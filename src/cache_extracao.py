@@ -0,0 +1,41 @@
+# cache_extracao.py
+
+# Cache em disco dos resultados de extract_metrics_from_pdf.
+# A chave é o hash SHA-256 do conteúdo do PDF + a versão do extrator, então
+# renomear um arquivo não invalida nada e mudar as regex (subindo a versão) invalida tudo.
+
+from pathlib import Path
+import hashlib
+import json
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(path: Path, extractor_version: str, sha: str = None) -> str:
+    # sha já calculado (ex.: também usado pela camada de texto) evita ler o PDF duas vezes
+    return f"{extractor_version}:{sha or file_sha256(path)}"
+
+
+def load_cache(cache_path: Path) -> dict:
+    """Lê o cache; arquivo ausente ou corrompido vira cache vazio (só custa uma reextração)."""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_cache(cache_path: Path, cache: dict):
+    # Grava num temporário e renomeia, para não deixar o cache pela metade se o processo cair
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_suffix(cache_path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    tmp.replace(cache_path)
@@ -0,0 +1,83 @@
+# camada_texto.py
+
+# Camada de texto dos PDFs guardada em disco, separada das métricas.
+# O cache_extracao.py guarda o resultado das regex; quando a regex muda (sobe a
+# EXTRACTOR_VERSION) ele inteiro deixa de valer e todo PDF voltava para o layout
+# do pdfplumber, que é a parte cara. Aqui fica o texto de cada página já lida
+# (e, se pedido, as palavras com coordenadas), então mexer nas regras de parsing
+# só custa rodar as regex de novo em cima do texto guardado.
+#
+# Um arquivo .json.gz por PDF e backend de texto (backends_texto.py), com o SHA-256 do
+# conteúdo no nome: renomear o PDF não invalida nada, e o mesmo PDF em duas pastas
+# divide a mesma camada.
+# As páginas entram conforme são lidas (a leitura lazy guarda só as que abriu);
+# uma página que faltar é lida do PDF na próxima vez e acrescentada.
+
+from pathlib import Path
+import gzip
+import json
+
+# Sobe quando mudar o jeito de extrair o texto da página (ex.: parâmetros do extract_text)
+TEXT_LAYER_VERSION = "2"
+
+
+def new_layer() -> dict:
+    # "pages" e "words" usam a página como texto ("3") porque as chaves do JSON são strings
+    return {"version": TEXT_LAYER_VERSION, "n_pages": None, "pages": {}, "words": {}}
+
+
+def layer_path(store_dir: Path, sha: str, backend: str) -> Path:
+    return Path(store_dir) / f"{sha}.{backend}.json.gz"
+
+
+def load_layer(store_dir: Path, sha: str, backend: str):
+    """Camada do PDF com esse hash, ou None (ausente, corrompida ou de outra versão)."""
+    try:
+        with gzip.open(layer_path(store_dir, sha, backend), "rt", encoding="utf-8") as f:
+            layer = json.load(f)
+    except (OSError, ValueError, EOFError):
+        return None
+    if not isinstance(layer, dict) or layer.get("version") != TEXT_LAYER_VERSION:
+        return None
+    return layer
+
+
+def save_layer(store_dir: Path, sha: str, backend: str, layer: dict):
+    # Mesmo esquema do save_cache: temporário + rename, para não deixar arquivo pela metade
+    path = layer_path(store_dir, sha, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(layer, f, ensure_ascii=False, separators=(",", ":"))
+    tmp.replace(path)
+
+
+def layer_size(layer: dict) -> tuple:
+    """(páginas, páginas com palavras): comparado antes/depois para saber se a camada cresceu."""
+    return len(layer["pages"]), len(layer["words"])
+
+
+def page_words(words: list) -> list:
+    """Palavras (dicts do extract_words do pdfplumber) como [x0, top, x1, bottom, texto], em pontos."""
+    return [
+        [round(w["x0"], 2), round(w["top"], 2), round(w["x1"], 2), round(w["bottom"], 2), w["text"]]
+        for w in words
+    ]
+
+
+def drop_layers(store_dir: Path, shas):
+    """Apaga as camadas desses hashes, de todos os backends (--rebuild-text)."""
+    for sha in shas:
+        for path in Path(store_dir).glob(f"{sha}.*.json.gz"):
+            path.unlink(missing_ok=True)
+
+
+def prune_layers(store_dir: Path, keep) -> int:
+    """Apaga as camadas de PDFs que não existem mais; devolve quantas saíram."""
+    keep = set(keep)
+    removed = 0
+    for path in Path(store_dir).glob("*.json.gz"):
+        if path.name.split(".", 1)[0] not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
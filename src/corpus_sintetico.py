@@ -0,0 +1,173 @@
+# corpus_sintetico.py
+
+# Gera PDFs sintéticos no estilo do "Mapa da Inadimplência" da Serasa, sem
+# dependência nenhuma além da biblioteca padrão: o PDF é escrito "na mão"
+# (Helvetica + WinAnsiEncoding, que cobre os acentos do português).
+# A página de métricas reproduz os rótulos e os formatos reais
+# ("76,6 mi R$ 5.968,71", "R$ 457 bi", "R$ 10,5 bilhões"), então o
+# extract_metrics_from_pdf funciona nela igual aos relatórios de verdade.
+#
+# Uso: python src/corpus_sintetico.py <pasta> -n 1000
+
+from pathlib import Path
+import argparse
+import random
+
+MESES = [
+    "Janeiro", "Fevereiro", "Marco", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
+]
+
+PAGE_W, PAGE_H = 960, 540
+METRICS_PAGE = 3  # mesma posição dos relatórios reais
+
+
+# -------------------------------------------------------
+# Bl.1 Escrita do PDF
+# -------------------------------------------------------
+def _pdf_string(s: str) -> bytes:
+    b = s.encode("cp1252", errors="replace")
+    return b"(" + b.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _page_stream(lines) -> bytes:
+    """lines: lista de (x, y, tamanho_fonte, texto)."""
+    ops = [b"BT"]
+    for x, y, size, text in lines:
+        ops.append(b"/F1 %d Tf 1 0 0 1 %d %d Tm %s Tj" % (size, x, y, _pdf_string(text)))
+    ops.append(b"ET")
+    return b"\n".join(ops)
+
+def write_pdf(path: Path, pages):
+    """pages: lista de páginas, cada uma uma lista de (x, y, tamanho_fonte, texto)."""
+    objs = []  # objs[k] é o objeto k + 1
+
+    def add(body: bytes) -> int:
+        objs.append(body)
+        return len(objs)
+
+    catalog = add(b"")  # preenchido depois que soubermos o id de /Pages
+    pages_id = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    kids = []
+    for lines in pages:
+        stream = _page_stream(lines)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, PAGE_W, PAGE_H, font, content)
+        ))
+
+    objs[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    objs[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for k, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (k, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    path.write_bytes(bytes(out))
+
+
+# -------------------------------------------------------
+# Bl.2 Conteúdo no formato da Serasa
+# -------------------------------------------------------
+def _brl(v: float, decimals: int = 2) -> str:
+    """5968.71 -> '5.968,71' (formato brasileiro)."""
+    s = f"{v:,.{decimals}f}"
+    return s.replace(",", "X").replace(".", ",").replace("X", ".")
+
+def random_metrics(rng: random.Random) -> dict:
+    inad = round(rng.uniform(60, 90), 1)
+    vmpp = round(rng.uniform(4500, 7000), 2)
+    dividas = round(rng.uniform(250, 330), 1)
+    return {
+        "INADIMPLENTES_MI": inad,
+        "VMPP": vmpp,
+        "DIVIDAS_MI": dividas,
+        "VMCD": round(inad * vmpp / dividas, 2),
+        "VTDD_BI": float(round(inad * vmpp / 1000)),
+        "VMAF": round(rng.uniform(500, 900), 2),
+        "DESCONTOS_BI": round(rng.uniform(8, 18), 1),
+    }
+
+def metrics_page(m: dict, mes: str, ano: int):
+    return [
+        (60, 470, 22, f"R$ {_brl(m['VMAF'])}"),
+        (60, 445, 12, "VALOR MÉDIO DOS"),
+        (60, 430, 12, "ACORDOS FECHADOS"),
+        (520, 470, 12, "+ de"),
+        (520, 445, 22, f"R$ {_brl(m['DESCONTOS_BI'], 1)} bilhões"),
+        (60, 380, 22, f"{_brl(m['INADIMPLENTES_MI'], 1)} mi R$ {_brl(m['VMPP'])} EM DESCONTOS CONCEDIDOS"),
+        (60, 355, 12, "INADIMPLENTES VALOR MÉDIO POR PESSOA"),
+        (60, 335, 10, "+1,15% +3,02%"),
+        (60, 285, 22, f"{_brl(m['DIVIDAS_MI'], 1)} mi R$ {_brl(m['VMCD'])}"),
+        (60, 260, 12, "DÍVIDAS VALOR MÉDIO DE CADA DÍVIDA"),
+        (60, 240, 10, "+2,27% +1,89%"),
+        (60, 190, 22, f"R$ {m['VTDD_BI']:.0f} bi"),
+        (60, 165, 12, "VALOR TOTAL DAS DÍVIDAS"),
+        (60, 145, 10, "+4,20%"),
+        (60, 40, 8, f"FONTE: SERASA | {mes.upper()} {ano} EVOLUÇÃO EM COMPARAÇÃO COM O MÊS ANTERIOR."),
+    ]
+
+def filler_page(rng: random.Random, k: int):
+    # Páginas de texto corrido e números soltos, como as de recortes regionais e faixas etárias
+    lines = [(60, 490, 18, f"Inadimplência por região – página {k + 1}")]
+    for i in range(12):
+        uf = rng.choice(["SP", "RJ", "MG", "BA", "RS", "PR", "PE", "CE", "AM", "DF"])
+        lines.append((60, 450 - 30 * i, 11, f"{uf}: {_brl(rng.uniform(1, 20), 2)}% da população adulta – "
+                                              f"{_brl(rng.uniform(0.5, 15), 1)} milhões de pessoas"))
+    return lines
+
+def synthetic_report(path: Path, rng: random.Random, mes: str, ano: int, n_pages: int = 22) -> dict:
+    m = random_metrics(rng)
+    pages = []
+    for k in range(n_pages):
+        if k == 0:
+            pages.append([(300, 270, 28, f"{mes.upper()} | {ano}")])
+        elif k == min(METRICS_PAGE, n_pages - 1):
+            pages.append(metrics_page(m, mes, ano))
+        else:
+            pages.append(filler_page(rng, k))
+    write_pdf(path, pages)
+    return m
+
+
+def generate_corpus(out_dir: Path, n_docs: int, n_pages: int = 22, seed: int = 42) -> list:
+    """
+    Gera n_docs PDFs em out_dir. Os nomes seguem "SERASA Mapa da Inadimplencia <Mês> <Ano>.pdf";
+    passando de 12 meses por ano entram edições regionais (prefixo R0001, R0002...),
+    porque period_from_filename só olha o "<Mês> <Ano>" do final.
+    Devolve a lista de (arquivo, métricas esperadas).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    generated = []
+    for i in range(n_docs):
+        mes = MESES[i % 12]
+        ano = 2024 + (i // 12) % 10
+        regiao = i // 120
+        prefix = f"R{regiao:04d} " if regiao else ""
+        path = out_dir / f"SERASA Mapa da Inadimplencia {prefix}{mes} {ano}.pdf"
+        generated.append((path, synthetic_report(path, rng, mes, ano, n_pages)))
+    return generated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético de mapas da Serasa em PDF.")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("-n", "--docs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=22)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate_corpus(args.out_dir, args.docs, args.pages, args.seed)
+    print(f"[OK] {args.docs} PDFs gerados em {args.out_dir.resolve()}")
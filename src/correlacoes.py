@@ -0,0 +1,141 @@
+# correlacoes.py
+
+# Correlações móveis e defasadas (lead/lag) entre os indicadores, em lote.
+# Em vez de um df.rolling(w).corr() por par e por janela, as somas que entram no
+# Pearson (n, Σa, Σb, Σa², Σb², Σab) viram somas acumuladas no tempo: a janela que
+# termina em e é C[e] - C[e-w], para todas as janelas e todos os pares de uma vez.
+# A defasagem L só desloca um lado (a_t contra b_{t+L}) antes da mesma conta.
+#
+# Valores ausentes são tratados par a par (como no DataFrame.corr): cada par usa só
+# os meses em que as duas séries existem. Se não houver NaN, as somas por série saem
+# de vetores (n, k) e só Σab precisa do cubo (n, k, k).
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------
+# Bl.1 Pearson por janela, todas as combinações de colunas
+# -------------------------------------------------------
+def _window_sums(X: np.ndarray, window) -> np.ndarray:
+    """Somas de X (n, ...) em cada janela de tamanho window (n - window + 1, ...); None = amostra inteira."""
+    if window is None:
+        return X.sum(axis=0, keepdims=True)
+    C = np.concatenate([np.zeros((1,) + X.shape[1:]), np.cumsum(X, axis=0)])
+    return C[window:] - C[:-window]
+
+
+def windowed_corr(A: np.ndarray, B: np.ndarray, window=None, min_periods: int = None):
+    """
+    Correlação de cada coluna de A (n, k) com cada coluna de B (n, m), alinhadas no tempo,
+    em todas as janelas de tamanho window (ou na amostra inteira com window=None).
+    Devolve (corr, n_obs), ambos (janelas, k, m); corr é NaN com menos de min_periods meses
+    (padrão: a janela inteira, ou 3 na amostra inteira) ou variância zero.
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    if min_periods is None:
+        min_periods = 3 if window is None else window
+    # Centrar não muda o Pearson e evita o cancelamento de Σa² - (Σa)²/n com valores grandes
+    A = A - np.nanmean(A, axis=0)
+    B = B - np.nanmean(B, axis=0)
+    va, vb = np.isfinite(A), np.isfinite(B)
+    a, b = np.where(va, A, 0.0), np.where(vb, B, 0.0)
+
+    sab = _window_sums(a[:, :, None] * b[:, None, :], window)
+    if va.all() and vb.all():
+        n_obs = np.full(sab.shape, float(len(A) if window is None else window))
+        sa = _window_sums(a, window)[:, :, None]
+        saa = _window_sums(a * a, window)[:, :, None]
+        sb = _window_sums(b, window)[:, None, :]
+        sbb = _window_sums(b * b, window)[:, None, :]
+    else:
+        wa, wb = va.astype(float), vb.astype(float)
+        n_obs = _window_sums(wa[:, :, None] * wb[:, None, :], window)
+        sa = _window_sums(a[:, :, None] * wb[:, None, :], window)
+        saa = _window_sums((a * a)[:, :, None] * wb[:, None, :], window)
+        sb = _window_sums(wa[:, :, None] * b[:, None, :], window)
+        sbb = _window_sums(wa[:, :, None] * (b * b)[:, None, :], window)
+
+    cov = n_obs * sab - sa * sb
+    var_a = n_obs * saa - sa * sa
+    var_b = n_obs * sbb - sb * sb
+    # Janela constante: a diferença das somas acumuladas deixa só ruído de arredondamento
+    const = (var_a <= 1e-10 * n_obs * saa) | (var_b <= 1e-10 * n_obs * sbb)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.sqrt(var_a * var_b)
+    corr[(n_obs < min_periods) | const] = np.nan
+    return np.clip(corr, -1.0, 1.0), n_obs.astype(int)
+
+
+def lagged(Y: np.ndarray, lag: int):
+    """Pares alinhados (Y_t, Y_{t+lag}) para lag >= 0: a linha i de A e a de B distam lag meses."""
+    n = len(Y)
+    return Y[:n - lag], Y[lag:]
+
+
+# -------------------------------------------------------
+# Bl.2 Tabelas "tidy" (uma linha por par/janela/defasagem)
+# -------------------------------------------------------
+def rolling_table(df: pd.DataFrame, columns, windows=(6, 12), min_periods: int = None) -> pd.DataFrame:
+    """
+    PERIODO (último mês da janela), JANELA, SERIE_A, SERIE_B, CORR, N para cada par
+    (só SERIE_A antes de SERIE_B na ordem de columns, a matriz é simétrica) e cada janela.
+    df já em ordem de período.
+    """
+    columns = list(columns)
+    Y = df[columns].to_numpy(dtype=float)
+    labels = df["PERIODO"].to_numpy()
+    ia, ib = np.triu_indices(len(columns), k=1)
+    partes = []
+    for w in windows:
+        if w > len(Y) or w < 2:
+            continue
+        corr, n_obs = windowed_corr(Y, Y, window=w, min_periods=min_periods)
+        n_win = corr.shape[0]
+        partes.append(pd.DataFrame({
+            "PERIODO": np.repeat(labels[w - 1:], len(ia)),
+            "JANELA": w,
+            "SERIE_A": np.tile(np.asarray(columns)[ia], n_win),
+            "SERIE_B": np.tile(np.asarray(columns)[ib], n_win),
+            "CORR": corr[:, ia, ib].ravel(),
+            "N": n_obs[:, ia, ib].ravel(),
+        }))
+    if not partes:
+        return pd.DataFrame(columns=["PERIODO", "JANELA", "SERIE_A", "SERIE_B", "CORR", "N"])
+    return pd.concat(partes, ignore_index=True)
+
+
+def lagged_table(df: pd.DataFrame, columns, max_lag: int = 6, min_periods: int = 3) -> pd.DataFrame:
+    """
+    SERIE_LIDER, SERIE_SEGUIDORA, DEFASAGEM, CORR, N: correlação de LIDER no mês t com
+    SEGUIDORA no mês t + DEFASAGEM, na amostra inteira. A defasagem negativa é o par
+    invertido (B lidera A), então só entram 0..max_lag; na defasagem 0 cada par aparece uma vez.
+    """
+    columns = np.asarray(list(columns))
+    Y = df[list(columns)].to_numpy(dtype=float)
+    k = len(columns)
+    ia, ib = np.nonzero(~np.eye(k, dtype=bool))
+    i0, j0 = np.triu_indices(k, k=1)
+    partes = []
+    for lag in range(0, min(max_lag, len(Y) - min_periods) + 1):
+        corr, n_obs = windowed_corr(*lagged(Y, lag), window=None, min_periods=min_periods)
+        i, j = (i0, j0) if lag == 0 else (ia, ib)
+        partes.append(pd.DataFrame({
+            "SERIE_LIDER": columns[i],
+            "SERIE_SEGUIDORA": columns[j],
+            "DEFASAGEM": lag,
+            "CORR": corr[0, i, j],
+            "N": n_obs[0, i, j],
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def best_lags(tabela: pd.DataFrame) -> pd.DataFrame:
+    """Para cada par (líder, seguidora), a defasagem de maior |CORR| (saída do lagged_table)."""
+    # A defasagem 0 só vem num sentido; o espelho completa os dois lados antes de escolher
+    zero = tabela[tabela["DEFASAGEM"] == 0]
+    espelho = zero.rename(columns={"SERIE_LIDER": "SERIE_SEGUIDORA", "SERIE_SEGUIDORA": "SERIE_LIDER"})
+    completa = pd.concat([tabela, espelho], ignore_index=True).dropna(subset=["CORR"])
+    idx = completa["CORR"].abs().groupby([completa["SERIE_LIDER"], completa["SERIE_SEGUIDORA"]]).idxmax()
+    return completa.loc[idx.to_numpy()].reset_index(drop=True)
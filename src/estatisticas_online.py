@@ -0,0 +1,226 @@
+# estatisticas_online.py
+
+# Estatísticas acumuladas por indicador (contagem, média, variância, mín/máx e EWMA),
+# guardadas em disco e atualizadas mês a mês pelo pdf2csv 2.0.py. Mês novo no fim da
+# série custa O(1) por indicador (Welford para média/variância, EWMA incremental),
+# em vez de um describe() no histórico inteiro.
+#
+# Antes de entrar nas contas, cada mês novo é comparado com o que já se sabia:
+#   Z       (valor - média) / desvio do histórico
+#   EWMA_Z  (valor - EWMA) / desvio exponencial dos resíduos (acompanha tendência)
+# e vira anomalia se passar de um dos limites, por ex. um VMAF com a vírgula no lugar
+# errado. O resumo vai para um status JSON/CSV pequeno que o alerta pode ler sem
+# carregar o dataset.
+#
+# Mês revisado (valor mudou), removido ou que entrou no meio da série muda a ordem da
+# EWMA, então o estado é refeito do zero com o dataset inteiro (raro e barato: poucos meses).
+# Para saber disso sem olhar mês a mês, o estado guarda um hash por linha já aplicada
+# (PERIODO + valores); o prefixo do dataset é comparado com eles numa operação só e
+# só as linhas depois do último mês aplicado passam pelo laço em Python.
+
+from datetime import datetime
+from pathlib import Path
+import csv
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+STATS_VERSION = "1"
+ALPHA = 0.3          # peso do mês novo na EWMA
+MIN_HISTORY = 6      # meses de histórico antes de marcar anomalias
+Z_LIMIT = 4.0
+EWMA_LIMIT = 5.0
+
+STATUS_FIELDS = ["INDICADOR", "PERIODO", "VALOR", "N", "MEDIA", "DESVIO", "MIN", "MAX",
+                 "EWMA", "Z", "EWMA_Z", "ANOMALIA"]
+
+
+# -------------------------------------------------------
+# Bl.1 Estado em disco
+# -------------------------------------------------------
+def new_state(columns) -> dict:
+    return {
+        "version": STATS_VERSION,
+        "alpha": ALPHA,
+        "ordem": [],      # chaves na ordem em que entraram nas contas
+        "hashes": [],     # hash de cada linha aplicada, na mesma ordem (detecta revisões)
+        "indicadores": {c: new_indicator() for c in columns},
+    }
+
+
+def new_indicator() -> dict:
+    return {"n": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None, "ewma": None, "ewvar": 0.0,
+            "periodo": None, "valor": None, "z": None, "ewma_z": None, "anomalia": False}
+
+
+def load_state(path: Path, columns):
+    """Estado salvo, ou None (ausente, corrompido, de outra versão ou com outras colunas)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(state, dict) or state.get("version") != STATS_VERSION
+            or state.get("alpha") != ALPHA or list(state.get("indicadores", {})) != list(columns)):
+        return None
+    return state
+
+
+def _write_json(path: Path, data: dict):
+    # Mesmo esquema do save_cache: temporário + rename (quem lê o status nunca pega arquivo pela metade)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    tmp.replace(path)
+
+
+# -------------------------------------------------------
+# Bl.2 Atualização de um mês
+# -------------------------------------------------------
+def _std(s: dict):
+    return math.sqrt(s["m2"] / (s["n"] - 1)) if s["n"] >= 2 else None
+
+
+def _score(x: float, center, scale):
+    if center is None or not scale or scale <= 0:
+        return None
+    return (x - center) / scale
+
+
+def push(s: dict, periodo: str, x: float) -> dict:
+    """Pontua x contra o estado de antes e depois atualiza o estado; devolve s."""
+    z = ewma_z = None
+    if s["n"] >= MIN_HISTORY:
+        z = _score(x, s["mean"], _std(s))
+        ewma_z = _score(x, s["ewma"], math.sqrt(s["ewvar"]))
+    s["z"] = None if z is None else round(z, 4)
+    s["ewma_z"] = None if ewma_z is None else round(ewma_z, 4)
+    s["anomalia"] = bool((z is not None and abs(z) > Z_LIMIT)
+                         or (ewma_z is not None and abs(ewma_z) > EWMA_LIMIT))
+
+    # Welford
+    s["n"] += 1
+    delta = x - s["mean"]
+    s["mean"] += delta / s["n"]
+    s["m2"] += delta * (x - s["mean"])
+    s["min"] = x if s["min"] is None else min(s["min"], x)
+    s["max"] = x if s["max"] is None else max(s["max"], x)
+
+    # EWMA e variância exponencial dos resíduos (forma incremental)
+    if s["ewma"] is None:
+        s["ewma"] = x
+    else:
+        diff = x - s["ewma"]
+        incr = ALPHA * diff
+        s["ewma"] += incr
+        s["ewvar"] = (1 - ALPHA) * (s["ewvar"] + diff * incr)
+
+    s["periodo"], s["valor"] = periodo, x
+    return s
+
+
+def _month_keys(df: pd.DataFrame) -> list:
+    # Edições regionais repetem o PERIODO; a segunda vira "out/24#1" e assim por diante
+    periodo = df["PERIODO"].astype(str)
+    occ = periodo.groupby(periodo).cumcount()
+    return [p if o == 0 else f"{p}#{o}" for p, o in zip(periodo, occ)]
+
+
+def row_hashes(df: pd.DataFrame, columns) -> np.ndarray:
+    """Hash uint64 de cada linha (PERIODO + columns como float), vetorizado."""
+    dados = df[columns].astype(float)
+    dados.insert(0, "PERIODO", df["PERIODO"].astype(str))
+    return pd.util.hash_pandas_object(dados, index=False).to_numpy()
+
+
+def update(df: pd.DataFrame, columns, state_path: Path, status_path: Path) -> dict:
+    """
+    Acrescenta ao estado os meses de df (já em ordem de período) que ainda não entraram,
+    grava o estado e o status (status_path .json e .csv) e devolve o status.
+    """
+    columns = list(columns)
+    state = load_state(state_path, columns)
+    keys = _month_keys(df)
+    hashes = row_hashes(df, columns)
+
+    # Mesmo prefixo (mesmos meses, mesma ordem, mesmos valores): só o que vem depois é novo
+    n = 0 if state is None else len(state["hashes"])
+    rebuild = state is None or len(hashes) < n or not np.array_equal(
+        hashes[:n], np.asarray(state["hashes"], dtype=np.uint64)
+    )
+    if rebuild:
+        # Revisados também contam como novos: o alerta precisa olhar para eles de novo
+        antes = {} if state is None else dict(zip(state["ordem"], state["hashes"]))
+        novos = [k for k, h in zip(keys, hashes.tolist()) if antes.get(k) != h]
+        state = new_state(columns)
+        start = 0
+    else:
+        novos = keys[n:]
+        start = n
+    novos_set = set(novos)
+
+    anomalias = []
+    valores = df[columns].iloc[start:].to_numpy(dtype=float)
+    for k, h, linha in zip(keys[start:], hashes[start:].tolist(), valores):
+        for c, x in zip(columns, linha.tolist()):
+            if math.isnan(x):
+                continue
+            s = push(state["indicadores"][c], k, x)
+            if s["anomalia"] and k in novos_set:
+                anomalias.append({"PERIODO": k, "INDICADOR": c, "VALOR": x, "Z": s["z"], "EWMA_Z": s["ewma_z"]})
+        state["ordem"].append(k)
+        state["hashes"].append(h)
+
+    _write_json(state_path, state)
+    status = build_status(state, novos, anomalias, rebuild)
+    write_status(status, status_path)
+    return status
+
+
+# -------------------------------------------------------
+# Bl.3 Status para o alerta
+# -------------------------------------------------------
+def build_status(state: dict, novos: list, anomalias: list, rebuild: bool) -> dict:
+    indicadores = {}
+    for c, s in state["indicadores"].items():
+        std = _std(s)
+        indicadores[c] = {
+            "PERIODO": s["periodo"],
+            "VALOR": s["valor"],
+            "N": s["n"],
+            "MEDIA": round(s["mean"], 4) if s["n"] else None,
+            "DESVIO": None if std is None else round(std, 4),
+            "MIN": s["min"],
+            "MAX": s["max"],
+            "EWMA": None if s["ewma"] is None else round(s["ewma"], 4),
+            "Z": s["z"],
+            "EWMA_Z": s["ewma_z"],
+            "ANOMALIA": s["anomalia"],
+        }
+    return {
+        "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+        "ultimo_periodo": state["ordem"][-1] if state["ordem"] else None,
+        "periodos": len(state["ordem"]),
+        "novos_periodos": novos,
+        "reconstruido": rebuild,
+        "limites": {"Z": Z_LIMIT, "EWMA_Z": EWMA_LIMIT, "MIN_HISTORY": MIN_HISTORY, "ALPHA": ALPHA},
+        "anomalias": anomalias,
+        "indicadores": indicadores,
+    }
+
+
+def write_status(status: dict, status_path: Path):
+    """status_path.json com tudo; status_path.csv com uma linha por indicador (último mês)."""
+    status_path = Path(status_path)
+    _write_json(status_path.with_suffix(".json"), status)
+    csv_path = status_path.with_suffix(".csv")
+    tmp = csv_path.with_suffix(".csv.tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=STATUS_FIELDS)
+        writer.writeheader()
+        for c, info in status["indicadores"].items():
+            writer.writerow({"INDICADOR": c, **info})
+    tmp.replace(csv_path)
@@ -0,0 +1,101 @@
+# formato_colunar.py
+
+# Saída colunar (Parquet) do dataset da Serasa: coluna de data de verdade,
+# métricas em float32 e o schema gravado junto com o arquivo.
+# O pyarrow é opcional: sem ele o pipeline continua só com CSV.
+
+from pathlib import Path
+import json
+
+import numpy as np
+import pandas as pd
+
+import periodos
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = pq = None
+
+
+METRIC_DESCRIPTIONS = {
+    "INADIMPLENTES_MI": "Número de pessoas inadimplentes em milhões",
+    "VMPP": "Valor médio por pessoa inadimplente em reais (R$)",
+    "DIVIDAS_MI": "Quantidade total de dívidas em milhões",
+    "VMCD": "Valor médio de cada dívida em reais (R$)",
+    "VTDD_BI": "Valor total das dívidas em bilhões de reais (R$ bi)",
+    "VMAF": "Valor médio dos acordos fechados em reais (R$)",
+    "DESCONTOS_BI": "Descontos concedidos em bilhões de reais (R$ bi)",
+}
+METRIC_COLS = list(METRIC_DESCRIPTIONS)
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Saída Parquet precisa do pyarrow (pip install pyarrow).")
+
+
+def build_schema():
+    require_pyarrow()
+    fields = [
+        pa.field("PERIODO", pa.string(), metadata={"descricao": "Período no formato mes/aa (ex.: out/24)"}),
+        pa.field("DATA", pa.date32(), metadata={"descricao": "Primeiro dia do mês de referência"}),
+    ]
+    fields += [
+        pa.field(c, pa.float32(), metadata={"descricao": d})
+        for c, d in METRIC_DESCRIPTIONS.items()
+    ]
+    meta = {"fonte": "SERASA Mapa da Inadimplência", "colunas": json.dumps(METRIC_DESCRIPTIONS, ensure_ascii=False)}
+    return pa.schema(fields, metadata=meta)
+
+
+def periodo_to_date(periodo: pd.Series) -> pd.Series:
+    """'out/24' -> 2024-10-01, de forma vetorizada; o que não casar vira NaT."""
+    return periodos.to_period(periodo).dt.to_timestamp()
+
+
+def to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame({"PERIODO": df["PERIODO"].astype(str)})
+    out["DATA"] = periodo_to_date(df["PERIODO"]).dt.date
+    for c in METRIC_COLS:
+        out[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+    return out
+
+
+def write_parquet(df: pd.DataFrame, path: Path, partition_by_year: bool = False):
+    """
+    Grava um arquivo único em path, ou, com partition_by_year, um diretório
+    path/ANO=2024/..., path/ANO=2025/... (um por ano).
+    """
+    require_pyarrow()
+    columnar = to_columnar(df)
+    table = pa.Table.from_pandas(columnar, schema=build_schema(), preserve_index=False)
+
+    if not partition_by_year:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, path, compression="zstd")
+        return
+
+    anos = pd.to_datetime(columnar["DATA"]).dt.year.fillna(0).astype("int16")
+    table = table.append_column("ANO", pa.array(anos))
+    pq.write_to_dataset(
+        table, root_path=str(path), partition_cols=["ANO"],
+        existing_data_behavior="delete_matching", compression="zstd",
+    )
+
+
+def read_parquet(path: Path, columns=None) -> pd.DataFrame:
+    """
+    Lê só as colunas pedidas (PERIODO e DATA sempre vêm) e devolve em ordem de DATA.
+    As métricas voltam para float64 arredondadas em 2 casas: é a precisão dos relatórios,
+    e assim não aparecem resíduos do float32 (ex.: 402.0299987) nas tabelas exportadas.
+    """
+    require_pyarrow()
+    metrics = METRIC_COLS if columns is None else [c for c in columns if c in METRIC_DESCRIPTIONS]
+    table = pq.read_table(path, columns=["PERIODO", "DATA"] + metrics)
+    df = table.to_pandas()
+    df["DATA"] = pd.to_datetime(df["DATA"])
+    for c in metrics:
+        df[c] = np.round(df[c].astype("float64"), 2)
+    return df.sort_values("DATA", kind="stable").reset_index(drop=True)
@@ -0,0 +1,122 @@
+# instrumentacao.py
+
+# Telemetria simples para o pdf2csv 2.0.py e o EDA.py: spans de tempo por etapa
+# (e por item, ex.: cada PDF), contadores e captura opcional com cProfile.
+# No fim da execução sai um relatório JSON para o job noturno monitorar lentidão.
+#
+# Variáveis de ambiente (valem para os dois scripts):
+#   SERASA_REPORT=caminho.json   grava o relatório da execução
+#   SERASA_PROFILE=caminho.prof  roda com cProfile e grava as estatísticas
+
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+
+_spans = {}         # nome -> [contagem, total_s, max_s]
+_items = []         # spans por item: {"span", "item", "s"}
+_counters = Counter()
+_started_at = time.time()
+_started_perf = time.perf_counter()
+
+
+def reset():
+    global _started_at, _started_perf
+    _spans.clear()
+    _items.clear()
+    _counters.clear()
+    _started_at = time.time()
+    _started_perf = time.perf_counter()
+
+
+@contextmanager
+def span(name: str, item: str = None):
+    """Cronometra o bloco; com item, também guarda o tempo individual (ex.: nome do PDF)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - inicio
+        agg = _spans.setdefault(name, [0, 0.0, 0.0])
+        agg[0] += 1
+        agg[1] += dt
+        agg[2] = max(agg[2], dt)
+        if item is not None:
+            _items.append({"span": name, "item": item, "s": round(dt, 6)})
+
+
+def count(name: str, n: int = 1):
+    _counters[name] += n
+
+
+def snapshot() -> dict:
+    """Estado atual, serializável: usado para trazer a telemetria dos workers de volta."""
+    return {
+        "spans": {k: list(v) for k, v in _spans.items()},
+        "items": list(_items),
+        "counters": dict(_counters),
+    }
+
+
+def merge(snap: dict):
+    for name, (n, total, mx) in snap["spans"].items():
+        agg = _spans.setdefault(name, [0, 0.0, 0.0])
+        agg[0] += n
+        agg[1] += total
+        agg[2] = max(agg[2], mx)
+    _items.extend(snap["items"])
+    _counters.update(snap["counters"])
+
+
+def report(**extra) -> dict:
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started_at)),
+        "total_s": round(time.perf_counter() - _started_perf, 4),
+        **extra,
+        "spans": {
+            name: {"count": n, "total_s": round(total, 4), "max_s": round(mx, 4)}
+            for name, (n, total, mx) in sorted(_spans.items())
+        },
+        "counters": dict(sorted(_counters.items())),
+        "items": _items,
+    }
+
+
+def write_report(path, **extra):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report(**extra), indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] Relatório de execução gravado em: {path.resolve()}")
+
+
+@contextmanager
+def profiled(path=None, top: int = 25):
+    """Roda o bloco sob cProfile se path vier preenchido; grava .prof e um resumo em texto ao lado."""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(top)
+        path.with_suffix(".txt").write_text(buf.getvalue(), encoding="utf-8")
+        print(f"[OK] Perfil cProfile gravado em: {path.resolve()}")
+
+
+def env_report_path():
+    return os.environ.get("SERASA_REPORT") or None
+
+def env_profile_path():
+    return os.environ.get("SERASA_PROFILE") or None
@@ -0,0 +1,127 @@
+# localizador_metricas.py
+
+# Motor genérico para achar indicadores no texto dos PDFs a partir de âncoras.
+# Cada métrica é declarada numa tabela (âncora, janela de linhas, regex do valor) e
+# todas as âncoras são encontradas de uma vez só, com um único regex combinado.
+# Assim, colocar um indicador novo é acrescentar uma entrada na tabela e o custo
+# da varredura do texto não cresce com o número de métricas.
+
+from bisect import bisect_right
+import re
+import unicodedata
+
+
+# -------------------------------------------------------
+# Bl.1 Normalização com tabela pré-calculada
+# -------------------------------------------------------
+def _build_accent_table() -> dict:
+    # Latin-1, Latin Extended A/B, marcas combinantes e Latin Extended Additional:
+    # cobre tudo que aparece em português (e bem mais)
+    ranges = [range(0x80, 0x370), range(0x1E00, 0x1F00), range(0x20D0, 0x2100), range(0xFE20, 0xFE30)]
+    table = {}
+    for r in ranges:
+        for cp in r:
+            c = chr(cp)
+            base = "".join(
+                ch for ch in unicodedata.normalize("NFD", c)
+                if unicodedata.category(ch) != "Mn"
+            )
+            if base != c:
+                table[cp] = base
+    return str.maketrans(table)
+
+ACCENT_TABLE = _build_accent_table()
+
+def normalize_text(s: str) -> str:
+    """Maiúsculas e sem acentos, preservando as quebras de linha."""
+    return s.upper().translate(ACCENT_TABLE)
+
+
+# -------------------------------------------------------
+# Bl.2 Localizador
+# -------------------------------------------------------
+def _anchor_regex(anchor: str) -> str:
+    # Palavras da âncora separadas por qualquer espaço que não seja quebra de linha,
+    # equivalente a procurar a âncora na linha com os espaços colapsados
+    return r"[^\S\n]+".join(re.escape(w) for w in anchor.split())
+
+
+class MetricLocator:
+    """
+    specs: {"METRICA": {"anchor": str, "window": (ini, fim), "pattern": regex,
+                        "near": (outra_ancora, n_linhas)  # opcional
+                       }}
+
+    Para cada ocorrência da âncora (em ordem), procura o regex nas linhas
+    [i + ini, i + fim) e usa o primeiro grupo do primeiro acerto. Com "near",
+    a ocorrência só vale se outra_ancora aparecer nas linhas [i, i + n_linhas).
+    """
+
+    def __init__(self, specs: dict, flags: int = re.IGNORECASE):
+        self.specs = specs
+        anchors = []
+        for spec in specs.values():
+            anchors.append(spec["anchor"])
+            if "near" in spec:
+                anchors.append(spec["near"][0])
+        self.anchors = list(dict.fromkeys(normalize_text(a) for a in anchors))
+
+        self._group_to_anchor = {f"a{k}": a for k, a in enumerate(self.anchors)}
+        self._anchor_re = re.compile(
+            "|".join(f"(?P<a{k}>{_anchor_regex(a)})" for k, a in enumerate(self.anchors))
+        )
+        self._value_res = {name: re.compile(spec["pattern"], flags) for name, spec in specs.items()}
+
+    def anchor_index(self, lines: list) -> dict:
+        """Uma passada só no texto: {âncora: [índices de linha, em ordem]}."""
+        text = normalize_text("\n".join(lines))
+        line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+
+        index = {a: [] for a in self.anchors}
+        for m in self._anchor_re.finditer(text):
+            i = bisect_right(line_starts, m.start()) - 1
+            hits = index[self._group_to_anchor[m.lastgroup]]
+            if not hits or hits[-1] != i:
+                hits.append(i)
+        return index
+
+    def _scan(self, lines: list, parse=None) -> dict:
+        """{métrica: (linhas usadas, valor)} ou None quando não achou."""
+        index = self.anchor_index(lines)
+        n = len(lines)
+        results = {}
+
+        for name, spec in self.specs.items():
+            value_re = self._value_res[name]
+            lo, hi = spec["window"]
+            near = spec.get("near")
+            near_hits = index[normalize_text(near[0])] if near else None
+
+            hit = None
+            for i in index[normalize_text(spec["anchor"])]:
+                used = {i}
+                if near_hits is not None:
+                    # existe ocorrência de near em [i, i + n_linhas)?
+                    k = bisect_right(near_hits, i - 1)
+                    if k >= len(near_hits) or near_hits[k] >= min(n, i + near[1]):
+                        continue
+                    used.add(near_hits[k])
+                for j in range(max(0, i + lo), min(n, i + hi)):
+                    m = value_re.search(lines[j])
+                    if m:
+                        value = parse(m.group(1)) if parse else m.group(1)
+                        if value is not None:
+                            hit = (sorted(used | {j}), value)
+                        break
+                if hit is not None:
+                    break
+            results[name] = hit
+        return results
+
+    def locate(self, lines: list, parse=None) -> dict:
+        """Devolve {métrica: valor} (None quando não achou). parse converte o texto capturado."""
+        return {name: None if hit is None else hit[1] for name, hit in self._scan(lines, parse).items()}
+
+    def locate_lines(self, lines: list, parse=None) -> dict:
+        """Devolve {métrica: linhas de que o acerto depende (âncora, near e valor)} das métricas achadas."""
+        return {name: hit[0] for name, hit in self._scan(lines, parse).items() if hit is not None}
@@ -0,0 +1,47 @@
+# memoria.py
+
+# Memória do processo para o modo --stream do pdf2csv 2.0.py e para o benchmark.
+# current_rss_mb é o RSS de agora (o que o teto de memória compara); peak_rss_mb é
+# o pico desde o início do processo (o que o benchmark registra por etapa).
+
+import gc
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo até agora (MB), quando o SO informa."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def current_rss_mb():
+    """RSS atual (MB). Só o Linux expõe isso sem dependência extra (/proc); nos outros, None."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * 4096 / 2**20, 1)
+
+
+def over_ceiling(max_rss_mb) -> bool:
+    """
+    True se o RSS passou de max_rss_mb mesmo depois de um gc.collect().
+    Sem teto (None/0) ou sem como medir, nunca passa.
+    """
+    if not max_rss_mb:
+        return False
+    rss = current_rss_mb()
+    if rss is None or rss <= max_rss_mb:
+        return False
+    gc.collect()
+    rss = current_rss_mb()
+    return rss is not None and rss > max_rss_mb
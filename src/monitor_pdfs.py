@@ -0,0 +1,169 @@
+# monitor_pdfs.py
+
+# Modo "serviço": fica olhando datasets/mapas_serasa e, quando chega (ou muda) um PDF,
+# extrai só ele, faz upsert no serasa.csv e roda de novo só as etapas do EDA cujas
+# colunas de entrada mudaram. A detecção é por polling (mtime + tamanho), com debounce
+# para não pegar um PDF ainda no meio da cópia; assim não depende de inotify/watchdog.
+#
+# Uso (da raiz do projeto): python src/monitor_pdfs.py --interval 5 --debounce 3
+
+from pathlib import Path
+import argparse
+import time
+
+import pandas as pd
+
+import instrumentacao as telemetria
+from pdf2csv_modulo import load_pdf2csv
+
+# Colunas que cada etapa do EDA lê. PERIODO entra em todas: mês novo (ou fora de ordem) refaz tudo.
+EDA_STEP_INPUTS = {
+    "eda_basic_stats": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+    "eda_correlations": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+    "correlation_analysis": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+    "plot_correlation_heatmap": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+    "plot_inadimplentes_time_series": ["INADIMPLENTES_MI"],
+    "plot_vmpp_time_series": ["VMPP"],
+    "plot_dividas_time_series": ["DIVIDAS_MI"],
+    "plot_vmcd_time_series": ["VMCD"],
+    "plot_vtdd_time_series": ["VTDD_BI"],
+    "plot_histograms_boxplots": ["VTDD_BI", "INADIMPLENTES_MI"],
+    "build_inadimplentes_table": ["INADIMPLENTES_MI"],
+    "plot_inadimplentes_pie": ["INADIMPLENTES_MI"],
+    "train_vtdd_model": ["VTDD_BI"],
+    "forecast_indicators": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+    "select_forecast_models": ["INADIMPLENTES_MI", "VMPP", "DIVIDAS_MI", "VMCD", "VTDD_BI", "VMAF", "DESCONTOS_BI"],
+}
+
+
+def scan(pdf_dir: Path) -> dict:
+    """{pdf: (mtime_ns, tamanho)} de todos os PDFs da pasta."""
+    sigs = {}
+    for pdf_file in pdf_dir.glob("*.pdf"):
+        try:
+            st = pdf_file.stat()
+        except FileNotFoundError:  # apagado entre o glob e o stat
+            continue
+        sigs[pdf_file] = (st.st_mtime_ns, st.st_size)
+    return sigs
+
+
+def changed_columns(old: pd.DataFrame, new: pd.DataFrame) -> set:
+    """Colunas cujo conteúdo mudou; PERIODO entra se o conjunto/ordem de períodos mudou."""
+    if list(old["PERIODO"]) != list(new["PERIODO"]):
+        return {"PERIODO"} | set(new.columns)
+    changed = set()
+    for c in new.columns:
+        a = pd.to_numeric(old[c], errors="coerce").to_numpy() if c in old else None
+        b = pd.to_numeric(new[c], errors="coerce").to_numpy()
+        if a is None or not ((a == b) | (pd.isna(a) & pd.isna(b))).all():
+            changed.add(c)
+    return changed
+
+
+def steps_to_rerun(changed: set) -> list:
+    if "PERIODO" in changed:
+        return list(EDA_STEP_INPUTS)
+    return [step for step, cols in EDA_STEP_INPUTS.items() if changed & set(cols)]
+
+
+def run_eda_steps(steps, base_dir: Path, dados: pd.DataFrame = None):
+    """dados: dataset que o pdf2csv acabou de montar; sem ele, relê o OUTPUT_CSV."""
+    import EDA  # EDA, previsao, backtest, correlacoes, armazem_sqlite... só quando há algo para refazer
+
+    pdf2csv = load_pdf2csv()
+    EDA.BASE_DIR = base_dir
+    EDA.FIG_DIR = base_dir / "figures"
+    EDA.FIG_DIR.mkdir(parents=True, exist_ok=True)
+
+    df = EDA.load_data(pdf2csv.OUTPUT_CSV) if dados is None else EDA.prepare_data(dados)
+    for step in steps:
+        with telemetria.span("monitor.eda", item=step):
+            getattr(EDA, step)(df)
+
+
+def process(pdf_files, base_dir: Path, workers: int, lazy: bool):
+    pdf2csv = load_pdf2csv()
+    for pdf_file in pdf_files:
+        print(f"[MONITOR] Alteração detectada: {pdf_file.name}")
+
+    with telemetria.span("monitor.upsert"):
+        old, new = pdf2csv.upsert_dataset(pdf_files, workers=workers, lazy=lazy)
+
+    steps = steps_to_rerun(changed_columns(old, new))
+    if not steps:
+        print("[MONITOR] Nenhum indicador mudou; EDA não precisa rodar.")
+        return
+    print(f"[MONITOR] Refazendo etapas do EDA: {', '.join(steps)}")
+    run_eda_steps(steps, base_dir, new)
+
+
+def watch(pdf_dir: Path, base_dir: Path, interval: float = 5.0, debounce: float = 3.0,
+          workers: int = 1, lazy: bool = True, once: bool = False):
+    """
+    Começa com os PDFs já presentes como conhecidos e processa só o que aparecer/mudar depois
+    (a não ser com once=True, que sincroniza os PDFs ausentes do cache e sai).
+    Um PDF só é processado depois de ficar debounce segundos com mtime/tamanho estáveis.
+    """
+    pdf2csv = load_pdf2csv()
+    pdf2csv.PDF_DIR = pdf_dir
+
+    if once:
+        # build_dataset já reaproveita o cache: só o que é novo passa pela extração
+        dados = pdf2csv.build_dataset(workers=workers, lazy=lazy)
+        run_eda_steps(list(EDA_STEP_INPUTS), base_dir, dados)
+        return
+
+    known = scan(pdf_dir)
+    pending = {}  # pdf -> (assinatura, desde quando está estável)
+    print(f"[MONITOR] Observando {pdf_dir.resolve()} ({len(known)} PDFs; Ctrl+C para sair)")
+
+    try:
+        while True:
+            now = time.monotonic()
+            current = scan(pdf_dir)
+
+            for pdf_file, sig in current.items():
+                if known.get(pdf_file) == sig:
+                    pending.pop(pdf_file, None)
+                elif pending.get(pdf_file, (None,))[0] != sig:
+                    pending[pdf_file] = (sig, now)  # novo, ou ainda mudando: reinicia o debounce
+
+            for pdf_file in set(known) - set(current):
+                print(f"[MONITOR] PDF removido (linha mantida no dataset): {pdf_file.name}")
+                known.pop(pdf_file)
+
+            ready = [f for f, (sig, since) in pending.items() if now - since >= debounce]
+            if ready:
+                try:
+                    process(ready, base_dir, workers, lazy)
+                except Exception as exc:
+                    # O serviço continua de pé; o PDF é tentado de novo se mudar outra vez
+                    print(f"[ERRO] Falha ao atualizar o dataset: {type(exc).__name__}: {exc}")
+                for pdf_file in ready:
+                    known[pdf_file] = pending.pop(pdf_file)[0]
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("[MONITOR] Encerrado.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Atualiza o dataset e o EDA quando chegam PDFs novos da Serasa.")
+    parser.add_argument("--pdf-dir", type=Path, default=Path("datasets/mapas_serasa"))
+    parser.add_argument("--base-dir", type=Path, default=Path("."),
+                        help="raiz onde ficam datasets/ (tabelas) e figures/")
+    parser.add_argument("--interval", type=float, default=5.0, help="segundos entre varreduras")
+    parser.add_argument("--debounce", type=float, default=3.0,
+                        help="segundos que um PDF precisa ficar sem mudar antes de ser processado")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("--full-text", action="store_true")
+    parser.add_argument("--once", action="store_true",
+                        help="sincroniza uma vez (extraindo só o que falta no cache) e sai")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    watch(args.pdf_dir, args.base_dir, args.interval, args.debounce,
+          args.workers, not args.full_text, args.once)
@@ -17,33 +17,55 @@ e carregamento na pasta /datasets/mapas_serasa como ja estava ajustado pelo Diog
 """
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import argparse
+import csv
+import os
 import re
-import unicodedata
+import time
+import numpy as np
 import pandas as pd
-import pdfplumber
+
+import armazem_sqlite
+import instrumentacao as telemetria
+from backends_texto import BACKENDS, DEFAULT_BACKENDS, parse_backends
+from cache_extracao import cache_key, file_sha256, load_cache, save_cache
+import camada_texto
+import estatisticas_online
+import memoria
+from formato_colunar import write_parquet
+from localizador_metricas import MetricLocator, normalize_text
+import periodos
+import templates_layout
+import validacao
 
 # -------------------------------------------------------
 # Bl.1 Configuração de caminhos
 # -------------------------------------------------------
 PDF_DIR = Path("datasets/mapas_serasa")   # onde estão os PDFs
 OUTPUT_CSV = Path("datasets/serasa.csv")  # saída desejada
+OUTPUT_PARQUET = Path("datasets/serasa.parquet")  # saída colunar (arquivo ou diretório por ano)
+OUTPUT_SQLITE = Path("datasets/serasa.sqlite")  # armazém SQLite com upsert por PDF (armazem_sqlite.py)
+CACHE_PATH = Path("datasets/cache/extracao.json")  # cache das métricas por hash do PDF
+LAYOUT_PATH = Path("datasets/cache/layouts.json")  # templates de layout: página + bbox de cada métrica
+TEXT_STORE_DIR = Path("datasets/cache/textos")  # texto das páginas já lidas, um .json.gz por hash do PDF
+STATS_PATH = Path("datasets/cache/estatisticas.json")  # estado das estatísticas acumuladas por indicador
+STATUS_PATH = Path("datasets/status_indicadores.json")  # status para o alerta (+ .csv ao lado)
+VALIDATION_PATH = Path("datasets/validacao.csv")  # falhas de consistência e o que a releitura corrigiu
+
+# Subir sempre que a lógica de extração mudar: invalida o cache inteiro
+EXTRACTOR_VERSION = "1"
 
 
 # -------------------------------------------------------
 # Bl.2 Normalização
 # -------------------------------------------------------
-def strip_accents(s: str) -> str:
-    return "".join(
-        c for c in unicodedata.normalize("NFD", s)
-        if unicodedata.category(c) != "Mn"
-    )
-
 def norm_line(s: str) -> str:
     if s is None:
         return ""
-    s = strip_accents(s.upper())
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
+    # normalize_text usa uma tabela de tradução pronta, bem mais rápido que o unicodedata por caractere
+    return " ".join(normalize_text(s).split())
 
 def parse_brl(value_str: str):
     """
@@ -75,29 +97,269 @@ def parse_brl(value_str: str):
     except ValueError:
         return None
 
+def parse_brl_series(values):
+    """
+    Versão vetorizada do parse_brl para colunas inteiras (tabelas regionais, faixas etárias...).
+    Aceita Series, array NumPy ou lista de strings e segue exatamente as regras do parse_brl;
+    onde o parse_brl devolveria None (incluindo entradas None/NaN/vazias) sai NaN.
+    Devolve Series (mesmo índice) quando recebe Series, senão um array float64.
+    """
+    is_series = isinstance(values, pd.Series)
+    s = values if is_series else pd.Series(np.asarray(values, dtype=object))
+    if len(s) == 0:
+        out = np.array([], dtype="float64")
+        return pd.Series(out, index=s.index, name=s.name) if is_series else out
+
+    missing = s.isna().to_numpy()
+    st = s.where(~missing, "").astype("string")
+    out = np.full(len(st), np.nan)
+
+    # O \d do parse_brl aceita dígitos Unicode; o caminho vetorizado só trata ASCII,
+    # então as (raras) linhas com caracteres não ASCII vão para o parse_brl mesmo
+    non_ascii = ~st.str.isascii().to_numpy(dtype=bool)
+    for k in np.flatnonzero(non_ascii & ~missing):
+        v = parse_brl(st.iat[k])
+        if v is not None:
+            out[k] = v
+
+    st = st.str.replace(r"[^0-9.,]", "", regex=True)
+
+    # Contagens por diferença de tamanho: bem mais rápido que str.count (regex) no pandas
+    length = st.str.len()
+    n_commas = length - st.str.replace(",", "", regex=False).str.len()
+    has_dot = st.str.contains(".", regex=False)
+    # '5,837,49': várias vírgulas e nenhum ponto, só a última vira separador decimal
+    multi = ((n_commas > 1) & ~has_dot).to_numpy(dtype=bool)
+    if multi.any():
+        parts = st[multi].str.rsplit(",", n=1, expand=True)
+        st[multi] = parts[0].str.replace(",", "", regex=False) + "," + parts[1]
+
+    has_comma = st.str.contains(",", regex=False)
+    both = (has_comma & has_dot).to_numpy(dtype=bool)
+    if both.any():
+        st[both] = st[both].str.replace(".", "", regex=False)
+    st = st.str.replace(",", ".", regex=False)
+
+    # Sobraram só dígitos e pontos: float() aceita se houver no máximo um ponto e algum dígito
+    length = st.str.len().to_numpy()
+    n_dots = length - st.str.replace(".", "", regex=False).str.len().to_numpy()
+    valid = (n_dots <= 1) & (length > n_dots) & ~non_ascii & ~missing
+    out[valid] = st[valid].astype("float64").to_numpy()
+
+    return pd.Series(out, index=s.index, name=s.name) if is_series else out
+
 
 # -------------------------------------------------------
 # Bl.3 Extração dos textos
 # -------------------------------------------------------
+# Página onde os 7 indicadores costumam estar (o pdf2csv.py antigo já fixava a 3).
+# É atualizada com a última página em que a extração fechou, então o próximo PDF tenta ela primeiro.
+METRICS_PAGE_HINT = 3
+
+METRIC_FIELDS = [
+    "INADIMPLENTES_MI",
+    "VMPP",
+    "DIVIDAS_MI",
+    "VMCD",
+    "VTDD_BI",
+    "VMAF",
+    "DESCONTOS_BI",
+]
+
 def extract_text_pdfplumber(pdf_path: Path) -> str:
-    texts = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text() or ""
-            texts.append(t)
-    return "\n".join(texts)
+    # Página a página pelo iter_page_texts, que fecha cada página logo depois de ler:
+    # com todas as páginas vivas até o fim do with, um anexo de 500 páginas passava de 800 MB
+    return "\n".join(t for _, t in iter_page_texts(pdf_path, backend="pdfplumber"))
+
+def iter_page_texts(pdf_path: Path, first_page: int = None, layer: dict = None, words: bool = False,
+                    backend: str = "pdfplumber"):
+    """
+    Gera (índice, texto) página a página, começando por first_page (se existir)
+    e seguindo na ordem do documento. Quem consome pode parar a qualquer momento,
+    aí as páginas restantes nem passam pelo layout do backend (backends_texto.py).
+    Com layer (camada_texto), página já guardada sai dela sem abrir o PDF e página
+    lida do PDF é acrescentada nela (words=True guarda também as palavras com coordenadas).
+    """
+    pages = layer["pages"] if layer is not None else {}
+    n_pages = layer["n_pages"] if layer is not None else None
+    reader = None
+    with ExitStack() as stack:
+        # O PDF só é aberto se alguma página não estiver na camada
+        def open_reader():
+            with telemetria.span("pdf.open"):
+                return stack.enter_context(BACKENDS[backend](pdf_path))
+
+        if n_pages is None:
+            reader = open_reader()
+            n_pages = reader.n_pages
+            if layer is not None:
+                layer["n_pages"] = n_pages
+        order = list(range(n_pages))
+        if first_page is not None and 0 <= first_page < n_pages:
+            order.remove(first_page)
+            order.insert(0, first_page)
+        for i in order:
+            key = str(i)
+            if key in pages and (not words or key in layer["words"]):
+                telemetria.count("text_store_pages")
+                yield i, pages[key]
+                continue
+            if reader is None:
+                reader = open_reader()
+            with telemetria.span("pdf.page_layout"):
+                t, page_words = reader.read(i, words=words and layer is not None)
+                if layer is not None:
+                    pages[key] = t
+                    if words:
+                        layer["words"][key] = camada_texto.page_words(page_words)
+            telemetria.count("pages_read")
+            yield i, t
 
 
 # -------------------------------------------------------
 # Bl.3.1 Extração dos indicadores que vamos usar
 # -------------------------------------------------------
-def extract_metrics_from_pdf(pdf_path: Path) -> dict:
+def extract_metrics_from_pdf(pdf_path: Path, lazy: bool = True, layout: bool = False,
+                             text_store: bool = False, text_words: bool = False,
+                             backends=("pdfplumber",)) -> dict:
+    """
+    lazy=True lê só as páginas necessárias: tenta METRICS_PAGE_HINT primeiro e para
+    assim que os 7 campos estiverem preenchidos. Se nunca fechar, o resultado é o
+    mesmo da leitura completa (lazy=False).
+    layout=True tenta antes o template de layout (LAYOUT_TEMPLATES); sem template, ou se
+    ele não fechar os 7 campos, segue pelo texto (da camada ou do PDF) e aprende (ou refaz)
+    o template do layout. O template só é aprendido com o texto do pdfplumber (build_dataset
+    só liga os templates quando ele é o primeiro backend).
+    text_store=True lê o texto da camada guardada em TEXT_STORE_DIR (e grava nela as páginas
+    que precisar ler do PDF) quando o template não resolve.
+    backends: backends de texto na ordem de tentativa (backends_texto.py); se as métricas
+    de um não passam em metrics_valid, o próximo lê o PDF de novo. O último vale de qualquer jeito.
+    Lista vazia ou com backend desconhecido é ValueError (parse_backends).
+    """
+    # Lista vazia nem chegaria a atribuir metrics/backend no laço abaixo: erro claro já aqui
+    backends = parse_backends(backends)
+    if layout and LAYOUT_TEMPLATES:
+        metrics = extract_metrics_with_layout(pdf_path)
+        if metrics is not None:
+            return metrics
+
+    for n, backend in enumerate(backends):
+        with telemetria.span(f"backend.{backend}"):
+            if text_store:
+                metrics, page_texts = extract_metrics_from_store(pdf_path, lazy, text_words, backend)
+            else:
+                metrics, page_texts = extract_metrics_by_text(pdf_path, lazy, backend=backend)
+        if metrics_valid(metrics):
+            telemetria.count(f"backend_hits.{backend}")
+            break
+        if n < len(backends) - 1:
+            telemetria.count(f"backend_escalations.{backend}")
+
+    # As linhas do template vêm do extract_text_lines do pdfplumber, então só aprende com o texto dele
+    if page_texts is not None and layout and backend == "pdfplumber" \
+            and all(metrics[c] is not None for c in METRIC_FIELDS):
+        learn_layout(pdf_path, page_texts, metrics)
+    return metrics
+
+# Tolerância das identidades INADIMPLENTES_MI x VMPP ~ VTDD_BI e DIVIDAS_MI x VMCD ~ VTDD_BI.
+# Os mapas arredondam o VTDD ("R$ 457 bi"); nos 12 PDFs de 2024/25 o desvio fica abaixo de 0,3%.
+IDENTITY_TOL = 0.02
+
+def metrics_valid(metrics: dict) -> bool:
+    """
+    Os 7 campos preenchidos e positivos, e os dois produtos batendo com o VTDD.
+    É o que decide se o texto de um backend mais barato é aceito ou se escala para o próximo.
+    """
+    values = [metrics.get(c) for c in METRIC_FIELDS]
+    if any(v is None or not np.isfinite(v) or v <= 0 for v in values):
+        return False
+    vtdd = metrics["VTDD_BI"]
+    return all(
+        abs(metrics[qtd] * metrics[medio] / 1000 / vtdd - 1) <= IDENTITY_TOL
+        for qtd, medio in PAIR_FIELDS
+    )
+
+def extract_metrics_by_text(pdf_path: Path, lazy: bool = True, layer: dict = None, words: bool = False,
+                            backend: str = "pdfplumber"):
+    """Devolve (métricas, {índice da página: texto}) com as páginas que foram lidas."""
+    global METRICS_PAGE_HINT
+
+    if not lazy:
+        page_texts = dict(iter_page_texts(pdf_path, layer=layer, words=words, backend=backend))
+        return extract_metrics_from_text("\n".join(page_texts[k] for k in sorted(page_texts))), page_texts
+
+    page_texts = {}
+    for i, t in iter_page_texts(pdf_path, first_page=METRICS_PAGE_HINT, layer=layer, words=words,
+                                backend=backend):
+        page_texts[i] = t
+        if not t.strip():
+            continue
+        # Sempre junta na ordem do documento, para pairs[0]/pairs[1] e as janelas de linhas
+        # enxergarem o mesmo texto que a leitura completa enxergaria
+        text = "\n".join(page_texts[k] for k in sorted(page_texts))
+        metrics = extract_metrics_from_text(text)
+        if all(metrics[c] is not None for c in METRIC_FIELDS):
+            METRICS_PAGE_HINT = i
+            return metrics, page_texts
+
+    return extract_metrics_from_text("\n".join(page_texts[k] for k in sorted(page_texts))), page_texts
+
+def extract_metrics_from_store(pdf_path: Path, lazy: bool = True, words: bool = False,
+                               backend: str = "pdfplumber"):
+    """
+    Mesmo resultado (métricas, textos das páginas) do extract_metrics_by_text, mas com o texto da camada guardada
+    (camada_texto.py): só as páginas que ainda não estão nela passam pelo backend.
+    Mexer nas regex e rodar de novo vira só regex em cima do texto, sem layout de PDF.
+    """
+    sha = file_sha256(pdf_path)
+    with telemetria.span("texto.load"):
+        layer = camada_texto.load_layer(TEXT_STORE_DIR, sha, backend)
+    telemetria.count("text_store_misses" if layer is None else "text_store_hits")
+    if layer is None:
+        layer = camada_texto.new_layer()
+
+    before = camada_texto.layer_size(layer)
+    metrics, page_texts = extract_metrics_by_text(pdf_path, lazy, layer, words, backend)
+    if camada_texto.layer_size(layer) != before:
+        with telemetria.span("texto.save"):
+            camada_texto.save_layer(TEXT_STORE_DIR, sha, backend, layer)
+    return metrics, page_texts
+
+
+# Pares "73,1 mi R$ 5.504,33": o 1º é inadimplentes/VMPP, o 2º dívidas/VMCD
+PAIRS_RE = re.compile(r"([\d\.,]+)\s*mi\s*R\$\s*([\d\.,]+)", flags=re.IGNORECASE)
+PAIR_FIELDS = [("INADIMPLENTES_MI", "VMPP"), ("DIVIDAS_MI", "VMCD")]
+
+# Métricas achadas por âncora: janela (ini, fim) em linhas relativas à âncora.
+# Para um indicador novo basta acrescentar uma entrada aqui.
+METRIC_LOCATOR = MetricLocator({
+    "VTDD_BI": {
+        "anchor": "VALOR TOTAL DAS DIVIDAS",
+        "window": (-5, 2),
+        "pattern": r"R\$\s*([\d\.,]+)\s*bi",
+    },
+    "VMAF": {
+        "anchor": "VALOR MEDIO DOS",
+        "near": ("ACORDOS FECHADOS", 5),
+        "window": (-10, 1),
+        "pattern": r"R\$\s*([\d\.,]+)(?![^\n]*bilh)",
+    },
+    "DESCONTOS_BI": {
+        "anchor": "DESCONTOS CONCEDIDOS",
+        "window": (-5, 3),
+        "pattern": r"R\$\s*([\d\.,]+)[^\n]*bilh",
+    },
+})
+
+def extract_metrics_from_text(text: str) -> dict:
+    with telemetria.span("metricas.regex"):
+        return _extract_metrics_from_text(text)
+
+def _extract_metrics_from_text(text: str) -> dict:
 
-    text = extract_text_pdfplumber(pdf_path)
     lines = text.splitlines()
-    norms = [norm_line(l) for l in lines]
 
-    pairs = re.findall(r"([\d\.,]+)\s*mi\s*R\$\s*([\d\.,]+)", text, flags=re.IGNORECASE)
+    pairs = PAIRS_RE.findall(text)
 
     inad_mi = div_mi = vmpp = vmcd = None
     if len(pairs) >= 2:
@@ -106,129 +368,547 @@ def extract_metrics_from_pdf(pdf_path: Path) -> dict:
         div_mi  = parse_brl(pairs[1][0])
         vmcd    = parse_brl(pairs[1][1])
 
-    vtdd = vmaf = descontos = None
-
-    for i, n in enumerate(norms):
-        if "VALOR TOTAL DAS DIVIDAS" in n:
-            for j in range(i - 5, i + 2):
-                if 0 <= j < len(lines):
-                    m = re.search(r"R\$\s*([\d\.,]+)\s*bi", lines[j], flags=re.IGNORECASE)
-                    if m:
-                        vtdd = parse_brl(m.group(1))
-                        break
-            if vtdd is not None:
-                break
-
-    for i, n in enumerate(norms):
-        if "VALOR MEDIO DOS" in n and any(
-            "ACORDOS FECHADOS" in norms[k]
-            for k in range(i, min(len(norms), i + 5))
-        ):
-            for j in range(i - 10, i + 1):
-                if 0 <= j < len(lines):
-
-                    m = re.search(r"R\$\s*([\d\.,]+)(?![^\n]*bilh)", lines[j], flags=re.IGNORECASE)
-                    if m:
-                        vmaf = parse_brl(m.group(1))
-                        break
-            if vmaf is not None:
-                break
-
-    for i, n in enumerate(norms):
-        if "DESCONTOS CONCEDIDOS" in n:
-            for j in range(i - 5, i + 3):
-                if 0 <= j < len(lines):
-                    m = re.search(r"R\$\s*([\d\.,]+)[^\n]*bilh", lines[j], flags=re.IGNORECASE)
-                    if m:
-                        descontos = parse_brl(m.group(1))
-                        break
-            if descontos is not None:
-                break
+    located = METRIC_LOCATOR.locate(lines, parse=parse_brl)
 
     return {
         "INADIMPLENTES_MI": inad_mi,
         "VMPP": vmpp,
         "DIVIDAS_MI": div_mi,
         "VMCD": vmcd,
-        "VTDD_BI": vtdd,
-        "VMAF": vmaf,
-        "DESCONTOS_BI": descontos,
+        **located,
     }
 
 
 # -------------------------------------------------------
-# Bl.4 PERIODO, usei o nome dos pdf
+# Bl.3.2 Templates de layout (templates_layout.py)
 # -------------------------------------------------------
-def normalize_month_name(name: str) -> str:
-    name = strip_accents(name.lower().strip())
-    return name
+# impressão digital do layout -> {"reference", "version", "regions": {métrica: {"page", "bbox", ...}}}
+LAYOUT_TEMPLATES = {}
 
-def period_from_filename(pdf_path: Path) -> str:
+def load_layouts():
+    # Template de outra versão do extrator pode apontar para regiões que as regex atuais não usam
+    LAYOUT_TEMPLATES.clear()
+    LAYOUT_TEMPLATES.update({
+        fp: t for fp, t in load_cache(LAYOUT_PATH).items()
+        if isinstance(t, dict) and t.get("version") == EXTRACTOR_VERSION
+    })
 
-    name = pdf_path.stem
-    m = re.search(r"([A-Za-zçÇ]+)\s+(\d{4})$", name)
-    if not m:
-        return name
+def save_layouts():
+    save_cache(LAYOUT_PATH, LAYOUT_TEMPLATES)
 
-    month_raw, year = m.group(1), m.group(2)
-    month_norm = normalize_month_name(month_raw)
+def metrics_from_regions(regions: dict, texts: dict) -> dict:
+    metrics = {}
+    for name, region in regions.items():
+        text = texts.get(name)
+        if text is None:
+            metrics[name] = None
+        elif "pair" in region:
+            # o recorte tem só o par daquela métrica
+            pairs = PAIRS_RE.findall(text)
+            metrics[name] = parse_brl(pairs[0][region["pair"]]) if len(pairs) == 1 else None
+        else:
+            metrics[name] = METRIC_LOCATOR.locate(text.splitlines(), parse=parse_brl).get(name)
+    return metrics
 
-    abbr_map = {
-        "janeiro": "jan", "fevereiro": "fev", "marco": "mar",
-        "abril": "abr", "maio": "mai", "junho": "jun", "julho": "jul",
-        "agosto": "ago", "setembro": "set", "outubro": "out",
-        "novembro": "nov", "dezembro": "dez",
-    }
+def extract_metrics_with_layout(pdf_path: Path):
+    """Métricas lidas só nos recortes do template, ou None (layout desconhecido ou template não fechou)."""
+    with telemetria.span("layout.apply"):
+        fp, texts = templates_layout.apply(pdf_path, LAYOUT_TEMPLATES)
+        if texts is None:
+            telemetria.count("layout_misses")
+            return None
+        metrics = metrics_from_regions(LAYOUT_TEMPLATES[fp]["regions"], texts)
+    if any(metrics.get(c) is None for c in METRIC_FIELDS):
+        telemetria.count("layout_fallbacks")
+        return None
+    telemetria.count("layout_hits")
+    return {c: metrics[c] for c in METRIC_FIELDS}
+
+def learn_layout(pdf_path: Path, page_texts: dict, metrics: dict):
+    """
+    Aprende página + bbox de cada métrica a partir de uma extração por texto que achou
+    os 7 campos. O template só é guardado se, aplicado ao próprio PDF, der o mesmo resultado.
+    """
+    with telemetria.span("layout.learn"):
+        order = sorted(page_texts)
+        text = "\n".join(page_texts[k] for k in order)
+        lines = text.splitlines()
+        if lines != text.split("\n"):
+            return  # quebras de linha "exóticas": a numeração das linhas não bate com a das regex
+        owner = [(k, j) for k in order for j in range(len(page_texts[k].split("\n")))]
 
-    abbr = abbr_map.get(month_norm, month_norm[:3])
-    return f"{abbr}/{year[-2:]}"
+        refs = {}  # métrica -> linhas (globais) que precisam estar no recorte
+        for fields, m in zip(PAIR_FIELDS, PAIRS_RE.finditer(text)):
+            span_lines = list(range(text.count("\n", 0, m.start()), text.count("\n", 0, m.end()) + 1))
+            for pos, name in enumerate(fields):
+                refs[name] = {"lines": span_lines, "pair": pos}
+        for name, used in METRIC_LOCATOR.locate_lines(lines, parse=parse_brl).items():
+            refs[name] = {"lines": used}
+        if set(refs) != set(METRIC_FIELDS):
+            return
+
+        # Cada métrica tem que caber numa página só
+        local = {}
+        for name, ref in refs.items():
+            pages = {owner[g][0] for g in ref["lines"]}
+            if len(pages) != 1:
+                return
+            local[name] = {**ref, "page": pages.pop(), "lines": [owner[g][1] for g in ref["lines"]]}
+
+        n_lines = {k: len(page_texts[k].split("\n")) for k in order}
+        fp, regions = templates_layout.build_regions(pdf_path, local, n_lines)
+        if regions is None:
+            telemetria.count("layout_rejected")
+            return
+        template = {"reference": pdf_path.name, "version": EXTRACTOR_VERSION, "regions": regions}
+        _, texts = templates_layout.apply(pdf_path, {fp: template})
+        check = metrics_from_regions(regions, texts)
+        if any(check[c] != metrics[c] for c in METRIC_FIELDS):
+            telemetria.count("layout_rejected")
+            return
+    LAYOUT_TEMPLATES[fp] = template
+    telemetria.count("layout_learned")
 
 
 # -------------------------------------------------------
-# Bl.5 Criação do CSV
+# Bl.3.3 Releitura dos PDFs reprovados na validação (validacao.py)
 # -------------------------------------------------------
-def periodo_sort_key(p: str):
+# Estratégias mais caras, que só rodam para as linhas que falharam: pares escolhidos pelo
+# valor (o produto tem que bater com o VTDD) em vez da posição no texto, janelas das âncoras
+# com o dobro do tamanho e linhas remontadas pelas coordenadas das palavras.
+# Qualquer resultado delas ainda passa pela validação antes de entrar no dataset.
+WIDE_LOCATOR = MetricLocator({
+    name: {**spec, "window": (2 * spec["window"][0], 2 * spec["window"][1])}
+    for name, spec in METRIC_LOCATOR.specs.items()
+})
 
-    if not isinstance(p, str) or "/" not in p:
-        return (9999, 99)
-    mes_abbr, yy = p.split("/")
-    mes_order = {
-        "jan": 1, "fev": 2, "mar": 3, "abr": 4,
-        "mai": 5, "jun": 6, "jul": 7, "ago": 8,
-        "set": 9, "out": 10, "nov": 11, "dez": 12,
-    }
-    m = mes_order.get(mes_abbr.lower(), 99)
+def pick_pairs(pairs: list, vtdd):
+    """
+    (inadimplentes/VMPP, dívidas/VMCD) entre todos os pares "mi R$" do texto: os que batem
+    com o VTDD, o de menor quantidade primeiro (toda pessoa inadimplente tem ao menos uma dívida).
+    Sem VTDD ou sem dois pares que batam, fica a ordem do texto, como no caminho normal.
+    """
+    ok = [(q, m) for q, m in pairs if q and m]
+    if vtdd:
+        batem = sorted({(q, m) for q, m in ok if abs(q * m / 1000 / vtdd - 1) <= IDENTITY_TOL})
+        if len(batem) >= 2 and batem[0][0] < batem[-1][0]:
+            return batem[0], batem[-1]
+    return (ok[0], ok[1]) if len(ok) >= 2 else ((None, None), (None, None))
+
+def extract_metrics_exhaustive(text: str, wide: bool = False) -> dict:
+    """Pares pelo pick_pairs; com wide, o que as janelas normais não acharem é buscado nas largas."""
+    lines = text.splitlines()
+    metrics = METRIC_LOCATOR.locate(lines, parse=parse_brl)
+    if wide and None in metrics.values():
+        largas = WIDE_LOCATOR.locate(lines, parse=parse_brl)
+        metrics = {name: largas[name] if v is None else v for name, v in metrics.items()}
+    pairs = [(parse_brl(q), parse_brl(m)) for q, m in PAIRS_RE.findall(text)]
+    for fields, pair in zip(PAIR_FIELDS, pick_pairs(pairs, metrics["VTDD_BI"])):
+        metrics.update(zip(fields, pair))
+    return {c: metrics[c] for c in METRIC_FIELDS}
+
+def words_to_text(words: list, y_tol: float = 3.0) -> str:
+    """
+    Texto de uma página remontado das palavras ([x0, top, x1, bottom, texto], camada_texto):
+    palavras com o topo a até y_tol pontos viram uma linha, da esquerda para a direita.
+    Junta valor e rótulo que o extract_text separa quando as fontes têm tamanhos diferentes.
+    """
+    lines, current, top = [], [], None
+    for w in sorted(words, key=lambda w: (w[1], w[0])):
+        if current and w[1] - top > y_tol:
+            lines.append(" ".join(w[4] for w in sorted(current)))
+            current = []
+        if not current:
+            top = w[1]
+        current.append(w)
+    if current:
+        lines.append(" ".join(w[4] for w in sorted(current)))
+    return "\n".join(lines)
+
+def read_pages_with_words(pdf_path: Path, text_store: bool = False):
+    """(texto de todas as páginas, palavras de cada página) pelo pdfplumber, passando pela camada de texto."""
+    sha = file_sha256(pdf_path) if text_store else None
+    layer = camada_texto.load_layer(TEXT_STORE_DIR, sha, "pdfplumber") if text_store else None
+    layer = layer or camada_texto.new_layer()
+    before = camada_texto.layer_size(layer)
+    page_texts = dict(iter_page_texts(pdf_path, layer=layer, words=True, backend="pdfplumber"))
+    if text_store and camada_texto.layer_size(layer) != before:
+        camada_texto.save_layer(TEXT_STORE_DIR, sha, "pdfplumber", layer)
+    order = sorted(page_texts)
+    return "\n".join(page_texts[k] for k in order), [layer["words"][str(k)] for k in order]
+
+def iter_reparse(pdf_path: Path, text_store: bool = False):
+    """Gera (estratégia, métricas) da mais barata para a mais cara; quem consome para na primeira que validar."""
+    yield "pdfplumber_completo", extract_metrics_from_pdf(pdf_path, lazy=False, text_store=text_store)
+    text, words = read_pages_with_words(pdf_path, text_store)
+    yield "pares_por_valor", extract_metrics_exhaustive(text)
+    yield "janelas_largas", extract_metrics_exhaustive(text, wide=True)
+    yield "coordenadas", extract_metrics_exhaustive("\n".join(words_to_text(w) for w in words), wide=True)
+
+
+# -------------------------------------------------------
+# Bl.4 PERIODO, usei o nome dos pdf
+# -------------------------------------------------------
+def period_from_filename(pdf_path: Path) -> str:
+    # "... Outubro 2024.pdf" -> "out/24"; mês desconhecido fica com as 3 primeiras letras
+    # ("... Xyz 2024.pdf" -> "xyz/24"); sem mês/ano no fim do nome, fica o nome do arquivo
+    periodo = periodos.period_from_filename(pdf_path)
+    if periodo is not None:
+        return periodos.period_label(pd.Series([periodo])).iat[0]
+    found = periodos.filename_month_year(pdf_path)
+    if found is None:
+        return pdf_path.stem
+    month_norm, year = found
+    return f"{month_norm[:3]}/{year[-2:]}"
+
+
+# -------------------------------------------------------
+# Bl.5 Criação do CSV
+# -------------------------------------------------------
+def extract_row(pdf_file: Path, lazy: bool = True, layout: bool = True,
+                text_store: bool = False, text_words: bool = False, backends=("pdfplumber",)):
+    """
+    Extrai uma linha do dataset; roda tanto no processo principal quanto nos workers.
+    Devolve (linha, erro) para que um PDF com problema não derrube o pool inteiro.
+    """
     try:
-        y = 2000 + int(yy)
-    except ValueError:
-        y = 9999
-    return (y, m)
+        with telemetria.span("pdf", item=pdf_file.name):
+            metrics = extract_metrics_from_pdf(pdf_file, lazy=lazy, layout=layout,
+                                               text_store=text_store, text_words=text_words,
+                                               backends=backends)
+    except Exception as exc:
+        telemetria.count("pdfs_failed")
+        return None, f"{type(exc).__name__}: {exc}"
+    telemetria.count("pdfs_extracted")
+    for c in METRIC_FIELDS:
+        if metrics[c] is None:
+            telemetria.count(f"regex_miss.{c}")
+    metrics["PERIODO"] = period_from_filename(pdf_file)
+    return metrics, None
+
+def _extract_row_in_worker(pdf_file: Path, lazy: bool = True, layout: bool = True, layouts: dict = None,
+                           text_store: bool = False, text_words: bool = False, backends=("pdfplumber",)):
+    # Cada worker zera a própria telemetria e devolve o que mediu junto com a linha,
+    # e também os templates de layout (com os que tiver aprendido)
+    telemetria.reset()
+    if layouts is not None:
+        LAYOUT_TEMPLATES.clear()
+        LAYOUT_TEMPLATES.update(layouts)
+    return (extract_row(pdf_file, lazy, layout, text_store, text_words, backends),
+            telemetria.snapshot(), LAYOUT_TEMPLATES)
+
+def iter_extracted_rows(pdf_files, workers: int = 1, lazy: bool = True, layout: bool = True,
+                        text_store: bool = False, text_words: bool = False, backends=("pdfplumber",)):
+    """Gera (pdf, linha, erro) na mesma ordem de pdf_files, em série ou em paralelo."""
+    if workers <= 1 or len(pdf_files) <= 1:
+        for pdf_file in pdf_files:
+            print(f"[INFO] Processando {pdf_file.name}...")
+            yield (pdf_file, *extract_row(pdf_file, lazy, layout, text_store, text_words, backends))
+        return
 
-def build_dataset():
+    if layout and not LAYOUT_TEMPLATES:
+        # Sem template ainda: o 1º PDF vai no processo principal e o template aprendido segue para os workers
+        pdf_files = list(pdf_files)
+        first = pdf_files.pop(0)
+        print(f"[INFO] Processando {first.name}...")
+        yield (first, *extract_row(first, lazy, layout, text_store, text_words, backends))
+
+    # map() preserva a ordem de entrada, então o log e as linhas saem iguais ao modo serial
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        n = len(pdf_files)
+        results = executor.map(_extract_row_in_worker, pdf_files, [lazy] * n, [layout] * n,
+                               [LAYOUT_TEMPLATES] * n, [text_store] * n, [text_words] * n, [backends] * n)
+        for pdf_file, ((metrics, erro), snap, layouts) in zip(pdf_files, results):
+            telemetria.merge(snap)
+            LAYOUT_TEMPLATES.update(layouts)
+            print(f"[INFO] Processando {pdf_file.name}...")
+            yield pdf_file, metrics, erro
+
+def cache_version(lazy: bool, layout: bool, backends=("pdfplumber",)) -> str:
+    # O modo de leitura entra na chave: resultados lazy, completos e por template não se misturam no cache
+    version = f"{EXTRACTOR_VERSION}-{'lazy' if lazy else 'full'}" + ("-layout" if layout else "")
+    # Com pdfplumber sozinho a chave continua a de antes; outra ordem de backends tem entradas próprias
+    if list(backends) != ["pdfplumber"]:
+        version += "-" + "+".join(backends)
+    return version
+
+def backend_summary():
+    """Tempo e taxa de acerto de cada backend de texto nesta execução (também vão no --report)."""
+    snap = telemetria.snapshot()
+    for backend in BACKENDS:
+        n, total, _ = snap["spans"].get(f"backend.{backend}", (0, 0.0, 0.0))
+        if not n:
+            continue
+        hits = snap["counters"].get(f"backend_hits.{backend}", 0)
+        print(f"[BACKEND] {backend}: {hits}/{n} PDF(s) validados ({100 * hits / n:.0f}%), "
+              f"{1000 * total / n:.1f} ms/PDF")
+
+def build_dataset(workers: int = 1, use_cache: bool = True, invalidate_cache: bool = False,
+                  lazy: bool = True, output_format: str = "csv", partition_by_year: bool = False,
+                  use_layouts: bool = True, text_store: bool = True, text_words: bool = False,
+                  rebuild_text: bool = False, stream: bool = False, flush_every: int = 100,
+                  max_rss_mb: float = None, backends=None, online_stats: bool = True,
+                  validate: bool = True, drop_invalid: bool = False):
+    """
+    stream=True é o modo para acervos grandes: as linhas vão para um CSV parcial a cada
+    flush_every PDFs (junto com o cache), cada lote tem o próprio pool de workers e, com
+    max_rss_mb, a extração para com MemoryError se o RSS passar do teto mesmo após um gc
+    (o que já foi extraído fica no cache, então rodar de novo continua de onde parou).
+    backends: ordem dos backends de texto (padrão DEFAULT_BACKENDS: pdfium, e pdfplumber se não validar).
+    online_stats: atualiza as estatísticas acumuladas e o status de anomalias (estatisticas_online.py).
+    validate: checa a consistência do dataset e relê só os PDFs reprovados (validate_dataset);
+    com drop_invalid, as linhas com falha grave (validacao.HARD_CHECKS) ficam fora do dataset.
+    output_format=None não grava o dataset (pipeline.py usa o DataFrame direto em memória).
+    Devolve o DataFrame do dataset (None se não houver PDFs).
+    """
     if not PDF_DIR.exists():
         raise FileNotFoundError(f"Pasta dos PDFs não encontrada: {PDF_DIR}")
 
-    rows = []
-    for pdf_file in sorted(PDF_DIR.glob("*.pdf")):
-        print(f"[INFO] Processando {pdf_file.name}...")
-        metrics = extract_metrics_from_pdf(pdf_file)
-        metrics["PERIODO"] = period_from_filename(pdf_file)
-        rows.append(metrics)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    backends = parse_backends(backends or DEFAULT_BACKENDS)
+    # O recorte do template é lido pelo pdfplumber: só compensa quando ele é o primeiro backend
+    # (o pdfium lê a página inteira mais rápido que o recorte). Fora disso os templates
+    # nem entram, e a chave do cache fica sem o "-layout"
+    use_layouts = use_layouts and backends[0] == "pdfplumber"
+    if rebuild_text:
+        # Texto relido pode mudar as métricas, então o cache delas também é descartado
+        invalidate_cache = True
+
+    inicio = time.perf_counter()
+    pdf_files = sorted(PDF_DIR.glob("*.pdf"))
+
+    # Só vão para a extração os PDFs novos ou alterados; o resto sai do cache
+    with telemetria.span("cache.lookup"):
+        cache = load_cache(CACHE_PATH) if use_cache and not invalidate_cache else {}
+        version = cache_version(lazy, use_layouts, backends)
+        shas = {pdf_file: file_sha256(pdf_file) for pdf_file in pdf_files}
+        keys = {pdf_file: cache_key(pdf_file, version, shas[pdf_file]) for pdf_file in pdf_files}
+        extracted = {pdf_file: cache[keys[pdf_file]] for pdf_file in pdf_files if keys[pdf_file] in cache}
+        misses = [pdf_file for pdf_file in pdf_files if pdf_file not in extracted]
+    telemetria.count("cache_hits", len(pdf_files) - len(misses))
+    telemetria.count("cache_misses", len(misses))
+
+    if text_store:
+        if rebuild_text:
+            camada_texto.drop_layers(TEXT_STORE_DIR, [shas[pdf_file] for pdf_file in misses])
+        # Camadas de PDFs que saíram da pasta não servem para mais nada
+        camada_texto.prune_layers(TEXT_STORE_DIR, shas.values())
+
+    if use_layouts and misses:
+        load_layouts()
+    layouts_before = dict(LAYOUT_TEMPLATES)
+
+    def save_extracted():
+        # Mantém só as entradas dos PDFs atuais, para o cache não crescer indefinidamente
+        with telemetria.span("cache.save"):
+            save_cache(CACHE_PATH, {keys[pdf_file]: extracted[pdf_file] for pdf_file in extracted})
 
-    if not rows:
+    order = {pdf_file: i for i, pdf_file in enumerate(pdf_files)}
+    partial = None
+    if stream:
+        partial = open_partial_csv()
+        for pdf_file in pdf_files:
+            if pdf_file in extracted:
+                partial.writerow(partial_row(order[pdf_file], pdf_file, extracted[pdf_file]))
+
+    # Sem stream é um lote só; com stream, um lote (e um pool de workers) a cada flush_every PDFs
+    step = max(flush_every, 1) if stream else max(len(misses), 1)
+    with telemetria.span("extracao"):
+        for start in range(0, len(misses), step):
+            batch = misses[start:start + step]
+            for pdf_file, metrics, erro in iter_extracted_rows(batch, workers, lazy, use_layouts,
+                                                               text_store, text_words, backends):
+                if erro is not None:
+                    print(f"[ERRO] Falha ao processar {pdf_file.name}: {erro}")
+                    continue
+                metrics.pop("PERIODO", None)
+                extracted[pdf_file] = metrics
+                if partial is not None:
+                    partial.writerow(partial_row(order[pdf_file], pdf_file, metrics))
+                    if memoria.over_ceiling(max_rss_mb):
+                        partial.close()
+                        if use_cache:
+                            save_extracted()
+                        raise MemoryError(
+                            f"RSS acima de {max_rss_mb} MB depois de {len(extracted)} PDFs; "
+                            f"o que já foi extraído está no cache e em {partial.path}"
+                        )
+            if partial is not None:
+                partial.flush()
+                if use_cache:
+                    save_extracted()
+                print(f"[INFO] {len(extracted)}/{len(pdf_files)} PDFs gravados em {partial.path} "
+                      f"(RSS {memoria.current_rss_mb()} MB)")
+
+    if use_layouts and LAYOUT_TEMPLATES != layouts_before:
+        save_layouts()
+        print(f"[INFO] Templates de layout atualizados em: {LAYOUT_PATH}")
+    backend_summary()
+
+    if partial is not None:
+        partial.close()
+        # O CSV parcial está na ordem de extração; aqui volta para a ordem dos arquivos (ORDEM)
+        # e passa pela mesma ordenação por período do modo normal. São só 8 colunas por PDF.
+        rows = pd.read_csv(partial.path, dtype={"PERIODO": str}).sort_values("ORDEM", kind="stable")
+        row_files = [pdf_files[o] for o in rows["ORDEM"]]
+        rows = rows.drop(columns="ORDEM").to_dict("records")
+    else:
+        row_files = [pdf_file for pdf_file in pdf_files if pdf_file in extracted]
+        rows = iter_dataset_rows(row_files, extracted)
+
+    df = rows_to_dataframe(rows) if row_files else None
+    if df is not None and validate:
+        # O índice do df é a posição em rows (o sort não refaz o índice)
+        revalidados = {pdf_file for pdf_file, m in extracted.items() if "_revalidado" in m}
+        df, relidos = validate_dataset(df, dict(enumerate(row_files)), revalidados, text_store, drop_invalid)
+        extracted.update(relidos)
+
+    if use_cache:
+        save_extracted()
+        hits = len(pdf_files) - len(misses)
+        print(
+            f"[CACHE] {hits} hit(s), {len(misses)} miss(es) "
+            f"em {time.perf_counter() - inicio:.2f}s ({CACHE_PATH})"
+        )
+
+    if df is None:
         print("[AVISO] Não foram encontrados os PDF.")
-        return
+        return None
 
-    cols = [
-        "PERIODO",
-        "INADIMPLENTES_MI",
-        "VMPP",
-        "DIVIDAS_MI",
-        "VMCD",
-        "VTDD_BI",
-        "VMAF",
-        "DESCONTOS_BI",
-    ]
+    if output_format is not None:
+        sources = pd.DataFrame({
+            "ARQUIVO": [row_files[i].name for i in df.index],
+            "SHA256": [shas[row_files[i]] for i in df.index],
+        }, index=df.index)
+        write_dataset(df, output_format, partition_by_year, sources)
+    if online_stats:
+        update_online_stats(df)
+    if partial is not None:
+        partial.path.unlink(missing_ok=True)
+    return df
+
+
+class PartialCSV:
+    """CSV parcial do modo stream: linhas gravadas conforme saem da extração."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=["ORDEM", "PERIODO"] + METRIC_FIELDS)
+        self._writer.writeheader()
+
+    def writerow(self, row: dict):
+        self._writer.writerow(row)
+
+    def flush(self):
+        with telemetria.span("saida.parcial"):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+def open_partial_csv() -> PartialCSV:
+    return PartialCSV(OUTPUT_CSV.with_name(OUTPUT_CSV.stem + ".parcial.csv"))
+
+def partial_row(ordem: int, pdf_file: Path, metrics: dict) -> dict:
+    return {"ORDEM": ordem, "PERIODO": period_from_filename(pdf_file), **{c: metrics[c] for c in METRIC_FIELDS}}
+
+
+def validate_dataset(df: pd.DataFrame, files: dict, skip=(), text_store: bool = False,
+                     drop_invalid: bool = False):
+    """
+    Checa o dataset inteiro (validacao.py) e relê só os PDFs das linhas reprovadas, com as
+    estratégias do iter_reparse, até uma passar na validação. files: {índice da linha: PDF};
+    os PDFs em skip já foram relidos numa execução anterior (marca "_revalidado" no cache)
+    e só entram no relatório. Devolve (df, {PDF: métricas com a marca}) e grava VALIDATION_PATH.
+    """
+    with telemetria.span("validacao.check"):
+        falhas = validacao.check_dataset(df, IDENTITY_TOL)
+    telemetria.count("validation_failures", len(falhas))
+    report = falhas.assign(
+        ARQUIVO=[files[i].name if i in files else "" for i in falhas.index],
+        ESTRATEGIA="",
+        CORRIGIDO=False,
+    )
+
+    relidos = {}
+    pendentes = [i for i in falhas.index.unique() if i in files and files[i] not in skip]
+    if pendentes:
+        df = df.astype({c: float for c in METRIC_FIELDS})
+    for idx in pendentes:
+        pdf_file = files[idx]
+        original = df.loc[idx, METRIC_FIELDS].to_numpy()
+        estrategia = None
+        with telemetria.span("validacao.reparse", item=pdf_file.name):
+            try:
+                for nome, metrics in iter_reparse(pdf_file, text_store):
+                    df.loc[idx, METRIC_FIELDS] = [np.nan if metrics[c] is None else metrics[c] for c in METRIC_FIELDS]
+                    if validacao.row_failures(df, idx, IDENTITY_TOL).empty:
+                        estrategia = nome
+                        break
+                    df.loc[idx, METRIC_FIELDS] = original
+            except Exception as exc:
+                df.loc[idx, METRIC_FIELDS] = original
+                print(f"[ERRO] Falha ao reler {pdf_file.name}: {type(exc).__name__}: {exc}")
+        if estrategia is not None:
+            telemetria.count(f"reparse_hits.{estrategia}")
+            report.loc[idx, ["ESTRATEGIA", "CORRIGIDO"]] = [estrategia, True]
+            print(f"[VALIDACAO] {pdf_file.name}: corrigido relendo com '{estrategia}'")
+        row = df.loc[idx, METRIC_FIELDS]
+        relidos[pdf_file] = {**{c: None if pd.isna(row[c]) else float(row[c]) for c in METRIC_FIELDS},
+                             "_revalidado": estrategia}
+
+    restantes = report[~report["CORRIGIDO"]]
+    for _, f in restantes.iterrows():
+        print(f"[AVISO] {f['PERIODO']} ({f['ARQUIVO'] or 'sem PDF nesta execução'}): "
+              f"{f['CHECAGEM']} em {f['INDICADOR']} {f['DETALHE']}".rstrip())
+    if drop_invalid:
+        invalidas = validacao.hard_failures(restantes).index.unique()
+        if len(invalidas):
+            df = df.drop(index=invalidas)
+            print(f"[VALIDACAO] {len(invalidas)} linha(s) com falha grave fora do dataset (--drop-invalid)")
+
+    VALIDATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(VALIDATION_PATH, index=False, encoding="utf-8",
+                  columns=["PERIODO", "ARQUIVO", "CHECAGEM", "INDICADOR", "VALOR", "DETALHE", "ESTRATEGIA", "CORRIGIDO"])
+    n_falhas = report.index.nunique()
+    if n_falhas:
+        print(f"[VALIDACAO] {n_falhas} linha(s) com falha, {report.loc[report['CORRIGIDO']].index.nunique()} "
+              f"corrigida(s) relendo o PDF; relatório em: {VALIDATION_PATH.resolve()}")
+    else:
+        print(f"[VALIDACAO] {len(df)} linha(s) consistentes")
+    return df, relidos
+
+
+def update_online_stats(df: pd.DataFrame):
+    """Passa os meses novos de df pelas estatísticas acumuladas e avisa das anomalias."""
+    with telemetria.span("estatisticas.online"):
+        status = estatisticas_online.update(df, METRIC_FIELDS, STATS_PATH, STATUS_PATH)
+    telemetria.count("stats_new_periods", len(status["novos_periodos"]))
+    telemetria.count("stats_anomalies", len(status["anomalias"]))
+    for a in status["anomalias"]:
+        print(f"[AVISO] {a['INDICADOR']} fora do esperado em {a['PERIODO']}: {a['VALOR']} "
+              f"(z={a['Z']}, ewma_z={a['EWMA_Z']})")
+    print(f"[STATS] {len(status['novos_periodos'])} período(s) novo(s)"
+          + (" (estado refeito)" if status["reconstruido"] else "")
+          + f", {len(status['anomalias'])} anomalia(s); status em: {STATUS_PATH.resolve()}")
+    return status
+
+
+def iter_dataset_rows(pdf_files, extracted: dict):
+    """Linhas do dataset (PERIODO + métricas), uma por PDF, na ordem de pdf_files."""
+    for pdf_file in pdf_files:
+        yield {**extracted[pdf_file], "PERIODO": period_from_filename(pdf_file)}
+
+
+def rows_to_dataframe(rows) -> pd.DataFrame:
+    """rows: lista ou gerador de dicts (o DataFrame consome o gerador direto)."""
+    cols = ["PERIODO"] + METRIC_FIELDS
 
     df = pd.DataFrame(rows, columns=cols)
 
@@ -236,13 +916,228 @@ def build_dataset():
     for c in cols[1:]:
         df[c] = pd.to_numeric(df[c], errors="coerce")
 
-    # Para ordenar pelo PERIODO (ano/mês)
-    df = df.sort_values(by="PERIODO", key=lambda s: s.map(periodo_sort_key))
+    # Para ordenar pelo PERIODO (ano/mês); stable para empates (ex.: edições regionais do mesmo mês)
+    return sort_by_periodo(df)
+
+def sort_by_periodo(df: pd.DataFrame) -> pd.DataFrame:
+    return periodos.sort_by_periodo(df, "PERIODO")
+
+def write_dataset(df: pd.DataFrame, output_format: str = "csv", partition_by_year: bool = False,
+                  sources: pd.DataFrame = None):
+    """sources: ARQUIVO e SHA256 de cada linha de df (mesmo índice), usados pela saída sqlite."""
+    if output_format in ("csv", "both"):
+        OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+        with telemetria.span("saida.csv"):
+            df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
+        print(f"[OK] CSV gerado em: {OUTPUT_CSV.resolve()}")
+
+    if output_format in ("parquet", "both"):
+        with telemetria.span("saida.parquet"):
+            write_parquet(df, OUTPUT_PARQUET, partition_by_year=partition_by_year)
+        print(f"[OK] Parquet gerado em: {OUTPUT_PARQUET.resolve()}")
+
+    if output_format == "sqlite":
+        # Build completo: PDF que saiu da pasta também sai do armazém
+        upsert_store(df, sources, prune=True)
+
+
+def upsert_store(df: pd.DataFrame, sources: pd.DataFrame, prune: bool = False):
+    with telemetria.span("saida.sqlite"):
+        con = armazem_sqlite.connect(OUTPUT_SQLITE)
+        try:
+            n = armazem_sqlite.upsert_metrics(con, df, sources, prune=prune)
+        finally:
+            con.close()
+    print(f"[OK] SQLite em {OUTPUT_SQLITE.resolve()}: {n['novos']} novo(s), {n['alterados']} alterado(s), "
+          f"{n['iguais']} sem mudança, {n['removidos']} removido(s)")
+
+
+def upsert_dataset(pdf_files, workers: int = 1, lazy: bool = True, use_cache: bool = True,
+                   use_layouts: bool = True, text_store: bool = True, text_words: bool = False,
+                   backends=None, online_stats: bool = True, validate: bool = True,
+                   drop_invalid: bool = False):
+    """
+    Extrai só pdf_files e faz upsert no OUTPUT_CSV existente: a linha de um PERIODO
+    que já existe é substituída, PERIODO novo entra na posição certa da ordem de períodos.
+    Se o armazém SQLite (OUTPUT_SQLITE) já existir, os mesmos PDFs também entram nele por upsert.
+    Devolve (df_antes, df_depois) para quem precisa saber o que mudou.
+    """
+    pdf_files = sorted(pdf_files)
+    backends = parse_backends(backends or DEFAULT_BACKENDS)
+    use_layouts = use_layouts and backends[0] == "pdfplumber"
+    old = pd.read_csv(OUTPUT_CSV) if OUTPUT_CSV.exists() else pd.DataFrame(columns=["PERIODO"] + METRIC_FIELDS)
+
+    version = cache_version(lazy, use_layouts, backends)
+    cache = load_cache(CACHE_PATH) if use_cache else {}
+
+    # Conteúdo já conhecido (ex.: só o mtime mudou) sai do cache sem reextrair.
+    # Cada PDF é lido uma vez para o hash, que serve à chave do cache e ao armazém SQLite
+    shas = {pdf_file: file_sha256(pdf_file) for pdf_file in pdf_files}
+    keys = {pdf_file: cache_key(pdf_file, version, shas[pdf_file]) for pdf_file in pdf_files}
+    new_rows = [
+        {**cache[keys[pdf_file]], "PERIODO": period_from_filename(pdf_file)}
+        for pdf_file in pdf_files if keys[pdf_file] in cache
+    ]
+    misses = [pdf_file for pdf_file in pdf_files if keys[pdf_file] not in cache]
+
+    if use_layouts and misses:
+        load_layouts()
+    layouts_before = dict(LAYOUT_TEMPLATES)
+
+    for pdf_file, metrics, erro in iter_extracted_rows(misses, workers, lazy, use_layouts,
+                                                       text_store, text_words, backends):
+        if erro is not None:
+            print(f"[ERRO] Falha ao processar {pdf_file.name}: {erro}")
+            continue
+        new_rows.append(metrics)
+        if use_cache:
+            cache[keys[pdf_file]] = {c: metrics[c] for c in METRIC_FIELDS}
+
+    if use_cache and misses:
+        save_cache(CACHE_PATH, cache)
+    if use_layouts and LAYOUT_TEMPLATES != layouts_before:
+        save_layouts()
+
+    if not new_rows:
+        return old, old
+
+    new = rows_to_dataframe(new_rows).drop_duplicates("PERIODO", keep="last")
+    merged = pd.concat([old[~old["PERIODO"].isin(new["PERIODO"])], new], ignore_index=True)
+    merged = rows_to_dataframe(merged.to_dict("records")).reset_index(drop=True)
+    by_period = {period_from_filename(pdf_file): pdf_file for pdf_file in pdf_files}
+    if validate:
+        # Só os PDFs desta chamada podem ser relidos; as linhas antigas só entram no relatório
+        files = {i: by_period[p] for i, p in merged["PERIODO"].items() if p in by_period}
+        revalidados = {f for f in pdf_files if "_revalidado" in cache.get(keys[f], {})}
+        merged, relidos = validate_dataset(merged, files, revalidados, text_store, drop_invalid)
+        if use_cache and relidos:
+            cache.update({keys[pdf_file]: m for pdf_file, m in relidos.items()})
+            save_cache(CACHE_PATH, cache)
 
     OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
-    print(f"[OK] CSV gerado em: {OUTPUT_CSV.resolve()}")
+    with telemetria.span("saida.csv"):
+        merged.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
+    print(f"[OK] {len(new)} período(s) atualizados em: {OUTPUT_CSV.resolve()}")
+    if OUTPUT_SQLITE.exists():
+        linhas = merged[merged["PERIODO"].isin(by_period)]
+        sources = pd.DataFrame({
+            "ARQUIVO": [by_period[p].name for p in linhas["PERIODO"]],
+            "SHA256": [shas[by_period[p]] for p in linhas["PERIODO"]],
+        }, index=linhas.index)
+        upsert_store(linhas, sources)
+    if online_stats:
+        update_online_stats(merged)
+    return old, merged
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera datasets/serasa.csv a partir dos PDFs da Serasa.")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="processos para extrair os PDFs em paralelo (1 = serial, 0 = todos os núcleos)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="não lê nem grava o cache de extração",
+    )
+    parser.add_argument(
+        "--invalidate-cache", action="store_true",
+        help="descarta o cache e reextrai todos os PDFs",
+    )
+    parser.add_argument(
+        "--full-text", action="store_true",
+        help="extrai o texto de todas as páginas antes de buscar as métricas (modo antigo)",
+    )
+    parser.add_argument(
+        "--no-layout", action="store_true",
+        help="não usa os templates de layout (página + bbox de cada métrica) e sempre lê pelo texto; "
+             "com os templates, o texto (camada ou backends) só entra quando o template não fecha. "
+             "Os templates só valem com pdfplumber como primeiro backend (--backends pdfplumber,...)",
+    )
+    parser.add_argument(
+        "--backends", default=os.environ.get("SERASA_BACKENDS", ",".join(DEFAULT_BACKENDS)),
+        help="backends de texto na ordem de tentativa, separados por vírgula "
+             f"({', '.join(BACKENDS)}; ou SERASA_BACKENDS). Ex.: --backends pdfplumber",
+    )
+    parser.add_argument(
+        "--no-text-store", action="store_true",
+        help="não lê nem grava a camada de texto das páginas (datasets/cache/textos); lê sempre do PDF",
+    )
+    parser.add_argument(
+        "--text-words", action="store_true",
+        help="guarda também as palavras com coordenadas na camada de texto",
+    )
+    parser.add_argument(
+        "--rebuild-text", action="store_true",
+        help="relê o texto dos PDFs e refaz a camada de texto (e as métricas)",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="acervos grandes: grava as linhas num CSV parcial por lotes, sem juntar tudo em memória",
+    )
+    parser.add_argument(
+        "--flush-every", type=int, default=100,
+        help="com --stream, PDFs por lote (flush do CSV parcial e do cache)",
+    )
+    parser.add_argument(
+        "--max-rss-mb", type=float, default=None,
+        help="com --stream, interrompe a extração se o RSS passar deste teto (MB)",
+    )
+    parser.add_argument(
+        "--no-validate", action="store_true",
+        help="não checa a consistência do dataset nem relê os PDFs reprovados",
+    )
+    parser.add_argument(
+        "--drop-invalid", action="store_true",
+        help="deixa fora do dataset as linhas que continuarem inconsistentes depois da releitura "
+             "(faixa, identidade ou pares; indicador ausente só é sinalizado e fica como NaN)",
+    )
+    parser.add_argument(
+        "--no-stats", action="store_true",
+        help="não atualiza as estatísticas acumuladas nem o status de anomalias (datasets/status_indicadores.*)",
+    )
+    parser.add_argument(
+        "--format", choices=["csv", "parquet", "both", "sqlite"], default="csv",
+        help="formato de saída do dataset (both = csv + parquet; parquet precisa do pyarrow; "
+             f"sqlite faz upsert só dos PDFs alterados em {OUTPUT_SQLITE})",
+    )
+    parser.add_argument(
+        "--partition-by-year", action="store_true",
+        help="grava o Parquet como diretório particionado por ANO",
+    )
+    parser.add_argument(
+        "--report", type=Path, default=telemetria.env_report_path(),
+        help="grava um relatório JSON com tempos por etapa/PDF e contadores (ou SERASA_REPORT)",
+    )
+    parser.add_argument(
+        "--profile", type=Path, default=telemetria.env_profile_path(),
+        help="roda sob cProfile e grava as estatísticas neste arquivo (ou SERASA_PROFILE)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    build_dataset()
\ No newline at end of file
+    args = parse_args()
+    with telemetria.profiled(args.profile):
+        with telemetria.span("build_dataset"):
+            build_dataset(
+                workers=args.workers,
+                use_cache=not args.no_cache,
+                invalidate_cache=args.invalidate_cache,
+                lazy=not args.full_text,
+                output_format=args.format,
+                partition_by_year=args.partition_by_year,
+                use_layouts=not args.no_layout,
+                text_store=not args.no_text_store,
+                text_words=args.text_words,
+                rebuild_text=args.rebuild_text,
+                stream=args.stream,
+                flush_every=args.flush_every,
+                max_rss_mb=args.max_rss_mb,
+                backends=args.backends,
+                online_stats=not args.no_stats,
+                validate=not args.no_validate,
+                drop_invalid=args.drop_invalid,
+            )
+    if args.report:
+        telemetria.write_report(args.report, script="pdf2csv 2.0.py", args={k: str(v) for k, v in vars(args).items()})
\ No newline at end of file
@@ -0,0 +1,27 @@
+# pdf2csv_modulo.py
+
+# O script "pdf2csv 2.0.py" tem espaço no nome, então não dá para fazer "import".
+# Aqui ele é carregado pelo caminho e registrado como módulo "pdf2csv2", para que
+# outros scripts (benchmark, EDA, etc.) possam reutilizar as funções de extração.
+
+from pathlib import Path
+import importlib.util
+import sys
+
+PDF2CSV_PATH = Path(__file__).resolve().parent / "pdf2csv 2.0.py"
+MODULE_NAME = "pdf2csv2"
+
+
+def load_pdf2csv():
+    if MODULE_NAME in sys.modules:
+        return sys.modules[MODULE_NAME]
+    spec = importlib.util.spec_from_file_location(MODULE_NAME, PDF2CSV_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registrar antes de executar: o pickle dos workers (ProcessPoolExecutor) acha as funções pelo nome
+    sys.modules[MODULE_NAME] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[MODULE_NAME]
+        raise
+    return module
@@ -0,0 +1,122 @@
+# periodos.py
+
+# Períodos mensais compartilhados entre a extração (pdf2csv 2.0.py) e o EDA.
+# Por dentro tudo é pd.Period com frequência mensal ("period[M]"): ordenação,
+# rótulos e meses futuros saem de operações vetorizadas sobre a coluna inteira,
+# sem split de string linha a linha. O texto "out/24" continua sendo o formato
+# do CSV e das tabelas, só que agora é gerado a partir do período.
+
+from pathlib import Path
+import re
+
+import numpy as np
+import pandas as pd
+
+from localizador_metricas import normalize_text
+
+MESES_ABBR = ["jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"]
+MESES_NOME = [
+    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
+]
+MESES_FULL = dict(zip(MESES_ABBR, MESES_NOME))
+MES_NUM = {abbr: i + 1 for i, abbr in enumerate(MESES_ABBR)}
+
+_ABBR_ARR = np.array(MESES_ABBR + [""], dtype=object)   # índice 12 = NaT
+_NOME_ARR = np.array(MESES_NOME + [""], dtype=object)
+
+
+def to_period(labels) -> pd.Series:
+    """'out/24' -> Period('2024-10', 'M'), vetorizado. O que não casar vira NaT."""
+    s = labels if isinstance(labels, pd.Series) else pd.Series(labels)
+    parts = s.astype("string").str.strip().str.lower().str.split("/", n=1, expand=True)
+    if parts.shape[1] < 2:
+        return pd.Series(pd.NaT, index=s.index, dtype="period[M]")
+    mes = parts[0].map(MES_NUM).to_numpy(dtype="float64", na_value=np.nan)
+    ano_txt = parts[1].str.strip()
+    ano = pd.to_numeric(ano_txt, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    # "out/24" é 2024; "out/2024" já vem com o século
+    ano = np.where(ano_txt.str.len().to_numpy(dtype="float64", na_value=np.nan) <= 2, 2000 + ano, ano)
+    # ordinal de period[M] = meses desde jan/1970; NaT é o menor int64
+    ok = ~(np.isnan(mes) | np.isnan(ano))
+    ordinals = np.full(len(s), np.iinfo(np.int64).min, dtype=np.int64)
+    ordinals[ok] = (ano[ok] - 1970).astype(np.int64) * 12 + mes[ok].astype(np.int64) - 1
+    return pd.Series(pd.PeriodIndex.from_ordinals(ordinals, freq="M"), index=s.index)
+
+
+def _month_index(periods: pd.Series) -> np.ndarray:
+    # 0..11 para meses válidos e 12 para NaT (aponta para o "" no fim dos arrays de nomes)
+    return periods.dt.month.fillna(13).astype(int).to_numpy() - 1
+
+
+def period_label(periods: pd.Series) -> pd.Series:
+    """Period -> 'out/24'."""
+    periods = pd.Series(periods).astype("period[M]")
+    ano = periods.dt.year
+    yy = (ano % 100).fillna(0).astype(int).astype(str).str.zfill(2)
+    out = pd.Series(_ABBR_ARR[_month_index(periods)], index=periods.index) + "/" + yy
+    return out.where(periods.notna(), None)
+
+
+def full_label(periods: pd.Series) -> pd.Series:
+    """Period -> 'Outubro 2024'."""
+    periods = pd.Series(periods).astype("period[M]")
+    ano = periods.dt.year.fillna(0).astype(int).astype(str)
+    out = pd.Series(_NOME_ARR[_month_index(periods)], index=periods.index) + " " + ano
+    return out.where(periods.notna(), None)
+
+
+def month_name(periods: pd.Series) -> pd.Series:
+    """Period -> 'Outubro'."""
+    periods = pd.Series(periods).astype("period[M]")
+    return pd.Series(_NOME_ARR[_month_index(periods)], index=periods.index).where(periods.notna(), None)
+
+
+def full_label_from_text(labels: pd.Series) -> pd.Series:
+    """'out/24' -> 'Outubro 2024'; rótulo que não for período passa sem mudança."""
+    labels = pd.Series(labels)
+    return full_label(to_period(labels)).fillna(labels)
+
+
+def sort_by_periodo(df: pd.DataFrame, col: str = "PERIODO") -> pd.DataFrame:
+    """Ordena pelo período (ano/mês); inválidos no fim, empates na ordem original."""
+    return df.sort_values(by=col, key=to_period, kind="stable", na_position="last")
+
+
+def future_periods(last, n: int) -> pd.PeriodIndex:
+    """Os n meses seguintes a last (Period ou 'out/24')."""
+    if not isinstance(last, pd.Period):
+        last = to_period(pd.Series([last])).iat[0]
+    return pd.period_range(last + 1, periods=n, freq="M")
+
+
+# -------------------------------------------------------
+# Nome dos PDFs: "SERASA Mapa da Inadimplencia <Mês> <Ano>.pdf"
+# -------------------------------------------------------
+_MES_POR_NOME = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+
+def filename_month_year(pdf_path: Path):
+    """(mês normalizado, ano com 4 dígitos) do fim do nome do arquivo, ou None."""
+    m = re.search(r"([A-Za-zçÇ]+)\s+(\d{4})$", Path(pdf_path).stem)
+    if not m:
+        return None
+    return normalize_text(m.group(1).strip()).lower(), m.group(2)
+
+
+def period_from_filename(pdf_path: Path):
+    """Period do mês/ano no fim do nome do arquivo, ou None se não achar."""
+    found = filename_month_year(pdf_path)
+    if found is None:
+        return None
+    month_norm, year = found
+    mes = _MES_POR_NOME.get(month_norm)
+    if mes is None:
+        # prefixo de 3 letras ("Set 2025", "Out 2024"...)
+        mes = MES_NUM.get(month_norm[:3])
+    if mes is None:
+        return None
+    return pd.Period(year=int(year), month=mes, freq="M")
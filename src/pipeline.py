@@ -0,0 +1,144 @@
+# pipeline.py
+
+# Atualização mensal num processo só: PDFs -> DataFrame em memória -> etapas do EDA.
+# O caminho de sempre (pdf2csv 2.0.py grava o serasa.csv, o EDA.py lê de novo, converte
+# com pd.to_numeric e reordena) passa o dataset duas vezes pelo disco. Aqui o
+# build_dataset devolve o DataFrame já numérico e em ordem de período, o
+# EDA.prepare_data só acrescenta as colunas auxiliares e o run_stages roda em cima dele.
+#
+# Gravar em disco é opcional e separado:
+#   --sink csv|parquet|both|sqlite   dataset (o mesmo write_dataset do pdf2csv)
+#   --save-tables                    CSVs das tabelas do EDA (tabela_inadimplentes.csv...)
+# Com --sink sqlite as tabelas derivadas e a rodada de previsão vão para o armazém também.
+# As figuras continuam sendo gravadas quando a etapa "figures" roda.
+#
+# Uso (da raiz do projeto): python src/pipeline.py [stats] [tables] [figures] [forecast] [indicators] [backtest] [all]
+
+from pathlib import Path
+import argparse
+import os
+
+import armazem_sqlite
+import EDA
+import instrumentacao as telemetria
+import previsao
+from pdf2csv_modulo import load_pdf2csv
+
+SINKS = ["csv", "parquet", "both", "sqlite"]
+
+
+def run(stages=("all",), sink: str = None, save_tables: bool = False, workers: int = 1,
+        de=None, ate=None, build_kwargs: dict = None, **eda_kwargs):
+    """
+    Extrai (reaproveitando o cache), prepara e roda as etapas do EDA sem reler o dataset.
+    sink: formato em que o dataset também é gravado (None = só em memória).
+    build_kwargs vão para o build_dataset; eda_kwargs para o EDA.run_stages.
+    Devolve (df, tabelas), ou None se não houver PDFs.
+    """
+    pdf2csv = load_pdf2csv()
+    with telemetria.span("pipeline.build_dataset"):
+        dados = pdf2csv.build_dataset(workers=workers, output_format=sink, **(build_kwargs or {}))
+    if dados is None:
+        return None
+
+    with telemetria.span("pipeline.prepare_data"):
+        df = EDA.prepare_data(dados, de=de, ate=ate)
+    telemetria.count("rows", len(df))
+    print(f"[INFO] {len(df)} mês(es) em memória para o EDA (sem reler {pdf2csv.OUTPUT_CSV})")
+
+    con = armazem_sqlite.connect(pdf2csv.OUTPUT_SQLITE) if sink == "sqlite" else None
+    try:
+        tabelas = EDA.run_stages(df, stages, save=save_tables, con=con, **eda_kwargs)
+    finally:
+        if con is not None:
+            con.close()
+    return df, tabelas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PDFs da Serasa -> EDA e previsão num processo só, em memória.")
+    parser.add_argument(
+        "stages", nargs="*", choices=EDA.STAGES + ["all"], default="all",
+        help="etapas do EDA a rodar (padrão: all)",
+    )
+    parser.add_argument(
+        "--sink", choices=SINKS, default=None,
+        help="também grava o dataset neste formato (padrão: não grava; both = csv + parquet)",
+    )
+    parser.add_argument(
+        "--save-tables", action="store_true",
+        help="grava os CSVs das tabelas do EDA (padrão: só em memória)",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="processos para extrair os PDFs que não estão no cache (0 = todos os núcleos)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="não lê nem grava o cache de extração",
+    )
+    parser.add_argument(
+        "--no-validate", action="store_true",
+        help="não checa a consistência do dataset nem relê os PDFs reprovados",
+    )
+    parser.add_argument(
+        "--no-stats", action="store_true",
+        help="não atualiza as estatísticas acumuladas nem o status de anomalias",
+    )
+    parser.add_argument("--de", default=None, help="primeiro mês analisado, inclusive (ex.: jan/24)")
+    parser.add_argument("--ate", default=None, help="último mês analisado, inclusive (ex.: dez/25)")
+    parser.add_argument(
+        "--fig-workers", type=int, default=int(os.environ.get("SERASA_FIG_WORKERS", "1")),
+        help="processos para renderizar as figuras (ou SERASA_FIG_WORKERS)",
+    )
+    parser.add_argument(
+        "--backtest-workers", type=int, default=int(os.environ.get("SERASA_BACKTEST_WORKERS", "1")),
+        help="processos para as origens do backtest (ou SERASA_BACKTEST_WORKERS)",
+    )
+    parser.add_argument(
+        "--seasonal", action="store_true",
+        help="previsão dos indicadores com sazonalidade mensal além da tendência",
+    )
+    parser.add_argument(
+        "--paths", type=int, default=previsao.N_PATHS,
+        help=f"trajetórias simuladas para os intervalos de previsão (padrão: {previsao.N_PATHS})",
+    )
+    parser.add_argument(
+        "--interval-method", choices=["bootstrap", "normal"], default="bootstrap",
+        help="ruído das trajetórias: resíduos reamostrados (padrão) ou normal",
+    )
+    parser.add_argument(
+        "--report", type=Path, default=telemetria.env_report_path(),
+        help="grava um relatório JSON com tempos por etapa (ou SERASA_REPORT)",
+    )
+    parser.add_argument(
+        "--profile", type=Path, default=telemetria.env_profile_path(),
+        help="roda sob cProfile e grava as estatísticas neste arquivo (ou SERASA_PROFILE)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with telemetria.profiled(args.profile):
+        with telemetria.span("pipeline.main"):
+            run(
+                args.stages,
+                sink=args.sink,
+                save_tables=args.save_tables,
+                workers=args.workers,
+                de=args.de,
+                ate=args.ate,
+                build_kwargs={
+                    "use_cache": not args.no_cache,
+                    "validate": not args.no_validate,
+                    "online_stats": not args.no_stats,
+                },
+                fig_workers=args.fig_workers,
+                backtest_workers=args.backtest_workers,
+                seasonal=args.seasonal,
+                n_paths=args.paths,
+                interval_method=args.interval_method,
+            )
+    if args.report:
+        telemetria.write_report(args.report, script="pipeline.py", stages=args.stages)
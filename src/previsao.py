@@ -0,0 +1,213 @@
+# previsao.py
+
+# Previsão em lote dos indicadores da Serasa por mínimos quadrados em forma fechada.
+# Todas as séries dividem o mesmo eixo de tempo, então a matriz de projeto X é uma
+# só e o ajuste de k séries é um único np.linalg.lstsq(X, Y) com Y de forma (n, k):
+# ajustar centenas de séries (ex.: uma por região) custa praticamente o mesmo que uma.
+# Só depende de NumPy/pandas; o scikit-learn não é mais necessário para a previsão.
+
+import numpy as np
+import pandas as pd
+
+import periodos
+
+INDICADORES = [
+    "INADIMPLENTES_MI",
+    "VMPP",
+    "DIVIDAS_MI",
+    "VMCD",
+    "VTDD_BI",
+    "VMAF",
+    "DESCONTOS_BI",
+]
+
+
+# -------------------------------------------------------
+# Bl.1 Matriz de projeto e ajuste
+# -------------------------------------------------------
+def design_matrix(t, meses=None, seasonal: bool = False) -> np.ndarray:
+    """Colunas: intercepto, tendência t e, com seasonal, 11 dummies de mês (janeiro é a base)."""
+    t = np.asarray(t, dtype=float)
+    cols = [np.ones_like(t), t]
+    if seasonal:
+        meses = np.asarray(meses)
+        cols += [(meses == m).astype(float) for m in range(2, 13)]
+    return np.column_stack(cols)
+
+
+def fit_batch(X: np.ndarray, Y: np.ndarray) -> np.ndarray:
+    """
+    Coeficientes (p, k) de todas as colunas de Y numa tacada.
+    NaN numa série tira aquela linha só do ajuste dela: séries com o mesmo padrão
+    de faltantes são resolvidas juntas (sem faltantes, é um lstsq só).
+    """
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    coef = np.full((X.shape[1], Y.shape[1]), np.nan)
+
+    patterns, inverse = np.unique(np.isnan(Y).T, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for i, missing in enumerate(patterns):
+        rows = ~missing
+        if not rows.any():
+            continue
+        cols = np.flatnonzero(inverse == i)
+        coef[:, cols] = np.linalg.lstsq(X[rows], Y[np.ix_(rows, cols)], rcond=None)[0]
+    return coef
+
+
+def score(Y_true: np.ndarray, Y_pred: np.ndarray):
+    """(R², RMSE) por coluna, ignorando NaN."""
+    err = Y_true - Y_pred
+    valid = ~np.isnan(err)
+    n = valid.sum(axis=0)
+    ss_res = (np.where(valid, err, 0.0) ** 2).sum(axis=0)
+    mean = np.where(valid, Y_true, 0.0).sum(axis=0) / np.maximum(n, 1)
+    ss_tot = (np.where(valid, Y_true - mean, 0.0) ** 2).sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse = np.where(n > 0, np.sqrt(ss_res / np.maximum(n, 1)), np.nan)
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+    return r2, rmse
+
+
+# -------------------------------------------------------
+# Bl.2 Previsão de várias séries
+# -------------------------------------------------------
+def forecast_batch(df: pd.DataFrame, cols=None, horizon: int = 5,
+                   seasonal: bool = False, train_frac: float = 0.7) -> dict:
+    """
+    df em ordem temporal, com PERIODO_M (como sai do EDA.load_data); t é opcional.
+    O ajuste no treino (primeiros train_frac do histórico) dá as métricas de teste e a previsão
+    do histórico; o reajuste no histórico todo projeta os próximos horizon meses.
+
+    Devolve um dict com:
+      "hist":    previsão do ajuste de treino no histórico todo (DataFrame n x k)
+      "future":  previsão dos próximos meses (DataFrame indexado pelo período)
+      "metrics": R2 e RMSE de teste por série
+      "coef":    coeficientes do ajuste completo (p x k)
+      "seasonal": se a sazonalidade entrou mesmo (cai para só tendência com pouco histórico)
+      "X", "Y", "X_future": matrizes do ajuste completo (para simulate_paths)
+    """
+    cols = [c for c in (INDICADORES if cols is None else cols) if c in df]
+    n = len(df)
+    t = df["t"].to_numpy(dtype=float) if "t" in df else np.arange(n, dtype=float)
+    meses = df["PERIODO_M"].dt.month.to_numpy()
+    Y = df[cols].to_numpy(dtype=float)
+
+    n_train = int(n * train_frac)
+    X = design_matrix(t, meses, seasonal)
+    if seasonal and n_train <= X.shape[1]:
+        print(f"[AVISO] Só {n_train} meses de treino para {X.shape[1]} coeficientes; "
+              "previsão sem sazonalidade (precisa de uns 2 anos de histórico).")
+        seasonal = False
+        X = design_matrix(t, meses, seasonal)
+
+    coef_train = fit_batch(X[:n_train], Y[:n_train])
+    pred_hist = X @ coef_train
+    r2, rmse = score(Y[n_train:], pred_hist[n_train:])
+
+    coef = fit_batch(X, Y)
+
+    future_p = periodos.future_periods(df["PERIODO_M"].iloc[-1], horizon)
+    future_t = t[-1] + np.arange(1, horizon + 1)
+    X_future = design_matrix(future_t, future_p.month, seasonal)
+
+    return {
+        "hist": pd.DataFrame(pred_hist, index=df.index, columns=cols),
+        "future": pd.DataFrame(X_future @ coef, index=future_p, columns=cols),
+        "metrics": pd.DataFrame({"R2": r2, "RMSE": rmse}, index=pd.Index(cols, name="SERIE")),
+        "coef": coef,
+        "seasonal": seasonal,
+        "X": X,
+        "Y": Y,
+        "X_future": X_future,
+    }
+
+
+def forecast_table(df: pd.DataFrame, resultado: dict, quantis: dict = None) -> pd.DataFrame:
+    """
+    Tabela no estilo da tabela_vtdd_previsao.csv para todas as séries:
+    PERIODO, e para cada série <SERIE>_REAL, <SERIE>_PRED (histórico) e <SERIE>_PREVISTA (futuro).
+    Com quantis (saída do path_quantiles), também <SERIE>_P5, <SERIE>_P50... nos meses futuros.
+    """
+    hist, future = resultado["hist"], resultado["future"]
+    n_hist, n_future = len(hist), len(future)
+    out = {"PERIODO": np.concatenate([
+        df["PERIODO"].to_numpy(dtype=object),
+        periodos.period_label(pd.Series(future.index)).to_numpy(dtype=object),
+    ])}
+    nan_hist, nan_future = np.full(n_hist, np.nan), np.full(n_future, np.nan)
+    for c in hist.columns:
+        out[f"{c}_REAL"] = np.concatenate([df[c].to_numpy(dtype=float), nan_future])
+        out[f"{c}_PRED"] = np.concatenate([np.round(hist[c].to_numpy(), 2), nan_future])
+        out[f"{c}_PREVISTA"] = np.concatenate([nan_hist, np.round(future[c].to_numpy(), 2)])
+        for nome, q in (quantis or {}).items():
+            out[f"{c}_{nome}"] = np.concatenate([nan_hist, np.round(q[c].to_numpy(), 2)])
+    return pd.DataFrame(out)
+
+
+# -------------------------------------------------------
+# Bl.3 Intervalos de previsão por simulação
+# -------------------------------------------------------
+# Milhares de trajetórias futuras por série num único array (trajetórias, horizonte, séries),
+# sem laço por trajetória. Cada trajetória sorteia:
+#   - coeficientes da normal do estimador de MQO, N(coef, sigma² (X'X)^-1), o que abre o
+#     leque com o horizonte (a incerteza da tendência cresce com t);
+#   - ruído de cada mês: resíduos do ajuste reamostrados ("bootstrap", o mesmo mês para
+#     todas as séries, preservando a correlação entre elas) ou normal com o sigma da série ("normal").
+N_PATHS = 10_000
+QUANTIS = (5, 50, 95)
+
+
+def simulate_paths(resultado: dict, n_paths: int = N_PATHS, method: str = "bootstrap",
+                   seed=42) -> np.ndarray:
+    """Trajetórias (n_paths, horizonte, séries) a partir do ajuste completo do forecast_batch."""
+    if method not in ("bootstrap", "normal"):
+        raise ValueError(f"Método de simulação desconhecido: {method} (bootstrap ou normal)")
+    rng = np.random.default_rng(seed)
+    X, Y, X_future, coef = resultado["X"], resultado["Y"], resultado["X_future"], resultado["coef"]
+    n, p = X.shape
+    k = Y.shape[1]
+
+    resid = Y - X @ coef
+    valid = ~np.isnan(resid)
+    n_valid = valid.sum(axis=0)
+    dof = np.maximum(n_valid - p, 1)
+    sigma = np.sqrt(np.nansum(resid ** 2, axis=0) / dof)
+
+    # Coeficientes: (X_v'X_v)^-1 depende das linhas válidas, então uma Cholesky por padrão de faltantes
+    Z = rng.standard_normal((n_paths, p, k))
+    beta = np.broadcast_to(coef, (n_paths, p, k)).copy()
+    patterns, inverse = np.unique(~valid.T, axis=0, return_inverse=True)
+    for i, missing in enumerate(patterns):
+        rows = ~missing
+        cols = np.flatnonzero(inverse.ravel() == i)
+        if rows.sum() <= p:
+            continue  # sem graus de liberdade: fica só o ruído
+        L = np.linalg.cholesky(np.linalg.pinv(X[rows].T @ X[rows]))
+        beta[:, :, cols] += (L @ Z[:, :, cols]) * sigma[cols]
+    tendencia = np.einsum("hp,npk->nhk", X_future, beta)
+
+    horizon = X_future.shape[0]
+    if method == "normal":
+        ruido = rng.standard_normal((n_paths, horizon, k)) * sigma
+    else:
+        # Reamostra entre os meses válidos de cada série (válidos primeiro, via argsort estável);
+        # o mesmo sorteio u para todas as séries mantém o mês comum quando não há faltantes
+        ordem = np.argsort(~valid, axis=0, kind="stable")
+        u = rng.random((n_paths, horizon, 1))
+        pos = np.minimum((u * n_valid).astype(int), np.maximum(n_valid - 1, 0))
+        linhas = ordem[pos, np.arange(k)]
+        # Resíduos de MQO são menores que os erros verdadeiros; o fator corrige os graus de liberdade
+        escala = np.sqrt(np.maximum(n_valid, 1) / dof)
+        ruido = np.nan_to_num(resid[linhas, np.arange(k)]) * escala
+    return tendencia + ruido
+
+
+def path_quantiles(resultado: dict, paths: np.ndarray, quantis=QUANTIS) -> dict:
+    """{"P5": DataFrame(períodos futuros x séries), ...} a partir das trajetórias."""
+    future = resultado["future"]
+    qs = np.percentile(paths, quantis, axis=0)
+    return {f"P{q:g}": pd.DataFrame(v, index=future.index, columns=future.columns) for q, v in zip(quantis, qs)}
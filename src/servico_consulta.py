@@ -0,0 +1,366 @@
+# servico_consulta.py
+
+# Serviço HTTP/JSON local para os dashboards, no lugar de reler serasa.csv,
+# tabela_inadimplentes.csv e tabela_vtdd_previsao.csv do disco a cada requisição.
+# O dataset é carregado uma vez com o EDA.load_data e tudo que os painéis pedem
+# (describe, matriz de correlação, previsão com intervalos, Tabela 1) é calculado
+# nessa hora e fica em memória; a consulta por período é um searchsorted nos meses.
+#
+# Uma thread olha a assinatura do dataset (mtime + tamanho, como o monitor_pdfs.py)
+# e, quando ela muda e fica estável por uma volta, monta um snapshot novo e troca o
+# antigo de uma vez: requisição em andamento continua com o snapshot que pegou.
+# Só biblioteca padrão no HTTP (http.server), nada de Flask/FastAPI.
+#
+# Uso (da raiz do projeto): python src/servico_consulta.py --data datasets/serasa.csv --port 8765
+#
+#   GET /saude                                    período coberto, linhas, quando carregou
+#   GET /indicadores?de=jan/25&ate=jun/25&indicadores=VTDD_BI,VMPP
+#   GET /estatisticas?indicadores=VTDD_BI         describe() por indicador
+#   GET /correlacao?indicadores=VTDD_BI,VMPP      matriz de correlação
+#   GET /previsao?indicadores=VTDD_BI&futuro=1    tendência + P5/P50/P95 (previsao.py)
+#   GET /inadimplentes                            Tabela 1
+#   GET /metricas                                 tempos de resposta por rota e recargas
+
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import armazem_sqlite
+import EDA
+import periodos
+import previsao
+
+
+# -------------------------------------------------------
+# Bl.1 Snapshot: dataset e agregados pré-calculados
+# -------------------------------------------------------
+def data_signature(path: Path):
+    """
+    (nome, mtime_ns, tamanho) do CSV/Parquet, ou de cada arquivo do Parquet particionado.
+    No armazém SQLite entra também o -wal: o upsert cai nele antes do checkpoint.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(p for p in path.rglob("*") if p.is_file())
+    elif armazem_sqlite.is_store(path):
+        files = [path, path.with_name(path.name + "-wal")]
+    else:
+        files = [path]
+    sig = []
+    for f in files:
+        try:
+            st = f.stat()
+        except FileNotFoundError:
+            continue
+        sig.append((str(f), st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _records(df: pd.DataFrame) -> list:
+    # to_json já troca NaN por null e os tipos do NumPy por tipos do JSON
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+def _frame_dict(df: pd.DataFrame) -> dict:
+    return json.loads(df.to_json(orient="index", force_ascii=False))
+
+
+def build_snapshot(path: Path, horizon: int = 5, n_paths: int = previsao.N_PATHS) -> dict:
+    """Tudo que as rotas respondem, já no formato do JSON."""
+    df = EDA.load_data(path)
+    cols = [c for c in previsao.INDICADORES if c in df]
+
+    resultado = previsao.forecast_batch(df.sort_values("t").reset_index(drop=True), cols, horizon=horizon)
+    quantis = previsao.path_quantiles(resultado, previsao.simulate_paths(resultado, n_paths=n_paths))
+    previsto = previsao.forecast_table(df, resultado, quantis)
+
+    valid = df["PERIODO_M"].notna().to_numpy()
+    return {
+        "path": str(path),
+        "carregado_em": datetime.now().isoformat(timespec="seconds"),
+        "cols": cols,
+        "ordinals": df.loc[valid, "PERIODO_M"].array.asi8,
+        "linhas": _records(df.loc[valid, ["PERIODO"] + cols]),
+        "sem_periodo": _records(df.loc[~valid, ["PERIODO"] + cols]),
+        "estatisticas": _frame_dict(df[cols].describe().T),
+        "correlacao": _frame_dict(df[cols].corr()),
+        "previsao": _records(previsto),
+        "previsao_futuro": len(resultado["future"]),
+        "previsao_metricas": _frame_dict(resultado["metrics"]),
+        "inadimplentes": _records(EDA.inadimplentes_table(df)) if "INADIMPLENTES_MI" in df else [],
+    }
+
+
+# -------------------------------------------------------
+# Bl.2 Consultas
+# -------------------------------------------------------
+class QueryError(ValueError):
+    """Parâmetro inválido na consulta (vira HTTP 400)."""
+
+
+def parse_periodo(value: str) -> int:
+    """'jan/25' ou '2025-01' -> ordinal do mês (mesma base do period[M])."""
+    # Mesma conta do periodos.to_period, sem passar um valor só pelas operações de string do pandas
+    mes, _, ano = value.strip().lower().partition("/")
+    if mes in periodos.MES_NUM and ano.isdigit():
+        ano = int(ano) + (2000 if len(ano) <= 2 else 0)
+        return (ano - 1970) * 12 + periodos.MES_NUM[mes] - 1
+    try:
+        return pd.Period(value, freq="M").ordinal
+    except ValueError:
+        raise QueryError(f"Período inválido: {value!r} (use 'jan/25' ou '2025-01')") from None
+
+
+def _param(params: dict, name: str, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _cols(snap: dict, params: dict) -> list:
+    pedido = _param(params, "indicadores")
+    if not pedido:
+        return snap["cols"]
+    cols = [c.strip().upper() for c in pedido.split(",") if c.strip()]
+    desconhecidos = [c for c in cols if c not in snap["cols"]]
+    if desconhecidos:
+        raise QueryError(f"Indicador desconhecido: {', '.join(desconhecidos)}; disponíveis: {', '.join(snap['cols'])}")
+    return cols
+
+
+def query_saude(snap: dict, params: dict) -> dict:
+    linhas = snap["linhas"]
+    return {
+        "dataset": snap["path"],
+        "carregado_em": snap["carregado_em"],
+        "linhas": len(linhas) + len(snap["sem_periodo"]),
+        "de": linhas[0]["PERIODO"] if linhas else None,
+        "ate": linhas[-1]["PERIODO"] if linhas else None,
+        "indicadores": snap["cols"],
+    }
+
+
+def query_indicadores(snap: dict, params: dict) -> dict:
+    cols = _cols(snap, params)
+    ordinals = snap["ordinals"]
+    de, ate = _param(params, "de"), _param(params, "ate")
+    lo = 0 if de is None else int(np.searchsorted(ordinals, parse_periodo(de), side="left"))
+    hi = len(ordinals) if ate is None else int(np.searchsorted(ordinals, parse_periodo(ate), side="right"))
+    keys = ["PERIODO"] + cols
+    linhas = [{k: r[k] for k in keys} for r in snap["linhas"][lo:hi]]
+    return {"de": de, "ate": ate, "linhas": linhas}
+
+
+def query_estatisticas(snap: dict, params: dict) -> dict:
+    return {c: snap["estatisticas"][c] for c in _cols(snap, params)}
+
+
+def query_correlacao(snap: dict, params: dict) -> dict:
+    cols = _cols(snap, params)
+    return {a: {b: snap["correlacao"][a][b] for b in cols} for a in cols}
+
+
+def query_previsao(snap: dict, params: dict) -> dict:
+    cols = _cols(snap, params)
+    linhas = snap["previsao"]
+    if _param(params, "futuro") in ("1", "true", "sim"):
+        linhas = linhas[len(linhas) - snap["previsao_futuro"]:]
+    linhas = [{k: v for k, v in r.items() if k == "PERIODO" or k.rsplit("_", 1)[0] in cols} for r in linhas]
+    return {
+        "modelo": "tendência linear (previsao.py), intervalos por simulação",
+        "metricas_teste": {c: snap["previsao_metricas"][c] for c in cols},
+        "linhas": linhas,
+    }
+
+
+def query_inadimplentes(snap: dict, params: dict) -> dict:
+    return {"linhas": snap["inadimplentes"]}
+
+
+ROUTES = {
+    "/saude": query_saude,
+    "/indicadores": query_indicadores,
+    "/estatisticas": query_estatisticas,
+    "/correlacao": query_correlacao,
+    "/previsao": query_previsao,
+    "/inadimplentes": query_inadimplentes,
+}
+
+
+# -------------------------------------------------------
+# Bl.3 Tempos de resposta
+# -------------------------------------------------------
+class Latencias:
+    """Últimas max_len durações por rota (ms), para percentis sem crescer sem limite."""
+
+    def __init__(self, max_len: int = 2000):
+        self._lock = threading.Lock()
+        self._ms = {}
+        self._total = {}
+        self._max_len = max_len
+
+    def add(self, rota: str, ms: float):
+        with self._lock:
+            self._ms.setdefault(rota, deque(maxlen=self._max_len)).append(ms)
+            self._total[rota] = self._total.get(rota, 0) + 1
+
+    def resumo(self) -> dict:
+        with self._lock:
+            copia = {rota: np.fromiter(v, dtype=float) for rota, v in self._ms.items()}
+            totais = dict(self._total)
+        out = {}
+        for rota, ms in copia.items():
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[rota] = {"requisicoes": totais[rota], "media_ms": round(float(ms.mean()), 3),
+                         "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+                         "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3)}
+        return out
+
+
+# -------------------------------------------------------
+# Bl.4 Serviço: recarga a quente e HTTP
+# -------------------------------------------------------
+class ServicoConsulta:
+    def __init__(self, data_path: Path, horizon: int = 5, n_paths: int = previsao.N_PATHS,
+                 interval: float = 1.0):
+        self.data_path = Path(data_path)
+        self.horizon = horizon
+        self.n_paths = n_paths
+        self.interval = interval
+        self.latencias = Latencias()
+        # recargas e erros mudam nas threads das requisições e na do watcher: sempre com _lock
+        self._lock = threading.Lock()
+        self.recargas = {"total": 0, "falhas": 0, "ultima_ms": None}
+        self.erros = 0  # respostas 500
+        self._stop = threading.Event()
+        self._signature = data_signature(self.data_path)
+        self.snapshot = self._build()
+
+    def _build(self) -> dict:
+        inicio = time.perf_counter()
+        snap = build_snapshot(self.data_path, self.horizon, self.n_paths)
+        ms = round(1000 * (time.perf_counter() - inicio), 1)
+        with self._lock:
+            self.recargas["total"] += 1
+            self.recargas["ultima_ms"] = ms
+        print(f"[API] Dataset carregado: {len(snap['linhas'])} período(s) de {self.data_path} em {ms} ms")
+        return snap
+
+    def check_reload(self, pending=None):
+        """
+        Uma volta do watcher: devolve a assinatura pendente. O snapshot só é refeito quando a
+        assinatura nova se repete numa volta seguinte (arquivo parou de ser gravado).
+        """
+        sig = data_signature(self.data_path)
+        if sig == self._signature:
+            return None
+        if sig != pending:
+            return sig
+        try:
+            self.snapshot = self._build()  # troca de referência: as requisições não veem meio-termo
+        except Exception as exc:
+            # Fica com o snapshot anterior; tenta de novo quando o arquivo mudar outra vez
+            with self._lock:
+                self.recargas["falhas"] += 1
+            print(f"[ERRO] Falha ao recarregar {self.data_path}: {type(exc).__name__}: {exc}")
+        self._signature = sig
+        return None
+
+    def contadores(self) -> dict:
+        """Cópia de recargas e erros, para o /metricas não serializar o dict enquanto ele muda."""
+        with self._lock:
+            return {"recargas": dict(self.recargas), "erros": self.erros}
+
+    def watch(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            pending = self.check_reload(pending)
+
+    def stop(self):
+        self._stop.set()
+
+    def handle(self, url: str):
+        """
+        (status HTTP, corpo JSON em dict) para a URL; mede o tempo de resposta da rota.
+        Erro inesperado vira 500 com {"erro": ...} e também entra nas latências e em "erros".
+        """
+        inicio = time.perf_counter()
+        parts = urlsplit(url)
+        rota = parts.path.rstrip("/") or "/"
+        try:
+            if rota == "/metricas":
+                status, corpo = 200, {"rotas": self.latencias.resumo(), **self.contadores(),
+                                      "carregado_em": self.snapshot["carregado_em"]}
+            elif rota in ROUTES:
+                status, corpo = 200, ROUTES[rota](self.snapshot, parse_qs(parts.query))
+            else:
+                status, corpo = 404, {"erro": f"Rota desconhecida: {rota}", "rotas": sorted(ROUTES) + ["/metricas"]}
+        except QueryError as exc:
+            status, corpo = 400, {"erro": str(exc)}
+        except Exception as exc:
+            # Sem isto a exceção sobe para o BaseHTTPRequestHandler e o cliente só vê a conexão cair
+            with self._lock:
+                self.erros += 1
+            print(f"[ERRO] {url}: {type(exc).__name__}: {exc}")
+            status, corpo = 500, {"erro": f"Erro interno: {type(exc).__name__}: {exc}"}
+        self.latencias.add(rota if status != 404 else "(404)", 1000 * (time.perf_counter() - inicio))
+        return status, corpo
+
+
+def make_handler(servico: ServicoConsulta):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, corpo = servico.handle(self.path)
+            body = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # uma linha por requisição só atrapalha; os tempos estão em /metricas
+
+    return Handler
+
+
+def serve(data_path: Path, host: str = "127.0.0.1", port: int = 8765, horizon: int = 5,
+          n_paths: int = previsao.N_PATHS, interval: float = 1.0):
+    servico = ServicoConsulta(data_path, horizon, n_paths, interval)
+    threading.Thread(target=servico.watch, daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(servico))
+    print(f"[API] Servindo em http://{host}:{server.server_port} (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[API] Encerrado.")
+    finally:
+        servico.stop()
+        server.server_close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON local com os indicadores e previsões da Serasa.")
+    parser.add_argument("--data", type=Path, default=Path("datasets/serasa.csv"),
+                        help="CSV, Parquet ou armazém SQLite do dataset (padrão: datasets/serasa.csv)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--horizon", type=int, default=5, help="meses de previsão")
+    parser.add_argument("--paths", type=int, default=previsao.N_PATHS,
+                        help="trajetórias simuladas para os intervalos da previsão")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="segundos entre as checagens de mudança no dataset")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve(args.data, args.host, args.port, args.horizon, args.paths, args.interval)
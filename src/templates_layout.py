@@ -0,0 +1,129 @@
+# templates_layout.py
+
+# Templates de layout dos mapas da Serasa. O visual dos PDFs se repete mês a mês,
+# então, depois que um PDF é extraído pelo texto, dá para guardar em que página e
+# em que retângulo (bbox) cada indicador apareceu. Os PDFs seguintes com a mesma
+# impressão digital de layout são lidos só nesses recortes: abre-se apenas a página
+# do template (sem montar as outras) e o texto sai só do retângulo de cada métrica.
+# O que é regex/métrica fica no pdf2csv 2.0.py; aqui é só a parte de PDF e geometria.
+
+from contextlib import contextmanager
+from hashlib import sha1
+from itertools import islice
+
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+
+BBOX_PAD = 2.0  # folga (pt) em volta das linhas aprendidas
+
+
+@contextmanager
+def open_pdf(pdf_path):
+    """
+    pdfplumber.open sem o PDF.close(), que percorre pdf.pages (montando todas as páginas)
+    só para fechá-las. Aqui o arquivo é nosso e as páginas abertas são fechadas uma a uma.
+    """
+    with open(pdf_path, "rb") as f:
+        yield pdfplumber.open(f)
+
+
+def fingerprint(pdf) -> str:
+    """Nº de páginas + tamanho da 1ª página: barato, não passa pelo layout de nenhuma página."""
+    count = resolve1(resolve1(pdf.doc.catalog["Pages"])["Count"])
+    first = next(PDFPage.create_pages(pdf.doc), None)
+    size = "x".join(f"{v:.0f}" for v in first.mediabox) if first is not None else ""
+    return sha1(f"{count}|{size}".encode()).hexdigest()[:16]
+
+
+def open_page(pdf, index: int):
+    """Só a página index; pdf.pages montaria todas as páginas do documento."""
+    page_obj = next(islice(PDFPage.create_pages(pdf.doc), index, None), None)
+    if page_obj is None:
+        return None
+    return pdfplumber.page.Page(pdf, page_obj, page_number=index + 1)
+
+
+def union_bbox(lines: list, page) -> list:
+    """Retângulo que cobre as linhas (dicts do extract_text_lines), com folga e dentro da página."""
+    px0, ptop, px1, pbottom = page.bbox
+    return [
+        round(max(px0, min(l["x0"] for l in lines) - BBOX_PAD), 2),
+        round(max(ptop, min(l["top"] for l in lines) - BBOX_PAD), 2),
+        round(min(px1, max(l["x1"] for l in lines) + BBOX_PAD), 2),
+        round(min(pbottom, max(l["bottom"] for l in lines) + BBOX_PAD), 2),
+    ]
+
+
+def grow_to_words(bbox, words: list) -> tuple:
+    """
+    Estica o bbox até cobrir inteiras as palavras que ele toca: o retângulo aprendido
+    tem a largura do número do PDF de referência, e um número mais comprido no mês
+    seguinte ("R$ 404,07 bi" contra "R$ 457 bi") sairia cortado.
+    """
+    x0, top, x1, bottom = bbox
+    hit = [w for w in words if w["x0"] < x1 and w["x1"] > x0 and w["top"] < bottom and w["bottom"] > top]
+    if not hit:
+        return tuple(bbox)
+    return (
+        min(x0, min(w["x0"] for w in hit)),
+        min(top, min(w["top"] for w in hit)),
+        max(x1, max(w["x1"] for w in hit)),
+        max(bottom, max(w["bottom"] for w in hit)),
+    )
+
+
+def region_texts(pdf, regions: dict) -> dict:
+    """{métrica: texto do recorte}. Cada página é aberta uma vez e cada bbox é extraído uma vez."""
+    by_page = {}
+    for name, region in regions.items():
+        by_page.setdefault(region["page"], []).append(name)
+
+    texts, crops = {}, {}
+    for index, names in sorted(by_page.items()):
+        page = open_page(pdf, index)
+        if page is None:
+            continue
+        words = page.extract_words()
+        for name in names:
+            bbox = tuple(regions[name]["bbox"])
+            if (index, bbox) not in crops:
+                grown = grow_to_words(bbox, words)
+                crops[index, bbox] = page.crop(grown, strict=False).extract_text() or ""
+            texts[name] = crops[index, bbox]
+        page.close()
+    return texts
+
+
+def apply(pdf_path, templates: dict):
+    """(impressão digital, {métrica: texto}) ou (impressão digital, None) se o layout é desconhecido."""
+    with open_pdf(pdf_path) as pdf:
+        fp = fingerprint(pdf)
+        template = templates.get(fp)
+        if template is None:
+            return fp, None
+        return fp, region_texts(pdf, template["regions"])
+
+
+def build_regions(pdf_path, refs: dict, n_lines: dict):
+    """
+    refs: {métrica: {"page": k, "lines": [linhas do texto da página k], ...extras}}
+    n_lines: {k: nº de linhas do texto da página k}, para conferir que as linhas com
+    coordenadas (extract_text_lines) são as mesmas do texto usado nas regex.
+    Devolve (impressão digital, {métrica: {"page", "bbox", ...extras}}) ou (fp, None).
+    """
+    regions = {}
+    with open_pdf(pdf_path) as pdf:
+        fp = fingerprint(pdf)
+        for k in sorted({r["page"] for r in refs.values()}):
+            page = open_page(pdf, k)
+            lines = page.extract_text_lines() if page is not None else []
+            if len(lines) != n_lines[k]:
+                return fp, None
+            for name, ref in refs.items():
+                if ref["page"] == k:
+                    extras = {key: v for key, v in ref.items() if key not in ("page", "lines")}
+                    bbox = union_bbox([lines[j] for j in ref["lines"]], page)
+                    regions[name] = {"page": k, "bbox": bbox, **extras}
+            page.close()
+    return fp, regions
@@ -0,0 +1,121 @@
+# validacao.py
+
+# Checagens de consistência do dataset inteiro de uma vez (vetorizadas com NumPy),
+# usadas pelo pdf2csv 2.0.py para achar as linhas que a extração errou:
+#
+#   ausente     indicador vazio (a regex não achou nada)
+#   faixa       valor fora de uma faixa plausível (ex.: vírgula no lugar errado)
+#   identidade  INADIMPLENTES_MI x VMPP ~ VTDD_BI e DIVIDAS_MI x VMCD ~ VTDD_BI
+#   pares       INADIMPLENTES_MI <= DIVIDAS_MI e VMPP >= VMCD (pares trocados
+#               passam na identidade, mas toda pessoa inadimplente tem ao menos uma dívida)
+#   salto       pico isolado mês a mês (sobe e desce mais que JUMP_FACTOR vezes)
+#
+# faixa, identidade e pares são "duras": a linha está errada (e o --drop-invalid a tira).
+# ausente e salto só sinalizam: valem uma releitura do PDF, mas a linha fica no dataset
+# (indicador vazio continua NaN, como antes da validação; mudança de patamar é de verdade).
+
+import numpy as np
+import pandas as pd
+
+# Faixas bem largas: só pegam erro de ordem de grandeza (edições regionais são menores)
+RANGES = {
+    "INADIMPLENTES_MI": (0.01, 250),
+    "VMPP": (100, 100_000),
+    "DIVIDAS_MI": (0.01, 2_000),
+    "VMCD": (50, 50_000),
+    "VTDD_BI": (0.01, 10_000),
+    "VMAF": (10, 100_000),
+    "DESCONTOS_BI": (0.001, 1_000),
+}
+# (quantidade em milhões, valor médio em R$) -> VTDD_BI em bilhões
+IDENTITIES = [("INADIMPLENTES_MI", "VMPP"), ("DIVIDAS_MI", "VMCD")]
+JUMP_FACTOR = 4.0
+HARD_CHECKS = ("faixa", "identidade", "pares")
+SOFT_CHECKS = ("ausente", "salto")
+
+FAILURE_COLUMNS = ["PERIODO", "CHECAGEM", "INDICADOR", "VALOR", "DETALHE"]
+
+
+def _failures(df: pd.DataFrame, mask: np.ndarray, check: str, indicador: str, valor, detalhe) -> pd.DataFrame:
+    idx = np.flatnonzero(mask)
+    return pd.DataFrame({
+        "PERIODO": df["PERIODO"].to_numpy()[idx],
+        "CHECAGEM": check,
+        "INDICADOR": indicador,
+        "VALOR": np.asarray(valor, dtype=float)[idx],
+        "DETALHE": np.asarray(detalhe, dtype=object)[idx] if not isinstance(detalhe, str) else detalhe,
+    }, index=df.index[idx])
+
+
+def check_dataset(df: pd.DataFrame, tol: float = 0.02) -> pd.DataFrame:
+    """
+    Uma linha por falha (índice = índice da linha de df), colunas FAILURE_COLUMNS.
+    df em ordem de período, como sai do rows_to_dataframe.
+    """
+    partes = []
+    X = {c: df[c].to_numpy(dtype=float) for c in RANGES}
+
+    for c, (lo, hi) in RANGES.items():
+        x = X[c]
+        partes.append(_failures(df, np.isnan(x), "ausente", c, x, ""))
+        partes.append(_failures(df, (x < lo) | (x > hi), "faixa", c, x, f"fora de [{lo}, {hi}]"))
+
+    vtdd = X["VTDD_BI"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for qtd, medio in IDENTITIES:
+            produto = X[qtd] * X[medio] / 1000
+            desvio = produto / vtdd - 1
+            # Componente ausente já aparece como "ausente"; aqui só o que dá para comparar
+            mask = np.isfinite(produto) & np.isfinite(vtdd) & ~(np.abs(desvio) <= tol)
+            detalhe = np.char.add(np.char.add(f"{qtd} x {medio} / 1000 = ", np.round(produto, 2).astype(str)),
+                                  np.char.add(" vs VTDD_BI ", vtdd.astype(str)))
+            partes.append(_failures(df, mask, "identidade", f"{qtd}*{medio}", desvio, detalhe))
+
+    (qi, mi), (qd, md) = IDENTITIES
+    trocados = (X[qi] > X[qd]) | (X[mi] < X[md])
+    partes.append(_failures(df, trocados, "pares", f"{qi}/{qd}", X[qi], "quantidade/valor médio trocados"))
+
+    partes.append(_jump_failures(df, X))
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=FAILURE_COLUMNS)
+    return pd.concat(partes).sort_index(kind="stable")
+
+
+def _jump_failures(df: pd.DataFrame, X: dict) -> pd.DataFrame:
+    # Edições regionais repetem o PERIODO; entre elas a variação não quer dizer nada
+    periodo = df["PERIODO"].astype(str)
+    unico = ~periodo.duplicated(keep=False).to_numpy()
+    n = len(df)
+    lim = np.log(JUMP_FACTOR)
+    partes = []
+    for c, x in X.items():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lr = np.log(x[1:] / x[:-1])             # lr[t-1]: de t-1 para t
+        lr[~(unico[1:] & unico[:-1])] = np.nan
+        subida = np.concatenate([[np.nan], lr])     # entrada em t
+        saida = np.concatenate([lr, [np.nan]])      # saída de t
+        grande_in = np.abs(subida) > lim
+        grande_out = np.abs(saida) > lim
+        pico = grande_in & grande_out & (np.sign(subida) != np.sign(saida))
+        # Nas pontas só há um vizinho: o último mês vale contra o anterior; o primeiro,
+        # contra o seguinte, desde que o seguinte esteja de acordo com o depois dele
+        if n >= 2:
+            pico[-1] |= grande_in[-1]
+            pico[0] |= grande_out[0] and (n == 2 or not grande_out[1])
+        detalhe = np.char.add("variação x", np.round(np.exp(np.where(grande_in, subida, saida)), 2).astype(str))
+        partes.append(_failures(df, pico, "salto", c, x, detalhe))
+    return pd.concat(partes)
+
+
+def hard_failures(falhas: pd.DataFrame) -> pd.DataFrame:
+    return falhas[falhas["CHECAGEM"].isin(HARD_CHECKS)]
+
+
+def row_failures(df: pd.DataFrame, idx, tol: float = 0.02) -> pd.DataFrame:
+    """Falhas só da linha idx, olhando os dois vizinhos de cada lado (o que o salto precisa)."""
+    pos = df.index.get_loc(idx)
+    vizinhos = df.iloc[max(pos - 2, 0):pos + 3]
+    falhas = check_dataset(vizinhos, tol)
+    # Recortado no meio da série, a linha do recorte que fica na ponta não é ponta de verdade
+    return falhas[falhas.index == idx]
@@ -0,0 +1,102 @@
+# test_parse_brl.py
+
+# Equivalência do parse_brl_series (vetorizado) com o parse_brl (um valor por vez) em
+# strings geradas com semente fixa: separadores "." e "," misturados, sufixos
+# "mi"/"bi"/"bilhões", None/NaN, vazias e casos malformados como '5,837,49'.
+#
+# Uso (da raiz do projeto): python -m pytest -q tests
+
+from pathlib import Path
+import importlib.util
+import math
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+# "pdf2csv 2.0.py" tem espaço no nome: carrega pelo caminho
+_spec = importlib.util.spec_from_file_location("pdf2csv2", SRC_DIR / "pdf2csv 2.0.py")
+pdf2csv = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(pdf2csv)
+
+SUFIXOS = ["", " mi", " bi", " bilhões", " milhões", "mi", " R$", "%"]
+PREFIXOS = ["", "R$ ", "R$", " ", "cerca de "]
+FIXOS = [
+    "5,837,49", "5.496,69", "1.234.567,89", "1,234.56", "402.03", "12,5 mi", "R$ 6.036,94",
+    "73,1 bi", "1.000 bilhões", ",", ".", ",,", "..", ".,", "1..2", "1,,2", "1.2.3", "R$", "mi",
+    "", "   ", "abc", "-5,00", "+3", "٣,٥", "１２", "5,837,49,1", ",5", "5,", ".5", "5.",
+]
+
+
+def _numero(rng: random.Random) -> str:
+    forma = rng.randrange(6)
+    inteiro = str(rng.randrange(0, 10 ** rng.randint(1, 7)))
+    if forma == 0:
+        return inteiro
+    if forma == 1:
+        return f"{inteiro},{rng.randrange(100):02d}"
+    if forma == 2:
+        return f"{inteiro}.{rng.randrange(100):02d}"
+    if forma == 3:
+        # milhar com ponto e decimal com vírgula (formato brasileiro)
+        grupos = [str(rng.randint(1, 999))] + [f"{rng.randrange(1000):03d}" for _ in range(rng.randint(1, 3))]
+        return ".".join(grupos) + f",{rng.randrange(100):02d}"
+    # separadores aleatórios, inclusive malformados
+    return "".join(rng.choice("0123456789.,") for _ in range(rng.randint(1, 10)))
+
+
+def gerar(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    valores = list(FIXOS) + [None, np.nan]
+    while len(valores) < n:
+        valores.append(rng.choice(PREFIXOS) + _numero(rng) + rng.choice(SUFIXOS))
+        if rng.random() < 0.05:
+            valores.append(rng.choice([None, np.nan, ""]))
+    return valores
+
+
+def esperado(v):
+    # parse_brl só recebe texto; None/NaN/vazio saem como "sem valor" (NaN no vetorizado)
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    return pdf2csv.parse_brl(v)
+
+
+def _confere(valores, obtido):
+    for i, v in enumerate(valores):
+        e = esperado(v)
+        if e is None:
+            assert np.isnan(obtido[i]), (i, v, obtido[i])
+        else:
+            assert obtido[i] == e, (i, v, obtido[i], e)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_series_igual_ao_escalar(seed):
+    valores = gerar(2000, seed)
+    _confere(valores, pdf2csv.parse_brl_series(valores))
+
+
+def test_series_preserva_indice_e_nome():
+    valores = gerar(300, 99)
+    s = pd.Series(valores, index=range(1000, 1000 + len(valores)), name="VALOR")
+    out = pdf2csv.parse_brl_series(s)
+    assert isinstance(out, pd.Series)
+    assert out.index.equals(s.index) and out.name == "VALOR"
+    _confere(valores, out.to_numpy())
+
+
+def test_entrada_vazia():
+    assert len(pdf2csv.parse_brl_series([])) == 0
+    assert pdf2csv.parse_brl_series(pd.Series([], dtype=object)).empty
+
+
+def test_casos_conhecidos():
+    out = pdf2csv.parse_brl_series(["5,837,49", "5.496,69", "73,1 bi", None, "", "abc"])
+    assert list(out[:3]) == [5837.49, 5496.69, 73.1]
+    assert np.isnan(out[3:]).all()